@@ -20,5 +20,5 @@ class Bot(RedormBase):
     id: BotId = field(metadata={"unique": True})
     name: str = field(metadata={"unique": True})
     description: Optional[str] = field(default=None)
-    api_key: str = field(default_factory=partial(token_urlsafe, 32))
+    api_key: str = field(default_factory=partial(token_urlsafe, 32), metadata={"unique": True})
     user = many_to_one(User, backref="bots")
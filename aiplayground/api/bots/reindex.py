@@ -0,0 +1,27 @@
+"""
+Adds existing bots to the unique index of their API keys, which bots created before ``api_key`` was made unique
+aren't in, so players authenticating with those keys aren't found. Bots created then were all given the same key,
+so bots sharing a key get new ones, which their owners can see under ``/bots/my``. Run it once against the broker's
+redis::
+
+    REDORM_URL=redis://... python -m aiplayground.api.bots.reindex
+"""
+import asyncio
+from functools import partial
+from secrets import token_urlsafe
+
+from aiplayground.api.bots.models import Bot
+from aiplayground.utils.aioredorm import ared
+
+
+async def reindex_bots() -> None:
+    indexed = await ared.reindex(Bot, regenerate={"api_key": partial(token_urlsafe, 32)})
+    print(f"Indexed {indexed} bots")
+
+
+def main():
+    asyncio.run(reindex_bots())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import asyncio
+from secrets import token_urlsafe
 from typing import List
 
 from fastapi import APIRouter, Security, HTTPException, status
@@ -7,32 +9,36 @@ from aiplayground.api.bots.models import Bot
 from aiplayground.api.bots.schemas import BotSchema, BotPrivateSchema, CreateBotSchema
 from aiplayground.logging import logger
 from aiplayground.types import UserId, BotId
+from aiplayground.utils.aioredorm import ared
 
 bots_router = APIRouter(prefix="/bots", dependencies=[Security(get_user_id)], tags=["Bots"])
 
 
 @bots_router.get("/all", response_model=List[BotSchema])
-def list_bots():
-    return Bot.list()
+async def list_bots():
+    bots = await ared.list(Bot)
+    return await asyncio.gather(*[ared.expand(bot, "user") for bot in bots])
 
 
 @bots_router.post("/", response_model=BotPrivateSchema)
-def create_bot(data: CreateBotSchema, user_id: UserId = Security(get_user_id)):
-    user = User.get(user_id)
-    bot = Bot.create(name=data.name, description=data.description, user=user)
-    return bot
+async def create_bot(data: CreateBotSchema, user_id: UserId = Security(get_user_id)):
+    user = await ared.get(User, user_id)
+    # The model's default key is only generated once per process, so each bot is given its own
+    bot = await ared.create(Bot, name=data.name, description=data.description, user=user, api_key=token_urlsafe(32))
+    return {**vars(bot), "user": user}
 
 
 @bots_router.get("/my", response_model=List[BotSchema])
-def my_bots(user_id: UserId = Security(get_user_id)):
-    user = User.get(user_id)
-    return user.bots
+async def my_bots(user_id: UserId = Security(get_user_id)):
+    user = await ared.get(User, user_id)
+    return [{**vars(bot), "user": user} for bot in await ared.related(user, "bots")]
 
 
 @bots_router.get("/my/{bot_id}", response_model=BotPrivateSchema)
-def get_my_bot(bot_id: BotId, user_id: UserId = Security(get_user_id)):
-    bot = Bot.get(bot_id)
-    if bot.user.id != user_id:
-        logger.debug(f"Bot owner: {bot.user.id}, accessing user: {user_id}")
+async def get_my_bot(bot_id: BotId, user_id: UserId = Security(get_user_id)):
+    bot = await ared.get(Bot, bot_id)
+    user = await ared.related(bot, "user")
+    if user is None or user.id != user_id:
+        logger.debug(f"Bot owner: {user.id if user is not None else None}, accessing user: {user_id}")
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Accessing bot not owned by you")
-    return bot
+    return {**vars(bot), "user": user}
@@ -16,5 +16,6 @@ class Player(RedormBase):
     gamerole: Optional[GameRole]
     joined: bool = field(default=False)
     joined_at: DateTime = field(default_factory=datetime.now)
+    resume_key: Optional[str] = field(default=None)
     user = many_to_one("User", backref="players")
     room = many_to_one("Room", backref="players")
@@ -31,6 +31,7 @@ class Room(RedormBase):
     turn: Optional[PlayerId] = field(default=None)
     normal_finish: Optional[bool] = field(default=None)
     created_at: DateTime = field(default_factory=datetime.now)
+    resume_key: Optional[str] = field(default=None)
     players = one_to_many("Player", backref="room")
     states = one_to_many("GameState", backref="room")
 
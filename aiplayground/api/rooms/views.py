@@ -1,3 +1,4 @@
+import asyncio
 from typing import List
 
 from fastapi import APIRouter, HTTPException, Security
@@ -5,23 +6,31 @@ from fastapi import APIRouter, HTTPException, Security
 from aiplayground.api.auth import get_claims
 from redorm import InstanceNotFound
 
-from aiplayground.api.rooms.models import Room
+from aiplayground.api.rooms.models import Room, GameState
 from aiplayground.api.rooms.schemas import RoomSchema, RoomSchemaSummary
 from aiplayground.logging import logger
+from aiplayground.utils.aioredorm import ared
 
 rooms_router = APIRouter(prefix="/rooms", tags=["Rooms"], dependencies=[Security(get_claims)])
 
 
+async def expand_state(state: GameState) -> dict:
+    return {**vars(state), "player": await ared.related_ids(state, "player")}
+
+
 @rooms_router.get("/", response_model=List[RoomSchemaSummary])
-def list_rooms():
-    return Room.list(private=False)
+async def list_rooms():
+    rooms = await ared.list(Room, private=False)
+    return await asyncio.gather(*[ared.expand(room, "players") for room in rooms])
 
 
 @rooms_router.get("/{room_id}", response_model=RoomSchema)
-def get_room(room_id):
+async def get_room(room_id):
     try:
-        room = Room.get(room_id)
+        room = await ared.get(Room, room_id)
         logger.debug(room)
-        return room
+        expanded = await ared.expand(room, "players", "states")
+        expanded["states"] = await asyncio.gather(*[expand_state(state) for state in expanded["states"]])
+        return expanded
     except InstanceNotFound:
         raise HTTPException(status_code=404, detail="Could not find lobby")
@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from secrets import token_urlsafe
 from functools import partial
 from enum import Enum
@@ -47,6 +47,7 @@ class Match(RedormBase):
     index: int
     tournament = many_to_one(Tournament, backref="matches")
     state: MatchState = field(default=MatchState.pending, metadata={"index": True})
+    scores: Optional[Dict[ParticipantId, int]] = field(default=None)
     players = many_to_many(Participant, backref="matches")
     room = one_to_one(Room, backref="match")
 
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel
 
@@ -26,6 +26,7 @@ class ParticipantPartialSchema(BaseModel):
 class MatchPartialSchema(BaseModel):
     id: MatchId
     state: MatchState
+    scores: Optional[Dict[ParticipantId, int]] = None
     participants: List[ParticipantPartialSchema]
 
     class Config:
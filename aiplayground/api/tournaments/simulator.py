@@ -0,0 +1,232 @@
+"""
+Plays a tournament's matches offline, spread across processes with the headless runner
+
+Each participant's bot is played by a ``BasePlayer`` implementation given per bot, defaulting to the game's player
+from ``all_players``. Matches are sent to worker processes in chunks, and results are streamed back as each chunk
+completes and can be written to the tournament's ``Match`` records.
+A tournament's pending matches are played with ``--tournament``, ``--player`` picks the player of a bot,
+and a synthetic round robin (without redis) measures throughput::
+
+    python -m aiplayground.api.tournaments.simulator --tournament <id> --player <bot id>=KalahaSearchPlayer
+    python -m aiplayground.api.tournaments.simulator --game Kalaha --bots 200 --workers 8
+"""
+import argparse
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import combinations
+from time import perf_counter
+from typing import AsyncIterator, Dict, List, Mapping, Optional, Sequence, Type
+
+from aiplayground.api.tournaments.models import Participant, Tournament, Match, MatchState
+from aiplayground.gameservers import all_games
+from aiplayground.logging import logger
+from aiplayground.players import all_players, players_by_name, BasePlayer
+from aiplayground.runner import play_match
+from aiplayground.types import BotId, GameName, MatchId, ParticipantId, PlayerId, TournamentId
+from aiplayground.utils.aioredorm import ared
+
+
+@dataclass
+class MatchJob:
+    match_id: MatchId
+    game: GameName
+    participants: List[ParticipantId]
+    player_types: List[Type[BasePlayer]]
+
+
+@dataclass
+class SimulatedMatch:
+    match_id: MatchId
+    scores: Dict[ParticipantId, int]
+    moves: int = 0
+    normal: bool = True
+    fault: Optional[ParticipantId] = None
+    error: Optional[str] = None
+
+
+def play_job(job: MatchJob) -> SimulatedMatch:
+    try:
+        result = play_match(all_games[job.game], job.player_types, [PlayerId(p) for p in job.participants])
+    except Exception as e:
+        # A bot that crashes errors the match rather than the whole run
+        return SimulatedMatch(match_id=job.match_id, scores=dict(), error=repr(e))
+    return SimulatedMatch(
+        match_id=job.match_id,
+        scores={ParticipantId(p): score for p, score in result.scores.items()},
+        moves=result.moves,
+        normal=result.normal,
+        fault=None if result.fault is None else ParticipantId(result.fault),
+    )
+
+
+def play_chunk(jobs: List[MatchJob]) -> List[SimulatedMatch]:
+    return [play_job(job) for job in jobs]
+
+
+async def simulate(
+    jobs: Sequence[MatchJob], workers: Optional[int] = None, chunk_size: Optional[int] = None
+) -> AsyncIterator[List[SimulatedMatch]]:
+    """
+    Plays matches across a pool of processes, yielding the results of each chunk of matches as it completes
+    :param workers: Number of processes, defaults to the number of CPUs
+    :param chunk_size: Matches sent to a process at once, defaults to enough for about 8 chunks per process
+    """
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or max(1, len(jobs) // (workers * 8))
+    chunks = [list(jobs[i : i + chunk_size]) for i in range(0, len(jobs), chunk_size)]
+    loop = asyncio.get_event_loop()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for completed in asyncio.as_completed([loop.run_in_executor(pool, play_chunk, chunk) for chunk in chunks]):
+            yield await completed
+
+
+async def tournament_jobs(
+    tournament: Tournament, implementations: Optional[Mapping[BotId, Type[BasePlayer]]] = None
+) -> List[MatchJob]:
+    """
+    :param implementations: Player for each bot, bots not included are played by the game's player in ``all_players``
+    :return: A job for each of the tournament's pending matches, with participants seated in the order they joined
+    """
+    implementations = implementations or dict()
+    default_player = all_players[tournament.game]
+    participants: List[Participant]
+    matches: List[Match]
+    participants, matches = await asyncio.gather(
+        ared.related(tournament, "participants"), ared.related(tournament, "matches")
+    )
+    bot_ids = await asyncio.gather(*[ared.related_ids(participant, "bot") for participant in participants])
+    players = {p.id: implementations.get(BotId(bot_id), default_player) for p, bot_id in zip(participants, bot_ids)}
+    index = {p.id: p.index for p in participants}
+    pending = [match for match in matches if match.state == MatchState.pending]
+    match_players = await asyncio.gather(*[ared.related_ids(match, "players") for match in pending])
+    jobs = []
+    for match, player_ids in zip(pending, match_players):
+        seated = sorted(player_ids, key=index.__getitem__)
+        jobs.append(
+            MatchJob(
+                match_id=match.id,
+                game=tournament.game,
+                participants=seated,
+                player_types=[players[p] for p in seated],
+            )
+        )
+    return jobs
+
+
+async def simulate_tournament(
+    tournament: Tournament,
+    implementations: Optional[Mapping[BotId, Type[BasePlayer]]] = None,
+    workers: Optional[int] = None,
+    save: bool = True,
+) -> AsyncIterator[SimulatedMatch]:
+    """
+    Plays all of a tournament's pending matches, yielding each result as its chunk completes
+    Matches are marked running while they're played, and marked pending again if the run stops before they finish
+    :param save: Write each match's final state and scores to its ``Match`` record
+    """
+    jobs = await tournament_jobs(tournament, implementations)
+    logger.info(f"Simulating {len(jobs)} matches of tournament {tournament.name}")
+    matches = {match.id: match for match in await ared.get_bulk(Match, [job.match_id for job in jobs])}
+    if save:
+        await asyncio.gather(*[ared.update(match, state=MatchState.running) for match in matches.values()])
+    unfinished = set(matches)
+    try:
+        async for results in simulate(jobs, workers=workers):
+            if save:
+                await asyncio.gather(
+                    *[
+                        ared.update(
+                            matches[result.match_id],
+                            state=MatchState.errored if result.error else MatchState.completed,
+                            scores=result.scores or None,
+                        )
+                        for result in results
+                    ]
+                )
+            unfinished.difference_update(result.match_id for result in results)
+            for result in results:
+                if result.error is not None:
+                    logger.warning(f"Match {result.match_id} errored: {result.error}")
+                yield result
+    finally:
+        if save and unfinished:
+            # Matches without a result go back to pending, so a later run plays them rather than skipping them
+            logger.warning(f"Returning {len(unfinished)} unplayed matches of tournament {tournament.name} to pending")
+            await asyncio.gather(*[ared.update(matches[match_id], state=MatchState.pending) for match_id in unfinished])
+
+
+def round_robin_jobs(game: GameName, bots: int) -> List[MatchJob]:
+    player_type = all_players[game]
+    participants = [ParticipantId(f"bot-{i}") for i in range(bots)]
+    return [
+        MatchJob(match_id=MatchId(f"{a}-{b}"), game=game, participants=[a, b], player_types=[player_type] * 2)
+        for a, b in combinations(participants, 2)
+    ]
+
+
+async def run_round_robin(game: GameName, bots: int, workers: int) -> None:
+    jobs = round_robin_jobs(game, bots)
+    started = perf_counter()
+    totals: Dict[ParticipantId, int] = dict()
+    moves = errors = 0
+    async for results in simulate(jobs, workers=workers):
+        for result in results:
+            moves += result.moves
+            errors += result.error is not None
+            for participant, score in result.scores.items():
+                totals[participant] = totals.get(participant, 0) + score
+    seconds = perf_counter() - started
+    print(f"{len(jobs)} matches of {game} between {bots} bots on {workers} workers in {seconds:.2f}s")
+    print(f"{len(jobs) / seconds:.0f} matches/s, {moves / seconds:.0f} moves/s, {errors} errored")
+    leader = max(totals, key=totals.__getitem__)
+    print(f"Leader: {leader} with {totals[leader]} points")
+
+
+async def run_tournament(
+    tournament_id: TournamentId, implementations: Mapping[BotId, Type[BasePlayer]], workers: int
+) -> Dict[str, int]:
+    """
+    Plays a tournament's pending matches, saving their results
+    :return: Number of matches that completed and errored
+    """
+    tournament = await ared.get(Tournament, tournament_id)
+    started = perf_counter()
+    counts = {"completed": 0, "errored": 0}
+    async for result in simulate_tournament(tournament, implementations, workers=workers):
+        counts["errored" if result.error else "completed"] += 1
+    seconds = perf_counter() - started
+    print(f"Played {sum(counts.values())} matches of tournament {tournament.name} in {seconds:.2f}s")
+    print(f"{counts['completed']} completed, {counts['errored']} errored")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tournament", default=None, help="ID of a tournament to play the pending matches of")
+    parser.add_argument(
+        "--player",
+        action="append",
+        default=[],
+        metavar="BOT=PLAYER",
+        help="Player to play a bot of the tournament with, defaults to the game's player in all_players",
+    )
+    parser.add_argument("--game", choices=sorted(all_games), default="Kalaha")
+    parser.add_argument("--bots", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    if args.tournament is None:
+        asyncio.run(run_round_robin(GameName(args.game), args.bots, args.workers))
+        return
+    implementations: Dict[BotId, Type[BasePlayer]] = dict()
+    for player in args.player:
+        bot_id, _, name = player.partition("=")
+        if name not in players_by_name:
+            parser.error(f"Unknown player {name!r}, expected one of {', '.join(sorted(players_by_name))}")
+        implementations[BotId(bot_id)] = players_by_name[name]
+    asyncio.run(run_tournament(TournamentId(args.tournament), implementations, args.workers))
+
+
+if __name__ == "__main__":
+    main()
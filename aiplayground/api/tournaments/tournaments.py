@@ -1,3 +1,4 @@
+import asyncio
 from typing import Dict, List
 
 from aiplayground.api.bots import Bot
@@ -6,49 +7,56 @@ from collections import defaultdict
 
 import operator
 
-from aiplayground.exceptions import AlreadyInTournament
+from aiplayground.exceptions import AlreadyInTournament, NoMatchesReady
 from aiplayground.logging import logger
-from aiplayground.types import PlayerSID
+from aiplayground.types import PlayerSID, ParticipantId
+from aiplayground.utils.aioredorm import ared
 
 
-def add_player(bot: Bot, tournament: Tournament) -> Participant:
+async def add_player(bot: Bot, tournament: Tournament) -> Participant:
     logger.debug("Getting tournament lock: %s", tournament.id)
-    with tournament.lock():
+    async with ared.lock(tournament):
         logger.debug("Got lock for tournament: %s", tournament.id)
-        participants = tournament.participants
-        participant_ids = {participant.bot.id for participant in participants}
-        if bot.id in participant_ids:
+        participants: List[Participant] = await ared.related(tournament, "participants")
+        participant_bot_ids = await asyncio.gather(
+            *[ared.related_ids(participant, "bot") for participant in participants]
+        )
+        if bot.id in participant_bot_ids:
             raise AlreadyInTournament
         index = max(x.index for x in participants) + 1 if participants else 1
-        participant = Participant.create(index=index, bot=bot, tournament=tournament)
-        for opponent in participants:
-            if opponent.disqualified:
-                continue
-            Match.create(
-                index=100000 * index + opponent.index,
-                tournament=tournament,
-                players=[participant, opponent],
-                state=MatchState.pending,
-            )
+        participant = await ared.create(Participant, index=index, bot=bot, tournament=tournament)
+        await asyncio.gather(
+            *[
+                ared.create(
+                    Match,
+                    index=100000 * index + opponent.index,
+                    tournament=tournament,
+                    players=[participant, opponent],
+                    state=MatchState.pending,
+                )
+                for opponent in participants
+                if not opponent.disqualified
+            ]
+        )
         return participant
 
 
-def pick_match(tournament: Tournament) -> Match:
-    with tournament.lock():
-        queued_players = PlayerQueueEntry.list(tournament_id=tournament.id)
-        participants_by_id = {participant.id: participant for participant in tournament.participants}
-        participant_sids: Dict[Participant, List[PlayerSID]] = defaultdict(default_factory=list)
+async def pick_match(tournament: Tournament) -> Match:
+    async with ared.lock(tournament):
+        queued_players = await ared.list(PlayerQueueEntry, tournament_id=tournament.id)
+        participant_sids: Dict[ParticipantId, List[PlayerSID]] = defaultdict(list)
         for player in queued_players:
-            participant = participants_by_id[player.participant_id]
-            participant_sids[participant].append(player.sid)
+            participant_sids[player.participant_id].append(player.sid)
         online_participants = set(participant_sids)
-        matches = [
+        matches: List[Match] = await ared.related(tournament, "matches")
+        match_players = await asyncio.gather(*[ared.related_ids(match, "players") for match in matches])
+        ready_matches = [
             match
-            for match in tournament.matches
-            if match.state == MatchState.pending and not set(match.players) - online_participants
+            for match, players in zip(matches, match_players)
+            if match.state == MatchState.pending and not players - online_participants
         ]
-        sorted_matches = sorted(matches, key=operator.attrgetter("index"))
-        match = sorted_matches[0]
-        match.state = MatchState.running
-        match.save()
+        if not ready_matches:
+            raise NoMatchesReady
+        match = min(ready_matches, key=operator.attrgetter("index"))
+        await ared.update(match, state=MatchState.running)
         return match
@@ -1,10 +1,12 @@
+import asyncio
+from secrets import token_urlsafe
 from typing import List
 
 from fastapi import APIRouter, Security, HTTPException, status
 
 from aiplayground.api.auth import get_user_id
 from aiplayground.api.bots import Bot
-from aiplayground.api.tournaments.models import Tournament
+from aiplayground.api.tournaments.models import Tournament, Participant, Match
 from aiplayground.api.tournaments.schemas import (
     TournamentPartialSchema,
     TournamentPrivateSchema,
@@ -15,42 +17,65 @@ from aiplayground.api.tournaments.tournaments import add_player
 from aiplayground.exceptions import AlreadyInTournament
 from aiplayground.logging import logger
 from aiplayground.types import TournamentId, UserId, BotId
+from aiplayground.utils.aioredorm import ared
 from redorm import InstanceNotFound
 
 tournaments_router = APIRouter(prefix="/tournaments", dependencies=[Security(get_user_id)], tags=["Tournaments"])
 
 
+async def expand_match(match: Match) -> dict:
+    players = await ared.related(match, "players")
+    return {**vars(match), "participants": await asyncio.gather(*[ared.expand(p, "bot") for p in players])}
+
+
+async def expand_tournament(tournament: Tournament) -> dict:
+    matches: List[Match]
+    participants: List[Participant]
+    matches, participants = await asyncio.gather(
+        ared.related(tournament, "matches"), ared.related(tournament, "participants")
+    )
+    expanded_matches, expanded_participants = await asyncio.gather(
+        asyncio.gather(*[expand_match(match) for match in matches]),
+        asyncio.gather(*[ared.expand(participant, "bot") for participant in participants]),
+    )
+    return {**vars(tournament), "matches": expanded_matches, "participants": expanded_participants}
+
+
 @tournaments_router.get("/all", response_model=List[TournamentPartialSchema])
-def list_tournaments():
-    return Tournament.list()
+async def list_tournaments():
+    tournaments = await ared.list(Tournament)
+    return await asyncio.gather(*[expand_tournament(tournament) for tournament in tournaments])
 
 
 @tournaments_router.get("/all/{tournament_id}", response_model=TournamentPartialSchema)
-def get_tournament(tournament_id: TournamentId):
-    return Tournament.get(tournament_id)
+async def get_tournament(tournament_id: TournamentId):
+    return await expand_tournament(await ared.get(Tournament, tournament_id))
 
 
 @tournaments_router.post("/all/{tournament_id}/join", response_model=ParticipantPartialSchema)
-def join_tournament(tournament_id: TournamentId, bot_id: BotId, user_id: UserId = Security(get_user_id)):
+async def join_tournament(tournament_id: TournamentId, bot_id: BotId, user_id: UserId = Security(get_user_id)):
     try:
-        tournament = Tournament.get(tournament_id)
-        bot = Bot.get(bot_id)
+        tournament = await ared.get(Tournament, tournament_id)
+        bot = await ared.get(Bot, bot_id)
     except InstanceNotFound as e:
         logger.warning(f"Failed to add bot to tournament\n{e!r}")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
-    if bot.user.id != user_id:
+    if await ared.related_ids(bot, "user") != user_id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
     try:
-        return add_player(bot, tournament)
+        participant = await add_player(bot, tournament)
     except AlreadyInTournament as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Already in tournament") from e
+    return {**vars(participant), "bot": bot}
 
 
 @tournaments_router.post(
     "/", response_model=TournamentPrivateSchema, dependencies=[Security(get_user_id, scopes=["admin"])]
 )
-def create_tournament(data: CreateTournamentSchema):
-    return Tournament.create(name=data.name, description=data.description, game=data.game)
+async def create_tournament(data: CreateTournamentSchema):
+    return await ared.create(
+        Tournament, name=data.name, description=data.description, game=data.game, api_key=token_urlsafe(32)
+    )
 
 
 @tournaments_router.get(
@@ -58,5 +83,5 @@ def create_tournament(data: CreateTournamentSchema):
     response_model=List[TournamentPrivateSchema],
     dependencies=[Security(get_user_id, scopes=["admin"])],
 )
-def admin_get_tournament(tournament_id: TournamentId):
-    return Tournament.get(tournament_id)
+async def admin_get_tournament(tournament_id: TournamentId):
+    return await ared.get(Tournament, tournament_id)
@@ -8,6 +8,7 @@ from aiplayground.settings import settings
 from aiplayground.broker import sio
 from aiplayground.api import all_routers, initialize_all
 from aiplayground.logging import logger
+from aiplayground.utils.aioredorm import ared
 
 tags_metadata = [
     {"name": "Players", "description": "Players information"},
@@ -25,6 +26,7 @@ for router in all_routers:
     api_app.include_router(router)
 
 red.bind(settings.REDORM_URL)
+ared.bind(settings.REDORM_URL)
 if settings.EPHEMERAL:
     logger.info("Flushing Database")
     red.client.flushall()
@@ -0,0 +1,47 @@
+"""
+Measures the moves per second of the batched NumPy games, playing random games in a batch::
+
+    python -m aiplayground.benchmarks.batched --batch 10000
+
+``tests/test_batched.py`` checks they agree move for move with the game servers.
+"""
+import argparse
+from time import perf_counter
+from typing import Callable, Dict
+
+import numpy as np
+
+from aiplayground.gameservers.batched import BatchedGame, BatchedKalaha, BatchedTicTacToe
+
+
+GAMES: Dict[str, Callable[[int], BatchedGame]] = {"Kalaha": BatchedKalaha, "TicTacToe": BatchedTicTacToe}
+
+
+def random_moves(batch: BatchedGame, rng: np.random.Generator) -> np.ndarray:
+    # Picks a legal move uniformly at random for each unfinished game
+    legal = batch.legal_moves()
+    return np.argmax(rng.random(legal.shape) * legal, axis=1)
+
+
+def moves_per_second(batch_type: Callable[[int], BatchedGame], size: int, seed: int) -> float:
+    rng = np.random.default_rng(seed)
+    batch = batch_type(size)
+    moves = 0
+    started = perf_counter()
+    while not batch.done.all():
+        moves += int((~batch.done).sum())
+        batch.step(random_moves(batch, rng))
+    return moves / (perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=10000, help="Number of games in the timed batch")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for name, batch_type in GAMES.items():
+        print(f"{name}: {moves_per_second(batch_type, args.batch, args.seed):.0f} moves/s in batches of {args.batch}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Measures Kalaha moves per second for the array backed engine against the previous engine
+
+The previous engine walked a dict board with recursive getters and setters along a cycle of paths.
+Both engines play the same random games, ``tests/test_kalaha.py`` checks they produce identical boards, turns and
+winners::
+
+    python -m aiplayground.benchmarks.kalaha --games 2000
+"""
+import argparse
+import itertools
+import random
+from time import perf_counter
+from typing import List, Union, Iterator, Optional, Type
+
+from aiplayground.exceptions import GameCompleted, IllegalMove
+from aiplayground.gameservers.kalaha import KalahaServer, player_a, player_b, other
+from aiplayground.types import GameRole, PlayerId, Move, Board
+
+
+def getter(state, path: List[Union[int, str]]):
+    if len(path):
+        [idx, *path_rem] = path
+        return getter(state[idx], path_rem)
+    return state
+
+
+def setter(state, path: List[Union[int, str]], value):
+    assert len(path) > 0
+    if len(path) > 1:
+        [idx, *path_rem] = path
+        setter(state[idx], path_rem, value)
+    else:
+        state[path[0]] = value
+
+
+path_orders: List[List[Union[str, int]]] = [
+    *[["pits_a", i] for i in range(6)],
+    ["bank_a"],
+    *[["pits_b", i] for i in range(6)],
+    ["bank_b"],
+]
+
+
+def skip(itera: Iterator, c: int):
+    for i in range(c):
+        next(itera)
+
+
+class PreviousKalahaServer(KalahaServer):
+    """
+    The engine KalahaServer replaced, kept for comparison
+    """
+
+    board: Board = Board(dict())
+
+    def make_move(self, player_id: PlayerId, player_role: Optional[GameRole], move: Move):
+        if player_role is None:
+            raise IllegalMove("Require game role")
+        selected = move["move"]
+        offset = 0 if player_role == player_a else 7
+        board_positions = itertools.cycle(path_orders)
+        skip(board_positions, selected + offset)
+        current_path = next(board_positions)
+        pips = getter(self.board, current_path)
+        if pips == 0:
+            raise IllegalMove("Empty pit chosen")
+        setter(self.board, current_path, 0)
+        other_bank = f"bank_{other(player_role)}"
+        player_bank = f"bank_{player_role}"
+        current_pips = 0
+        for pip in range(pips):
+            current_path = next(board_positions)
+            if current_path[0] == other_bank:
+                current_path = next(board_positions)
+            current_pips = getter(self.board, current_path)
+            setter(self.board, current_path, current_pips + 1)
+
+        if current_pips == 0 and current_path[0] == f"pits_{player_role}":
+            pit = current_path[1]
+            opposite_path = [f"pits_{other(player_role)}", 5 - pit]
+            opposite_pips = getter(self.board, opposite_path)
+            if opposite_pips > 0:
+                bank_balance = getter(self.board, [player_bank])
+                setter(self.board, [player_bank], bank_balance + opposite_pips + 1)
+                setter(self.board, opposite_path, 0)
+                setter(self.board, current_path, 0)
+
+        next_role = player_role if current_path[0] == f"bank_{player_role}" else other(player_role)
+        self.turn = self.roles[next_role]
+
+        if sum(self.board["pits_a"]) == 0 or sum(self.board["pits_b"]) == 0:
+            bank_a = sum(self.board["pits_a"]) + self.board["bank_a"]
+            bank_b = sum(self.board["pits_b"]) + self.board["bank_b"]
+            if bank_a > bank_b:
+                self.winner = self.roles[player_a]
+            elif bank_b > bank_a:
+                self.winner = self.roles[player_b]
+            else:
+                self.winner = None
+            raise GameCompleted
+
+
+def new_game(engine: Type[KalahaServer]) -> KalahaServer:
+    game = engine()
+    game.players = {PlayerId("a"): player_a, PlayerId("b"): player_b}
+    game.roles = {player_a: PlayerId("a"), player_b: PlayerId("b")}
+    game.start()
+    return game
+
+
+def random_game(seed: int) -> List[int]:
+    """
+    :return: The pits chosen in a random game, played with the new engine
+    """
+    rng = random.Random(seed)
+    game = new_game(KalahaServer)
+    moves = []
+    while True:
+        pits = game.board[f"pits_{game.players[game.turn]}"]
+        move = rng.choice([pit for pit, pips in enumerate(pits) if pips])
+        moves.append(move)
+        try:
+            game.make_move(game.turn, game.players[game.turn], Move({"move": move}))
+        except GameCompleted:
+            return moves
+
+
+def moves_per_second(engine: Type[KalahaServer], games: List[List[int]]) -> float:
+    start = perf_counter()
+    for moves in games:
+        game = new_game(engine)
+        for move in moves:
+            try:
+                game.make_move(game.turn, game.players[game.turn], Move({"move": move}))
+            except GameCompleted:
+                pass
+    return sum(len(moves) for moves in games) / (perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=2000, help="Number of random games to play")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    games = [random_game(args.seed + i) for i in range(args.games)]
+    print(f"{args.games} games, {sum(len(moves) for moves in games)} moves")
+    previous = moves_per_second(PreviousKalahaServer, games)
+    current = moves_per_second(KalahaServer, games)
+    print(f"{'previous':>9} {previous:>10.0f} moves/s")
+    print(f"{'array':>9} {current:>10.0f} moves/s ({current / previous:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
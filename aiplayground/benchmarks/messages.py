@@ -0,0 +1,108 @@
+"""
+Measures the CPU cost of sending a message to socket.io recipients
+
+Compares the previous send path (round tripping the payload through JSON to build a dict, eagerly
+building the debug log message, and socket.io encoding the dict for every recipient) against
+encoding the payload once and splicing it into each recipient's packet.
+Also compares the size and decoding cost of the JSON and msgpack wire formats::
+
+    python -m aiplayground.benchmarks.messages --recipients 1,2,10,100
+"""
+import argparse
+import json
+from timeit import Timer
+from typing import Callable, Any, Union, List
+
+from socketio import packet
+
+from aiplayground.messages import MessageBase, GameUpdateMessage, GamestateMessage
+from aiplayground.utils.wire import PacketJSON, Payload, JSON, MSGPACK, msgpack, unpack
+
+KALAHA_BOARD = {"pits_a": [4, 0, 5, 5, 5, 5], "pits_b": [4, 4, 4, 4, 4, 4], "bank_a": 1, "bank_b": 0}
+PLAYER_ID = "0b6c2c64-6b5a-4f77-9d1e-1c4f7e9f6c0d"
+ROOM_ID = "5a7d0e8e-22a8-4b6e-9cf0-9b4e1fa33c5e"
+
+
+class JSONPacket(packet.Packet):
+    json = json
+
+
+class WirePacket(packet.Packet):
+    json = PacketJSON
+
+
+def previous_send(message: MessageBase, recipients: int) -> None:
+    message_name = message.__class__.__name__[:-7].lower()
+    f"Sending message {message_name} to {ROOM_ID!r}:\n{message!r}"
+    data = json.loads(message.json())
+    for _ in range(recipients):
+        JSONPacket(packet.EVENT, data=[message_name, data], namespace="/").encode()
+
+
+def encoded_send(message: MessageBase, recipients: int) -> None:
+    data = message.encode()
+    for _ in range(recipients):
+        WirePacket(packet.EVENT, data=[message.message_name, data], namespace="/").encode()
+
+
+def encode_packet(message: MessageBase, wire_format: str) -> Union[str, List[Union[str, bytes]]]:
+    return WirePacket(packet.EVENT, data=[message.message_name, Payload(message).encode(wire_format)]).encode()
+
+
+def decode_packet(encoded_packet: Union[str, List[Union[str, bytes]]]) -> dict:
+    # Binary events are sent as the packet with placeholders followed by the attachments
+    if isinstance(encoded_packet, list):
+        received = WirePacket(encoded_packet=encoded_packet[0])
+        for attachment in encoded_packet[1:]:
+            received.add_attachment(attachment)
+    else:
+        received = WirePacket(encoded_packet=encoded_packet)
+    return unpack(received.data[1])
+
+
+def packet_size(encoded_packet: Union[str, List[Union[str, bytes]]]) -> int:
+    parts = encoded_packet if isinstance(encoded_packet, list) else [encoded_packet]
+    return sum(len(part.encode() if isinstance(part, str) else part) for part in parts)
+
+
+def time_per_message(send: Callable[..., Any], *args) -> float:
+    timer = Timer(lambda: send(*args))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipients", default="1,2,10,100", help="Comma separated numbers of recipients")
+    args = parser.parse_args()
+    messages = {
+        "gameupdate": GameUpdateMessage(
+            roomid=ROOM_ID, visibility="broadcast", epoch=12, board=KALAHA_BOARD, turn=PLAYER_ID
+        ),
+        "gamestate": GamestateMessage(roomid=ROOM_ID, epoch=12, board=KALAHA_BOARD, turn=PLAYER_ID),
+    }
+    for message in messages.values():
+        # Both paths must put the same payload on the wire
+        decoded = JSONPacket(encoded_packet=WirePacket(data=["m", message.encode()]).encode()).data[1]
+        assert decoded == message.to_dict()
+    print(f"{'message':>10} {'recipients':>10} {'previous us':>12} {'encoded us':>11} {'speedup':>8}")
+    for name, message in messages.items():
+        for recipients in (int(r) for r in args.recipients.split(",")):
+            previous = time_per_message(previous_send, message, recipients)
+            encoded = time_per_message(encoded_send, message, recipients)
+            print(
+                f"{name:>10} {recipients:>10} {previous * 1e6:>12.1f} {encoded * 1e6:>11.1f} {previous / encoded:>7.1f}x"
+            )
+    wire_formats = [JSON] if msgpack is None else [JSON, MSGPACK]
+    print()
+    print(f"{'message':>10} {'format':>8} {'bytes':>6} {'decode us':>10}")
+    for name, message in messages.items():
+        for wire_format in wire_formats:
+            encoded_packet = encode_packet(message, wire_format)
+            assert decode_packet(encoded_packet) == message.to_dict()
+            decode = time_per_message(decode_packet, encoded_packet)
+            print(f"{name:>10} {wire_format:>8} {packet_size(encoded_packet):>6} {decode * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
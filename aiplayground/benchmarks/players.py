@@ -0,0 +1,241 @@
+"""
+Measures how quickly players respond to game states, to spot bots getting slower between releases
+
+Each player is shown the same positions as if it were its turn, either from random games or replayed from a file
+of JSON lines with ``board``, ``gamerole`` and optionally ``legalmoves`` (``--save`` writes generated ones).
+Reports move latency percentiles and throughput, then the memory allocated and retained per move, measured in a
+separate pass with tracemalloc as it slows moves down. ``--json`` writes the report for ``--compare`` to check
+a later run against::
+
+    python -m aiplayground.benchmarks.players --game Kalaha --positions 2000 --save kalaha.jsonl
+    python -m aiplayground.benchmarks.players --game TicTacToe --player TicTacToeSearchPlayer --positions 200
+    python -m aiplayground.benchmarks.players --game Kalaha --replay kalaha.jsonl --json before.json
+    python -m aiplayground.benchmarks.players --game Kalaha --replay kalaha.jsonl --compare before.json
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import tracemalloc
+from dataclasses import asdict, dataclass
+from time import perf_counter
+from typing import Dict, List, Optional, Type
+
+from aiplayground.exceptions import GameCompleted
+from aiplayground.gameservers import all_games, BaseGameServer
+from aiplayground.players import all_players, players_by_name, BasePlayer
+from aiplayground.players.base import show_state
+from aiplayground.runner import LatencyStats
+from aiplayground.types import Board, GameRole, Move, PlayerId
+
+PLAYER_ID = PlayerId("benchmark")
+# Metrics compared by --compare, where higher is worse
+COMPARED = ("p50_us", "p95_us", "p99_us", "peak_bytes")
+
+
+@dataclass
+class Position:
+    board: Board
+    gamerole: Optional[GameRole]
+    legal_moves: Optional[List[Move]] = None
+
+
+@dataclass
+class PlayerReport:
+    player: str
+    moves: int
+    seconds: float
+    moves_per_second: float
+    mean_us: float
+    p50_us: float
+    p95_us: float
+    p99_us: float
+    max_us: float
+    # Mean of the most memory allocated at once during a move, and of the allocations still held after it
+    peak_bytes: float
+    retained_bytes: float
+    retained_blocks: float
+
+
+def generate_positions(game_type: Type[BaseGameServer], count: int) -> List[Position]:
+    """
+    :return: Positions of random games, whose boards are shown to the player whose turn it is
+    """
+    positions: List[Position] = []
+    while len(positions) < count:
+        game = game_type()
+        for player_id in ("first", "second"):
+            game.add_player(PlayerId(player_id))
+        game.start()
+        while game.playing and len(positions) < count:
+            assert game.turn is not None
+            legal_moves = game.legal_moves()
+            assert legal_moves
+            positions.append(Position(game.show_board(), game.players[game.turn], list(legal_moves)))
+            try:
+                game.move(game.turn, random.choice(legal_moves))
+            except GameCompleted:
+                game.playing = False
+    return positions
+
+
+def load_positions(path: str) -> List[Position]:
+    with open(path) as f:
+        return [
+            Position(board=data["board"], gamerole=data.get("gamerole"), legal_moves=data.get("legalmoves"))
+            for data in map(json.loads, f)
+        ]
+
+
+def save_positions(path: str, positions: List[Position]) -> None:
+    with open(path, "w") as f:
+        for position in positions:
+            data = {"board": position.board, "gamerole": position.gamerole, "legalmoves": position.legal_moves}
+            f.write(json.dumps(data) + "\n")
+
+
+def benchmark_player(
+    player_type: Type[BasePlayer], positions: List[Position], legal_moves: bool = True, alloc_moves: int = 200
+) -> PlayerReport:
+    """
+    :param legal_moves: Send players the legal moves, as game servers do with ``SEND_LEGAL_MOVES``
+    :param alloc_moves: Number of positions to measure allocations over
+    """
+    player = player_type(player_id=PLAYER_ID)
+    latency = LatencyStats(sample_size=len(positions))
+    started = perf_counter()
+    for position in positions:
+        player.gamerole = position.gamerole
+        move_started = perf_counter()
+        show_state(player, position.board, PLAYER_ID, position.legal_moves if legal_moves else None)
+        latency.add(perf_counter() - move_started)
+    seconds = perf_counter() - started
+
+    measured = positions[:alloc_moves]
+    peak = retained = retained_blocks = 0
+    tracemalloc.start()
+    try:
+        for position in measured:
+            player.gamerole = position.gamerole
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            blocks = sys.getallocatedblocks()
+            show_state(player, position.board, PLAYER_ID, position.legal_moves if legal_moves else None)
+            retained_blocks += sys.getallocatedblocks() - blocks
+            after, move_peak = tracemalloc.get_traced_memory()
+            peak += move_peak - before
+            retained += after - before
+    finally:
+        tracemalloc.stop()
+    allocs = len(measured) or 1
+    return PlayerReport(
+        player=player_type.__name__,
+        moves=latency.count,
+        seconds=seconds,
+        moves_per_second=latency.count / seconds if seconds else 0.0,
+        mean_us=latency.mean * 1e6,
+        p50_us=latency.percentile(50) * 1e6,
+        p95_us=latency.percentile(95) * 1e6,
+        p99_us=latency.percentile(99) * 1e6,
+        max_us=latency.max * 1e6,
+        peak_bytes=peak / allocs,
+        retained_bytes=retained / allocs,
+        retained_blocks=retained_blocks / allocs,
+    )
+
+
+def print_reports(reports: List[PlayerReport]) -> None:
+    print(
+        f"{'player':>24} {'moves/s':>9} {'mean us':>9} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9} {'max us':>9}"
+        f" {'peak B':>9} {'kept B':>7} {'blocks':>7}"
+    )
+    for r in reports:
+        print(
+            f"{r.player:>24} {r.moves_per_second:>9.0f} {r.mean_us:>9.1f} {r.p50_us:>9.1f} {r.p95_us:>9.1f}"
+            f" {r.p99_us:>9.1f} {r.max_us:>9.1f} {r.peak_bytes:>9.0f} {r.retained_bytes:>7.0f}"
+            f" {r.retained_blocks:>7.1f}"
+        )
+
+
+def compare(reports: List[PlayerReport], baseline: dict, tolerance: float) -> List[str]:
+    """
+    :param baseline: A report written by --json
+    :param tolerance: Ratio to the baseline a metric can reach before it's a regression
+    :return: A description of each regression
+    """
+    previous: Dict[str, dict] = {r["player"]: r for r in baseline["players"]}
+    regressions = []
+    for report in reports:
+        before = previous.get(report.player)
+        if before is None:
+            continue
+        for metric in COMPARED:
+            was, now = before[metric], getattr(report, metric)
+            if was > 0 and now / was > tolerance:
+                regressions.append(f"{report.player} {metric} went from {was:.1f} to {now:.1f} ({now / was:.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--game", choices=sorted(all_games), required=True)
+    parser.add_argument(
+        "--player",
+        action="append",
+        choices=sorted(players_by_name),
+        help="Defaults to the game's player in all_players",
+    )
+    parser.add_argument("--positions", type=int, default=1000, help="Number of random positions to generate")
+    parser.add_argument("--replay", default=None, help="File of positions to show players instead of random ones")
+    parser.add_argument("--save", default=None, help="File to write the positions shown to players to")
+    parser.add_argument("--alloc-moves", type=int, default=200, help="Number of moves to measure allocations over")
+    parser.add_argument("--without-legal-moves", action="store_true", help="Don't send players the legal moves")
+    parser.add_argument("--json", default=None, help="File to write the report to as JSON, - for stdout")
+    parser.add_argument("--compare", default=None, help="Report written by --json to check for regressions against")
+    parser.add_argument("--tolerance", type=float, default=1.2, help="Ratio to the compared report that regresses")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    game_type = all_games[args.game]
+    names = args.player or [all_players[args.game].__name__]
+    for name in names:
+        if players_by_name[name].gamename != args.game:
+            parser.error(f"{name} plays {players_by_name[name].gamename}, not {args.game}")
+    positions = load_positions(args.replay) if args.replay else generate_positions(game_type, args.positions)
+    if args.save:
+        save_positions(args.save, positions)
+    reports = []
+    for name in names:
+        random.seed(args.seed)
+        reports.append(
+            benchmark_player(players_by_name[name], positions, not args.without_legal_moves, args.alloc_moves)
+        )
+    if args.json != "-":
+        print(f"{len(positions)} positions of {args.game}")
+        print_reports(reports)
+    if args.json:
+        document = {
+            "game": args.game,
+            "positions": len(positions),
+            "legal_moves": not args.without_legal_moves,
+            "python": platform.python_version(),
+            "players": [asdict(report) for report in reports],
+        }
+        if args.json == "-":
+            json.dump(document, sys.stdout, indent=2)
+            print()
+        else:
+            with open(args.json, "w") as f:
+                json.dump(document, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(reports, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Measures event loop lag while many rooms handle game updates concurrently
+
+Compares holding a blocking redis lock per update (how the broker used to serialize rooms)
+against the per-room actors now used by the broker.
+Runs against redorm's in-built fake redis so no redis server is needed::
+
+    python -m aiplayground.benchmarks.rooms --rooms 1,10,100,500
+"""
+import argparse
+import asyncio
+from statistics import mean
+from time import perf_counter
+from typing import List, Callable, Awaitable
+
+from redis.exceptions import LockError
+from redorm import red
+
+from aiplayground.utils.actors import RoomActors
+
+SEND_LATENCY = 0.001
+
+
+class LagMonitor:
+    """
+    Records how late the event loop wakes up a task that sleeps for a fixed interval
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.lags: List[float] = []
+        self.running = False
+
+    async def run(self) -> None:
+        self.running = True
+        while self.running:
+            start = perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(perf_counter() - start - self.interval)
+
+
+async def send() -> None:
+    # Stand in for awaiting a socket.io emit
+    await asyncio.sleep(SEND_LATENCY)
+
+
+async def redis_lock_update(room_id: str, actors: RoomActors) -> None:
+    try:
+        with red.client.lock(f"Room:userlock:{room_id}", timeout=0.5, sleep=0.02, thread_local=False):
+            await send()
+            await send()
+    except LockError:
+        # The loop was blocked for longer than the lock timeout, so another update took the lock
+        pass
+
+
+async def actor_update(room_id: str, actors: RoomActors) -> None:
+    async def update():
+        await send()
+        await send()
+
+    await actors.run(room_id, update)
+
+
+async def room_events(
+    room_id: str, updates: int, handler: Callable[[str, RoomActors], Awaitable[None]], actors: RoomActors
+) -> None:
+    for _ in range(updates):
+        await handler(room_id, actors)
+
+
+async def measure(rooms: int, updates: int, handler: Callable[[str, RoomActors], Awaitable[None]]) -> List[float]:
+    monitor = LagMonitor()
+    monitor_task = asyncio.ensure_future(monitor.run())
+    actors = RoomActors()
+    # Two concurrent event streams per room (eg. moves and game updates) so that rooms are contended
+    await asyncio.gather(
+        *[room_events(f"bench-{room}", updates, handler, actors) for room in range(rooms) for _stream in range(2)]
+    )
+    monitor.running = False
+    await monitor_task
+    return monitor.lags
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", default="1,10,100,500", help="Comma separated numbers of concurrent rooms")
+    parser.add_argument("--updates", type=int, default=5, help="Updates per event stream in each room")
+    parser.add_argument(
+        "--max-lock-rooms",
+        type=int,
+        default=10,
+        help="Largest number of rooms to run the redis lock strategy with, each contended update stalls it for 0.5s",
+    )
+    args = parser.parse_args()
+    print(f"{'rooms':>6} {'strategy':>11} {'mean lag ms':>12} {'max lag ms':>11}")
+    for rooms in (int(r) for r in args.rooms.split(",")):
+        for name, handler in (("redis lock", redis_lock_update), ("actors", actor_update)):
+            if handler is redis_lock_update and rooms > args.max_lock_rooms:
+                continue
+            lags = asyncio.get_event_loop().run_until_complete(measure(rooms, args.updates, handler))
+            print(f"{rooms:>6} {name:>11} {mean(lags) * 1000:>12.2f} {max(lags) * 1000:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Measures the search players' nodes per second and transposition table hit rate, and how often they beat random play
+
+Each player searches every position of some random games for a fixed time, keeping its table between the
+positions of a game as it would during play. Repeating ``--table-size`` compares tables of different sizes::
+
+    python -m aiplayground.benchmarks.search --games 5 --time 0.05
+    python -m aiplayground.benchmarks.search --player KalahaSearchPlayer --table-size 1024 --table-size 131072
+"""
+import argparse
+import random
+from typing import List, Optional, Tuple, Type
+
+from aiplayground.exceptions import GameCompleted
+from aiplayground.gameservers import all_games, BaseGameServer
+from aiplayground.players import all_players, players_by_name
+from aiplayground.players.search import SearchPlayer, SearchStats
+from aiplayground.runner import run
+from aiplayground.types import Board, GameRole, PlayerId
+
+SEARCH_PLAYERS = sorted(name for name, player in players_by_name.items() if issubclass(player, SearchPlayer))
+
+
+def random_game(game_type: Type[BaseGameServer]) -> List[Tuple[Board, Optional[GameRole]]]:
+    """
+    :return: The board and role to move of each position of a random game
+    """
+    game = game_type()
+    for player_id in ("first", "second"):
+        game.add_player(PlayerId(player_id))
+    game.start()
+    positions = []
+    while game.playing:
+        assert game.turn is not None
+        positions.append((game.show_board(), game.players[game.turn]))
+        legal_moves = game.legal_moves()
+        assert legal_moves
+        try:
+            game.move(game.turn, random.choice(legal_moves))
+        except GameCompleted:
+            game.playing = False
+    return positions
+
+
+def search_positions(
+    player_type: Type[SearchPlayer], games: List[List[Tuple[Board, Optional[GameRole]]]]
+) -> Tuple[SearchStats, int]:
+    """
+    :return: Totals of the stats of every search, and the number of searches
+    """
+    total = SearchStats()
+    searches = 0
+    player_id = PlayerId("searcher")
+    for positions in games:
+        player = player_type(player_id=player_id)
+        for board, role in positions:
+            player.gamerole = role
+            player.update(board=board, turn=player_id)
+            stats = player.stats
+            total.nodes += stats.nodes
+            total.seconds += stats.seconds
+            total.depth += stats.depth
+            total.iterations += stats.iterations
+            total.probes += stats.probes
+            total.hits += stats.hits
+            searches += 1
+    return total, searches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--player", action="append", choices=SEARCH_PLAYERS, help="Defaults to every search player")
+    parser.add_argument("--games", type=int, default=5, help="Number of random games to search the positions of")
+    parser.add_argument("--time", type=float, default=0.05, help="Seconds to search each position for")
+    parser.add_argument("--table-size", type=int, action="append", help="Entries in the transposition table")
+    parser.add_argument("--matches", type=int, default=10, help="Games against a random player in each seat")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    table_sizes = args.table_size or [SearchPlayer.table_size]
+    print(
+        f"{'player':>22} {'table':>8} {'nodes/s':>9} {'hit rate':>8} {'depth':>6} {'playouts':>9}"
+        f" {'wins':>5} {'draws':>5} {'losses':>6}"
+    )
+    for name in args.player or SEARCH_PLAYERS:
+        player_type: Type[SearchPlayer] = players_by_name[name]  # type: ignore
+        player_type.search_time = args.time
+        game_type = all_games[player_type.gamename]
+        games = [random_game(game_type) for _ in range(args.games)]
+        opponent = all_players[player_type.gamename]
+        for table_size in table_sizes:
+            player_type.table_size = table_size
+            stats, searches = search_positions(player_type, games)
+            wins = draws = losses = 0
+            if args.matches:
+                for seat, seats in enumerate([[player_type, opponent], [opponent, player_type]]):
+                    report = run(game_type, seats, args.matches)
+                    wins += report.wins[seat]
+                    draws += report.draws[seat]
+                    losses += report.losses[seat]
+            print(
+                f"{name:>22} {table_size:>8} {stats.nodes_per_second:>9.0f} {stats.hit_rate:>8.1%}"
+                f" {stats.depth / searches:>6.1f} {stats.iterations / searches:>9.0f}"
+                f" {wins:>5} {draws:>5} {losses:>6}"
+            )
+
+
+if __name__ == "__main__":
+    main()
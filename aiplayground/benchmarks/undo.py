@@ -0,0 +1,112 @@
+"""
+Measures the cost of trying a move and going back, as search players do, for each game
+
+Compares deep copying the game before each move against push_move/pop_move and clone, which
+``tests/test_undo.py`` checks against a game that was deep copied instead::
+
+    python -m aiplayground.benchmarks.undo --games 200
+"""
+import argparse
+import copy
+import random
+from time import perf_counter
+from typing import Callable, List, Type
+
+from aiplayground.exceptions import GameCompleted
+from aiplayground.gameservers import BaseGameServer, ScissorsPaperRockServer, TicTacToeServer, KalahaServer
+from aiplayground.gameservers.kalaha import FIRST_PIT, PITS, ROLE_INDEX
+from aiplayground.types import Move, PlayerId
+from aiplayground.utils.tictactoe import EMPTY_SQUARES, SQUARE_MOVES
+
+
+def spr_moves(game: ScissorsPaperRockServer) -> List[Move]:
+    return [Move({"move": move}) for move in game.move_map]
+
+
+def tictactoe_moves(game: TicTacToeServer) -> List[Move]:
+    return [Move(dict(SQUARE_MOVES[sq])) for sq in EMPTY_SQUARES[game.occupied]]
+
+
+def kalaha_moves(game: KalahaServer) -> List[Move]:
+    first = FIRST_PIT[ROLE_INDEX[game.players[game.turn]]]
+    return [Move({"move": pit}) for pit in range(PITS) if game.slots[first + pit]]
+
+
+GAMES = {
+    ScissorsPaperRockServer: spr_moves,
+    TicTacToeServer: tictactoe_moves,
+    KalahaServer: kalaha_moves,
+}
+
+
+def start(game_type: Type[BaseGameServer]) -> BaseGameServer:
+    game = game_type()
+    for player_id in ("first", "second"):
+        game.add_player(PlayerId(player_id))
+    game.start()
+    return game
+
+
+def state(game: BaseGameServer) -> tuple:
+    return game.show_board(), game.turn, game.movenumber, game.playing
+
+
+def tries_per_second(game_type: Type[BaseGameServer], games: int, try_move: Callable) -> float:
+    moves = GAMES[game_type]
+    positions = []
+    for _ in range(games):
+        game = start(game_type)
+        while game.playing:
+            positions.append((game.clone(), moves(game)))
+            try:
+                game.move(game.turn, random.choice(moves(game)))
+            except GameCompleted:
+                game.playing = False
+    tried = 0
+    started = perf_counter()
+    for game, legal in positions:
+        for move in legal:
+            try_move(game, move)
+        tried += len(legal)
+    return tried / (perf_counter() - started)
+
+
+def deepcopy_try(game: BaseGameServer, move: Move) -> None:
+    try:
+        copy.deepcopy(game).apply_move(game.turn, move)
+    except GameCompleted:
+        pass
+
+
+def push_pop_try(game: BaseGameServer, move: Move) -> None:
+    try:
+        game.push_move(game.turn, move)
+    except GameCompleted:
+        pass
+    game.pop_move()
+
+
+def clone_try(game: BaseGameServer, move: Move) -> None:
+    try:
+        game.clone().apply_move(game.turn, move)
+    except GameCompleted:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=200, help="Number of random games to try moves from")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    print(f"{'game':>18} {'deepcopy/s':>11} {'push/pop/s':>11} {'clone/s':>11} {'speedup':>8}")
+    for game_type in GAMES:
+        rates = [tries_per_second(game_type, args.games, f) for f in (deepcopy_try, push_pop_try, clone_try)]
+        print(
+            f"{game_type.gamename:>18} {rates[0]:>11.0f} {rates[1]:>11.0f} {rates[2]:>11.0f}"
+            f" {rates[1] / rates[0]:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Measures the cost of validating a move for each game
+
+Compares ``jsonschema.validate`` (which builds a validator and checks the schema against its meta-schema on
+every call, as moves were previously validated), the validator compiled once per game class, and the game's
+own fast validator, which ``tests/test_validation.py`` checks accept and reject the same sample moves::
+
+    python -m aiplayground.benchmarks.validation
+"""
+import argparse
+from timeit import Timer
+from typing import Callable, Any, Dict, List, Type
+
+import jsonschema
+
+from aiplayground.exceptions import IllegalMove
+from aiplayground.gameservers import BaseGameServer, ScissorsPaperRockServer, TicTacToeServer, KalahaServer
+from aiplayground.types import Move
+
+SAMPLE_MOVES: Dict[Type[BaseGameServer], List[Any]] = {
+    ScissorsPaperRockServer: [
+        {"move": "rock"},
+        {"move": "paper"},
+        {"move": "lizard"},
+        {"move": 1},
+        {"move": ["rock"]},
+        {"move": "rock", "extra": 1},
+        {},
+        "rock",
+        None,
+    ],
+    TicTacToeServer: [
+        {"row": 0, "col": 0},
+        {"row": 2, "col": 1},
+        {"row": 3, "col": 0},
+        {"row": -1, "col": 0},
+        {"row": "1", "col": 0},
+        {"row": True, "col": 0},
+        {"row": 1},
+        {"row": 1, "col": 1, "extra": 1},
+        [1, 1],
+    ],
+    KalahaServer: [
+        {"move": 0},
+        {"move": 5},
+        {"move": 6},
+        {"move": -1},
+        {"move": "3"},
+        {"move": None},
+        {"move": 1, "extra": 1},
+        {},
+        3,
+    ],
+}
+
+
+def schema_validate(game: Type[BaseGameServer], move: Move) -> None:
+    try:
+        jsonschema.validate(move, game.schema)
+    except jsonschema.ValidationError as e:
+        raise IllegalMove(details=e.message) from e
+
+
+def compiled_validate(game: Type[BaseGameServer], move: Move) -> None:
+    BaseGameServer.validate_move.__func__(game, move)  # type: ignore
+
+
+def fast_validate(game: Type[BaseGameServer], move: Move) -> None:
+    game.validate_move(move)
+
+
+def accepts(validate: Callable[[Type[BaseGameServer], Move], None], game: Type[BaseGameServer], move: Move) -> bool:
+    try:
+        validate(game, move)
+    except IllegalMove:
+        return False
+    return True
+
+
+def time_per_call(f: Callable[..., Any], *args) -> float:
+    timer = Timer(lambda: f(*args))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter).parse_args()
+    validators = {"jsonschema": schema_validate, "compiled": compiled_validate, "fast": fast_validate}
+    print(f"{'game':>18} {'move':>7} {'jsonschema us':>14} {'compiled us':>12} {'fast us':>8} {'speedup':>8}")
+    for game, moves in SAMPLE_MOVES.items():
+        # The first sample is legal and the third is not
+        for kind, move in (("legal", moves[0]), ("illegal", moves[2])):
+            times = {name: time_per_call(accepts, validate, game, move) * 1e6 for name, validate in validators.items()}
+            print(
+                f"{game.gamename:>18} {kind:>7} {times['jsonschema']:>14.1f} {times['compiled']:>12.1f}"
+                f" {times['fast']:>8.2f} {times['jsonschema'] / times['fast']:>7.0f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
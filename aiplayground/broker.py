@@ -1,5 +1,7 @@
+import asyncio
 from functools import partial
-from typing import Any, Dict, Tuple
+from secrets import compare_digest, token_urlsafe
+from typing import Any, Dict, List, Tuple, Callable, Awaitable, TypeVar, Set, Optional
 
 import socketio
 
@@ -28,7 +30,10 @@ from aiplayground.messages import (
     RegisterMessage,
     RoomCreatedMessage,
     JoinAcknowledgementMessage,
+    ResumeMessage,
+    ResumeRoomsMessage,
     SpectateMessage,
+    SpectatorStateMessage,
 )
 from aiplayground.types import (
     GameServerSID,
@@ -37,25 +42,75 @@ from aiplayground.types import (
     RoomId,
     PlayerId,
 )
-from aiplayground.utils.broker import get_room_player
-from aiplayground.utils.expect import expect
+from aiplayground.utils.actors import RoomActors
+from aiplayground.utils.aioredorm import ared
+from aiplayground.utils.broker import get_room_player, index_state_epoch, get_states_since
+from aiplayground.utils.cache import ModelCache
+from aiplayground.utils.expect import expect, log_validation_stats
+from aiplayground.utils.lobby import LobbyDirectory, LOBBY_SID
+from aiplayground.utils.wire import WireServer
 from aiplayground.logging import logger
 from redorm import InstanceNotFound
 
+T = TypeVar("T")
+
 # TODO: Confirm CORS isn't being problematic
 if settings.SOCKETIO_REDIS_URL is None:
-    sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
+    sio = WireServer(async_mode="asgi", cors_allowed_origins="*")
 else:
     logger.info("Creating Redis Manager")
     sio_manager = socketio.AsyncRedisManager(settings.SOCKETIO_REDIS_URL)
     logger.info("Creating Socketio Server")
-    sio = socketio.AsyncServer(async_mode="asgi", client_manager=sio_manager, cors_allowed_origins="*")
+    sio = WireServer(async_mode="asgi", client_manager=sio_manager, cors_allowed_origins="*")
     logger.info("Created Socketio Server")
 
 
 class GameBroker(socketio.AsyncNamespace):
+    cache: ModelCache
+    actors: RoomActors
+    trusted_sids: Set[GameServerSID]
+    lobby: LobbyDirectory
+
+    def __init__(self, namespace=None):
+        super().__init__(namespace)
+        self.cache = ModelCache()
+        self.actors = RoomActors()
+        self.trusted_sids = set()
+        self._stats_task: Optional[asyncio.Future] = None
+        # Rooms can only be shared between broker workers when they communicate through redis
+        self.shared_rooms = settings.SOCKETIO_REDIS_URL is not None
+        self.lobby = LobbyDirectory(self, shared=self.shared_rooms)
+
+    def is_trusted(self, sid: str) -> bool:
+        """
+        Whether messages from a connection only need a structural check, see :func:`expect`
+        """
+        return sid in self.trusted_sids
+
+    async def in_room(self, room_id: RoomId, f: Callable[[], Awaitable[T]]) -> T:
+        """
+        Runs f once all earlier events for the room have been handled
+        Also holds the room's redis lock if rooms are shared between broker workers
+        """
+        return await self.actors.run(room_id, partial(self._with_room_lock, room_id, f))
+
+    async def _with_room_lock(self, room_id: RoomId, f: Callable[[], Awaitable[T]]) -> T:
+        if not self.shared_rooms:
+            return await f()
+        try:
+            room = await self.cache.get(Room, room_id)
+        except InstanceNotFound:
+            return await f()
+        async with ared.lock(room, timeout=0.5):
+            # Any worker may have changed the room since it was cached, and reads it from redis once this is done
+            await self.cache.reload(Room, room_id)
+            try:
+                return await f()
+            finally:
+                await self.cache.flush_room(room_id)
+
     async def acknowledge_join(self, room_id: RoomId, player_id: PlayerId) -> None:
-        room = Room.get(room_id)
+        room = await self.cache.get(Room, room_id)
         await JoinAcknowledgementMessage(roomid=room_id, playerid=player_id).send(sio=self, to=room.server_sid)
 
     @expect(CreateRoomMessage)
@@ -63,9 +118,17 @@ class GameBroker(socketio.AsyncNamespace):
         """
         Server requests to create a game room
         """
-        room = Room.create(name=msg.name, game=msg.game, maxplayers=msg.maxplayers, server_sid=sid)
+        room = await self.cache.create(
+            Room,
+            name=msg.name,
+            game=msg.game,
+            maxplayers=msg.maxplayers,
+            server_sid=sid,
+            resume_key=token_urlsafe(16),
+        )
         logger.debug(f"Registered Gameserver with room: {room.id}")
-        await RoomCreatedMessage(roomid=room.id).send(self, to=sid)
+        await RoomCreatedMessage(roomid=room.id, resumekey=room.resume_key).send(self, to=sid)
+        await self.lobby.add(room)
 
     @expect(JoinMessage)
     async def on_join(self, sid: PlayerSID, msg: JoinMessage) -> None:
@@ -74,41 +137,58 @@ class GameBroker(socketio.AsyncNamespace):
         """
         # TODO: Fix join ID
         identity = {"id": "FIXME"}
-        player: Player = Player.create(
+        player: Player = await self.cache.create(
+            Player,
+            room_id=msg.roomid,
             name=msg.name,
             room=msg.roomid,
             user_id=identity["id"] if identity is not None else None,
             sid=sid,
+            resume_key=token_urlsafe(16),
         )
         logger.debug("Player requested to join a room")
         player_id = player.id
         try:
-            room: Room = Room.get(msg.roomid)
-        except InstanceNotFound as e:
-            raise NoSuchRoom from e
-        if room.status != "lobby":
-            raise GameAlreadyStarted
-        elif room.private:
-            raise NoSuchRoom
-        else:
-            logger.debug(f"Registering user")
-            await RegisterMessage(roomid=msg.roomid, playerid=player_id).send(self, to=room.server_sid)
+            try:
+                room: Room = await self.cache.get(Room, msg.roomid)
+            except InstanceNotFound as e:
+                raise NoSuchRoom from e
+            if room.status != "lobby":
+                raise GameAlreadyStarted
+            elif room.private:
+                raise NoSuchRoom
+        except (NoSuchRoom, GameAlreadyStarted) as e:
+            await self.cache.evict(Player, player_id)
+            # Joins aren't acknowledged, so the player is told which of its joins failed
+            await self.emit(
+                "fail",
+                {"error": e.__class__.__name__, "details": e.details, "roomid": msg.roomid, "name": msg.name},
+                room=sid,
+            )
+            raise
+        logger.debug(f"Registering user")
+        await RegisterMessage(roomid=msg.roomid, playerid=player_id).send(self, to=room.server_sid)
 
     @expect(JoinSuccessMessage)
     async def on_joinsuccess(self, sid: GameServerSID, msg: JoinSuccessMessage) -> None:
         """
         Server confirmed a player joining the lobby
         """
-        room, player = get_room_player(sid, msg.roomid, msg.playerid)
+        await self.in_room(msg.roomid, partial(self.join_room, sid, msg))
+
+    async def join_room(self, sid: GameServerSID, msg: JoinSuccessMessage) -> None:
+        room, player = await get_room_player(self.cache, sid, msg.roomid, msg.playerid)
         assert player is not None
-        player.update(joined=True, gamerole=msg.gamerole)
+        self.cache.update(player, joined=True, gamerole=msg.gamerole)
         self.enter_room(player.sid, room.broadcast_sid)
+        await self.lobby.player_joined(room.id)
         await JoinedMessage(
             roomid=msg.roomid,
             playerid=msg.playerid,
             name=player.name,
             gamerole=msg.gamerole,
             broadcast=False,
+            resumekey=player.resume_key,
         ).send(
             self,
             to=player.sid,
@@ -130,13 +210,14 @@ class GameBroker(socketio.AsyncNamespace):
         """
         Server responds that a player failed to join the lobby
         """
-        room, player = get_room_player(sid, msg.roomid, msg.playerid)
+        room, player = await get_room_player(self.cache, sid, msg.roomid, msg.playerid)
         assert player is not None
         await self.emit(
             "fail",
-            {"error": "registrationFailed", "reason": msg.reason},
+            {"error": "registrationFailed", "reason": msg.reason, "roomid": msg.roomid, "name": player.name},
             room=player.sid,
         )
+        await self.cache.evict(Player, player.id)
 
     @expect(GameUpdateMessage)
     async def on_gameupdate(self, sid: GameServerSID, msg: GameUpdateMessage) -> None:
@@ -151,70 +232,104 @@ class GameBroker(socketio.AsyncNamespace):
                 raise InputValidationError(details="error: 'playerid' cannot be provided unless visibility is private")
             if msg.epoch is None:
                 raise InputValidationError(details="error: 'epoch' is required for non-private messages")
-        room, player = get_room_player(sid, msg.roomid, msg.playerid)
-        with room.lock(timeout=0.5, sleep=0.02):
-            if msg.finish is not None:
-                logger.info("Game finished")
-                await GamestateMessage.parse_obj(msg.to_dict()).send(self, to=room.broadcast_sid)
-                room.update(status="finished")
-            new_status = "finished" if room.status == "finished" else "playing"
-            if msg.visibility == "private":
-                room.update(status=new_status, turn=msg.turn)
-                assert player is not None
-                await GamestateMessage(
+        await self.in_room(msg.roomid, partial(self.update_room, sid, msg))
+
+    async def update_room(self, sid: GameServerSID, msg: GameUpdateMessage) -> None:
+        room, player = await get_room_player(self.cache, sid, msg.roomid, msg.playerid)
+        if msg.finish is not None:
+            logger.info("Game finished")
+            await GamestateMessage.parse_obj(msg.dict()).send(self, to=room.broadcast_sid)
+            self.cache.update(room, status="finished")
+        new_status = "finished" if room.status == "finished" else "playing"
+        if msg.visibility == "private":
+            self.cache.update(room, status=new_status, turn=msg.turn)
+            assert player is not None
+            await GamestateMessage(
+                board=msg.board,
+                turn=msg.turn,
+                roomid=msg.roomid,
+                playerid=msg.playerid,
+                epoch=msg.epoch,
+                legalmoves=msg.legalmoves,
+                movetime=msg.movetime,
+                clocks=msg.clocks,
+            ).send(self, to=player.sid)
+        else:
+            if room.status == "finished":
+                self.cache.update(room, board=msg.board, turn=None)
+            else:
+                self.cache.update(room, status=new_status, turn=msg.turn)
+            if msg.visibility == "broadcast":
+                r = GamestateMessage(
                     board=msg.board,
                     turn=msg.turn,
                     roomid=msg.roomid,
                     playerid=msg.playerid,
                     epoch=msg.epoch,
-                ).send(self, to=player.sid)
-            else:
-                if room.status == "finished":
-                    room.update(board=msg.board, turn=None)
-                else:
-                    room.update(status=new_status, turn=msg.turn)
-                if msg.visibility == "broadcast":
-                    r = GamestateMessage(
-                        board=msg.board,
-                        turn=msg.turn,
-                        roomid=msg.roomid,
-                        playerid=msg.playerid,
-                        epoch=msg.epoch,
-                    )
-                    logger.debug(f"room.id={room.id}, room.broadcast_sid={room.broadcast_sid}")
-                    await r.send(sio=self, to=room.broadcast_sid)
-                try:
-                    state = GameState.get(msg.stateid)
-                    if state.room is not None and state.room.id != msg.roomid:
-                        raise InstanceNotFound
-                except InstanceNotFound:
-                    state_args = {
-                        "room_id": msg.roomid,
-                        "epoch": msg.epoch,
-                        "board": msg.board,
-                        "turn": msg.turn,
-                    }
-                    GameState.create(**{k: v for k, v in state_args.items() if v is None})
-                else:
-                    state.update(epoch=msg.epoch, board=msg.board, turn=msg.turn)
-                room.update(
-                    status=new_status,
-                    board=msg.board,
-                    turn=msg.turn,
+                    legalmoves=msg.legalmoves,
+                    movetime=msg.movetime,
+                    clocks=msg.clocks,
+                )
+                logger.debug(f"room.id={room.id}, room.broadcast_sid={room.broadcast_sid}")
+                await r.send(sio=self, to=room.broadcast_sid)
+            try:
+                if msg.stateid is None:
+                    raise InstanceNotFound
+                state = await self.cache.get(GameState, msg.stateid)
+                state_room = await self.cache.room_of(state)
+                if state_room is not None and state_room != msg.roomid:
+                    raise InstanceNotFound
+            except InstanceNotFound:
+                state_args = {
+                    "room": msg.roomid,
+                    "epoch": msg.epoch,
+                    "board": msg.board,
+                    "turn": msg.turn,
+                }
+                state = await self.cache.create(
+                    GameState, room_id=msg.roomid, **{k: v for k, v in state_args.items() if v is not None}
                 )
+            else:
+                self.cache.update(state, epoch=msg.epoch, board=msg.board, turn=msg.turn)
+            await index_state_epoch(room.id, state.id, msg.epoch)
+            await SpectatorStateMessage(
+                roomid=room.id,
+                stateid=state.id,
+                epoch=msg.epoch,
+                timestamp=state.timestamp,
+                move=state.move,
+                board=msg.board,
+                turn=msg.turn,
+                finish=msg.finish,
+            ).send(self, to=room.spectator_sid)
+            self.cache.update(
+                room,
+                status=new_status,
+                board=msg.board,
+                turn=msg.turn,
+            )
+        if room.status != "lobby":
+            await self.lobby.remove(room.id)
+        if room.status == "finished":
+            await self.cache.evict_room(room.id)
 
     @expect(MoveMessage)
     async def on_move(self, sid: PlayerSID, msg: MoveMessage) -> None:
         """
         Player sends a move request
         """
-        room, player = get_room_player(sid, msg.roomid, msg.playerid, check_server=False)
+        await self.in_room(msg.roomid, partial(self.forward_move, sid, msg))
+
+    async def forward_move(self, sid: PlayerSID, msg: MoveMessage) -> None:
+        room, player = await get_room_player(self.cache, sid, msg.roomid, msg.playerid, check_server=False)
         if room.status != "playing":
             raise GameNotRunning
         elif room.turn != msg.playerid:
             raise NotPlayersTurn
         else:
-            state = GameState.create(player_id=msg.playerid, room=msg.roomid, move=msg.move)
+            state = await self.cache.create(
+                GameState, room_id=msg.roomid, player_id=msg.playerid, room=msg.roomid, move=msg.move
+            )
             await PlayerMoveMessage(
                 roomid=msg.roomid,
                 playerid=msg.playerid,
@@ -222,57 +337,137 @@ class GameBroker(socketio.AsyncNamespace):
                 stateid=state.id,
             ).send(self, to=room.server_sid)
 
+    @expect(ResumeMessage)
+    async def on_resume(self, sid: PlayerSID, msg: ResumeMessage) -> Tuple[str, Dict[str, bool]]:
+        """
+        Player reconnected and asks to carry on playing in its room
+        """
+        resumed = await self.in_room(msg.roomid, partial(self.resume_player, sid, msg))
+        return "message", {"resumed": resumed}
+
+    async def resume_player(self, sid: PlayerSID, msg: ResumeMessage) -> bool:
+        """
+        Moves the player to its new connection and sends it the game states it missed
+        :return: Whether the player can carry on playing
+        """
+        try:
+            room = await self.cache.get(Room, msg.roomid)
+            player = await self.cache.get(Player, msg.playerid)
+        except InstanceNotFound:
+            return False
+        player_room = await self.cache.room_of(player)
+        if player.resume_key is None or not compare_digest(player.resume_key, msg.resumekey):
+            logger.warning(f"Player {msg.playerid} tried to resume with the wrong key")
+            return False
+        if (player_room is not None and player_room != room.id) or room.status == "finished":
+            return False
+        self.cache.update(player, sid=sid)
+        self.enter_room(sid, room.broadcast_sid)
+        # Missed states are read from redis, so they must include any unflushed changes
+        await self.cache.flush_room(room.id)
+        states, _ = await get_states_since(room.id, msg.epoch, settings.SPECTATE_MAX_PAGE_SIZE)
+        missed = [(state.board, state.turn, state.epoch) for state in states if state.board is not None]
+        if not missed and msg.epoch is not None and room.turn == player.id and room.board is not None:
+            # The player's move for the last state it received may have been lost while it was disconnected
+            missed.append((room.board, room.turn, msg.epoch))
+        for board, turn, epoch in missed:
+            # Addressed to the player, as other players on its connection may be in the same room
+            await GamestateMessage(board=board, turn=turn, roomid=room.id, playerid=player.id, epoch=epoch).send(
+                self, to=sid
+            )
+        logger.info(f"Player {player.id} resumed playing in room {room.id} after epoch {msg.epoch}")
+        return True
+
+    @expect(ResumeRoomsMessage)
+    async def on_resumerooms(self, sid: GameServerSID, msg: ResumeRoomsMessage) -> Tuple[str, Dict[str, List[RoomId]]]:
+        """
+        Game server reconnected and asks to carry on hosting its rooms
+        """
+        resumed = await asyncio.gather(
+            *[self.in_room(room_id, partial(self.resume_room, sid, room_id, key)) for room_id, key in msg.rooms.items()]
+        )
+        return "message", {"rooms": [room_id for room_id, ok in zip(msg.rooms, resumed) if ok]}
+
+    async def resume_room(self, sid: GameServerSID, room_id: RoomId, resume_key: str) -> bool:
+        """
+        Moves a room to the game server's new connection
+        :return: Whether the game server can carry on hosting the room
+        """
+        try:
+            room = await self.cache.get(Room, room_id)
+        except InstanceNotFound:
+            return False
+        if room.resume_key is None or not compare_digest(room.resume_key, resume_key):
+            logger.warning(f"Game server tried to resume room {room_id} with the wrong key")
+            return False
+        if room.status == "finished":
+            return False
+        self.cache.update(room, server_sid=sid)
+        logger.info(f"Game server resumed hosting room {room_id}")
+        return True
+
     @expect(ListMessage)
     async def on_list(self, sid: PlayerSID, msg: ListMessage) -> Tuple[str, Dict[RoomId, Dict[str, Any]]]:
-        return (
-            "message",
-            {
-                room.id: {
-                    "name": room.name,
-                    "game": room.game,
-                    "maxplayers": room.maxplayers,
-                    "players": len(room.players),
-                    "status": room.status,
-                }
-                for room in Room.list(status="lobby", private=False)
-            },
-        )
+        """
+        Player requests the lobby directory, optionally subscribing to changes to it
+        """
+        # Subscribe before taking the snapshot so no change is missed
+        if msg.subscribe:
+            self.enter_room(sid, LOBBY_SID)
+        else:
+            self.leave_room(sid, LOBBY_SID)
+        return "message", await self.lobby.snapshot()
 
     @expect(SpectateMessage)
     async def on_spectate(self, sid: SpectatorSID, msg: SpectateMessage) -> Tuple[str, Dict]:
-        room, _ = get_room_player(sid, msg.roomid, None, check_server=False)
+        room, _ = await get_room_player(self.cache, sid, msg.roomid, None, check_server=False)
+        # Spectators read states directly from redis, so they must include any unflushed changes
+        await self.cache.flush_room(room.id)
+        # Subscribe before reading so no state is missed, states in both are deduplicated by epoch
         self.enter_room(sid, room.broadcast_sid)
         self.enter_room(sid, room.spectator_sid)
+        players, (states, more) = await asyncio.gather(
+            ared.related(room, "players"), get_states_since(room.id, msg.since_epoch, msg.limit)
+        )
         return (
             "message",
             {
                 "board": room.board,
                 "status": room.status,
-                "players": {player.id: player.name for player in room.players},
+                "players": {player.id: player.name for player in players},
                 "turn": room.turn,
                 "states": [
-                    {
-                        "id": state.id,
-                        "timestamp": state.timestamp.isoformat(),
-                        "epoch": state.epoch,
-                        "move": state.move,
-                        "board": state.board,
-                        "turn": state.turn,
-                    }
-                    for state in room.states
+                    SpectatorStateMessage(
+                        roomid=room.id,
+                        stateid=state.id,
+                        epoch=state.epoch,
+                        timestamp=state.timestamp,
+                        move=state.move,
+                        board=state.board,
+                        turn=state.turn,
+                    ).to_dict()
+                    for state in states
                 ],
+                "more": more,
             },
         )
 
     async def on_connect(self, sid, environ):
+        self.cache.start()
+        if settings.VALIDATION_STATS_INTERVAL is not None and self._stats_task is None:
+            self._stats_task = asyncio.ensure_future(log_validation_stats(settings.VALIDATION_STATS_INTERVAL))
         headers = {k.decode(): v.decode() for k, v in environ["asgi.scope"]["headers"]}
         if headers.get("x-role") == "gameserver":
+            if settings.GAMESERVER_KEY is not None and compare_digest(
+                headers.get("x-api-key", ""), settings.GAMESERVER_KEY
+            ):
+                self.trusted_sids.add(sid)
             await self.save_session(sid, {"role": "gameserver"})
             return
         else:
             try:
                 api_key = headers["x-api-key"]
-                bot = Bot.get(api_key=api_key)
+                bot = await ared.get(Bot, api_key=api_key)
                 await self.save_session(sid, {"role": "player", "id": bot.id, "name": bot.name})
                 return
             except KeyError:
@@ -289,5 +484,8 @@ class GameBroker(socketio.AsyncNamespace):
                 )
             await self.disconnect(sid)
 
+    async def on_disconnect(self, sid):
+        self.trusted_sids.discard(sid)
+
 
 sio.register_namespace(GameBroker())
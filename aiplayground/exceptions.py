@@ -115,6 +115,14 @@ class IllegalMove(AsimovServerError):
     details = "Player attempted a move that is not a legal move"
 
 
+class OutOfTime(AsimovPlayerError):
+    """
+    Raised by gameserver
+    """
+
+    details = "Player ran out of time to move"
+
+
 class InputValidationError(AsimovErrorBase):
     """
     Raised by player, broker or gameserver if json schema fails validation
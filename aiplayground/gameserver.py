@@ -1,9 +1,8 @@
 import json
 import asyncio
+from functools import partial
 from enum import Enum, auto
-from threading import Lock
-from time import sleep
-from typing import Optional
+from typing import Dict, List, Optional, Set, Tuple
 
 import socketio
 from socketio.exceptions import ConnectionError
@@ -13,6 +12,7 @@ from aiplayground.exceptions import (
     ExistingPlayer,
     GameCompleted,
     IllegalMove,
+    OutOfTime,
 )
 from aiplayground.gameservers import all_games, BaseGameServer
 from aiplayground.logging import logger
@@ -25,12 +25,16 @@ from aiplayground.messages import (
     JoinAcknowledgementMessage,
     GameUpdateMessage,
     PlayerMoveMessage,
+    ResumeRoomsMessage,
     Finish,
 )
 from aiplayground.settings import settings
-from aiplayground.types import GameName, RoomName, RoomId, TournamentKey
+from aiplayground.types import GameName, RoomName, RoomId, TournamentKey, Move, PlayerId
+from aiplayground.utils.actors import RoomActors
 from aiplayground.utils.atomic import AtomicCounter
+from aiplayground.utils.clocks import GameClock, TimeControl
 from aiplayground.utils.expect import expect
+from aiplayground.utils.wire import WireClient
 
 
 class GameServerState(Enum):
@@ -41,129 +45,336 @@ class GameServerState(Enum):
     FINISHED = auto()
 
 
-class GameServer(socketio.AsyncClientNamespace):
+class GameRoom:
+    """
+    A room hosted by a GameServer and the game being played in it
+    """
+
     game: BaseGameServer
+    room_id: RoomId
+    player_counter: AtomicCounter
+    clock: Optional[GameClock] = None
+    resume_key: Optional[str] = None
+
+    def __init__(self, game: BaseGameServer, room_id: RoomId, resume_key: Optional[str] = None):
+        self.game = game
+        self.room_id = room_id
+        self.resume_key = resume_key
+        self.player_counter = AtomicCounter()
+
+
+class GameServer(socketio.AsyncClientNamespace):
+    """
+    Hosts up to max_rooms games at once over a single connection to the broker, a new room is
+    created whenever one finishes
+
+    Events for a room are handled one at a time in the order they arrive, events for different
+    rooms are handled concurrently.
+    Players that run out of time to move, as set by the game's time control or the move and game
+    time limits, lose the game.
+    After reconnecting, the game server carries on hosting the rooms it had, and resends the state of each
+    running game so that moves lost while disconnected are made again.
+    """
+
     game_name: GameName
     name: RoomName
-    lock: Lock
-    room_id: Optional[RoomId]
-    player_counter: AtomicCounter
+    rooms: Dict[RoomId, GameRoom]
+    max_rooms: int
+    pending_rooms: int
+    actors: RoomActors
+    clock_tasks: Set[asyncio.Future]
     api_key: TournamentKey
+    send_legal_moves: bool
+    move_time_limit: Optional[float]
+    game_time_limit: Optional[float]
 
-    def __init__(self, gamename=settings.GAME, name=settings.LOBBY_NAME, api_key=settings.API_KEY):
+    def __init__(
+        self,
+        gamename=settings.GAME,
+        name=settings.LOBBY_NAME,
+        api_key=settings.API_KEY,
+        max_rooms=settings.MAX_ROOMS,
+        send_legal_moves=settings.SEND_LEGAL_MOVES,
+        move_time_limit=settings.MOVE_TIME_LIMIT,
+        game_time_limit=settings.GAME_TIME_LIMIT,
+    ):
         super().__init__()
-        self.game = all_games[gamename]()
         self.game_name = gamename
         self.name = name
         self.api_key = api_key
-        self.player_counter = AtomicCounter()
-        self.lock = Lock()
+        self.max_rooms = max_rooms
+        self.send_legal_moves = send_legal_moves
+        self.move_time_limit = move_time_limit
+        self.game_time_limit = game_time_limit
+        self.rooms = dict()
+        self.pending_rooms = 0
+        self.rooms_created = 0
+        self.actors = RoomActors()
+        self.clock_tasks = set()
 
     async def initialize(self):
-        self.player_counter.set(0)
-        await CreateRoomMessage(name=self.name, game=self.game_name, maxplayers=self.game.max_players).send(sio=self)
+        """
+        Requests rooms from the broker until max_rooms are hosted or being created
+        """
+        max_players = all_games[self.game_name].max_players
+        while len(self.rooms) + self.pending_rooms < self.max_rooms:
+            self.pending_rooms += 1
+            self.rooms_created += 1
+            name = self.name if self.max_rooms == 1 else RoomName(f"{self.name} ({self.rooms_created})")
+            await CreateRoomMessage(name=name, game=self.game_name, maxplayers=max_players).send(sio=self)
 
     async def on_connect(self):
-        with self.lock:
-            # TODO: Handle reconnection properly
-            logger.info("Connected")
-            await self.initialize()
+        resumable = {room_id: room.resume_key for room_id, room in self.rooms.items() if room.resume_key is not None}
+        if resumable:
+            logger.info(f"Reconnected, resuming {len(resumable)} rooms")
+            await ResumeRoomsMessage(rooms=resumable).send(sio=self, callback=self.resume_callback)
+            return
+        logger.info("Connected")
+        self.rooms = dict()
+        self.pending_rooms = 0
+        await self.initialize()
+
+    async def resume_callback(self, data: Dict[str, List[RoomId]]):
+        resumed = set(data["rooms"])
+        for room_id, room in list(self.rooms.items()):
+            if room_id in resumed:
+                await self.actors.run(room_id, partial(self.resend_state, room))
+            else:
+                logger.warning(f"Couldn't resume room {room_id}")
+                if room.clock is not None:
+                    room.clock.cancel()
+                self.rooms.pop(room_id, None)
+        # Confirmations of rooms being created when the connection dropped were sent to the old connection
+        self.pending_rooms = 0
+        await self.initialize()
+
+    async def resend_state(self, room: GameRoom):
+        """
+        Sends the state of a running game again, as the move may have been lost
+        The current move's clock keeps running, so reconnecting doesn't give a player more time
+        """
+        game = room.game
+        if not game.playing:
+            return
+        clock = room.clock
+        if clock is not None and game.turn is not None and clock.player_id == game.turn:
+            movetime, clocks = clock.time_left(), clock.clocks()
+        else:
+            movetime, clocks = self.time_move(room)
+        await GameUpdateMessage(
+            visibility="broadcast",
+            roomid=room.room_id,
+            board=game.show_board(),
+            turn=game.turn,
+            epoch=game.movenumber,
+            legalmoves=self.legal_moves(room),
+            movetime=movetime,
+            clocks=clocks,
+        ).send(sio=self)
+
+    def legal_moves(self, room: GameRoom) -> Optional[List[Move]]:
+        """
+        Legal moves to send with a game update, if enabled, they're generated once per move and reused to validate it
+        """
+        return room.game.legal_moves() if self.send_legal_moves else None
+
+    def time_control(self, game: BaseGameServer) -> TimeControl:
+        """
+        The game's time control, with any limits set for the game server instead
+        """
+        return TimeControl(
+            move=game.time_control.move if self.move_time_limit is None else self.move_time_limit,
+            total=game.time_control.total if self.game_time_limit is None else self.game_time_limit,
+        )
+
+    def time_move(self, room: GameRoom) -> Tuple[Optional[float], Optional[Dict[PlayerId, float]]]:
+        """
+        Starts timing the move of the player who's turn it is, if the room's game is timed
+        :return: Seconds allowed for the move and each player's remaining time, to send with the game update
+        """
+        clock = room.clock
+        turn = room.game.turn
+        if clock is None or turn is None:
+            return None, None
+        movetime = clock.start(turn, partial(self.clock_expired, room, room.game.movenumber))
+        return movetime, clock.clocks()
+
+    def clock_expired(self, room: GameRoom, epoch: int):
+        task = asyncio.ensure_future(self.actors.run(room.room_id, partial(self.check_clock, room, epoch)))
+        self.clock_tasks.add(task)
+        task.add_done_callback(partial(self.clock_checked, room))
+
+    def clock_checked(self, room: GameRoom, task: asyncio.Future):
+        """
+        Stops hosting a room if forfeiting the game of a player who ran out of time failed, as nothing else would end it
+        """
+        self.clock_tasks.discard(task)
+        if task.cancelled() or task.exception() is None:
+            return
+        logger.error(f"Checking the clock in room {room.room_id} failed", exc_info=task.exception())
+        if self.rooms.get(room.room_id) is room:
+            finishing = asyncio.ensure_future(self.actors.run(room.room_id, partial(self.finished, room)))
+            self.clock_tasks.add(finishing)
+            finishing.add_done_callback(self.clock_tasks.discard)
+
+    async def check_clock(self, room: GameRoom, epoch: int):
+        game = room.game
+        # The move may have been made while this was waiting for the room
+        if self.rooms.get(room.room_id) is not room or not game.playing or game.movenumber != epoch:
+            return
+        assert game.turn is not None
+        logger.info(f"Player {game.turn} ran out of time in room {room.room_id}")
+        await self.forfeit(room, game.turn, OutOfTime.details)
 
     @expect(JoinAcknowledgementMessage)
     async def on_joinacknowledgement(self, msg: JoinAcknowledgementMessage):
-        if self.room_id is None:
+        room = self.rooms.get(msg.roomid)
+        if room is None:
             return
-        count = self.player_counter.increment_then_get()
-        if count == self.game.max_players:
-            self.game.start()
+        await self.actors.run(room.room_id, partial(self.acknowledge_join, room))
+
+    async def acknowledge_join(self, room: GameRoom):
+        count = room.player_counter.increment_then_get()
+        if count == room.game.max_players:
+            room.game.start()
+            time_control = self.time_control(room.game)
+            if time_control.enabled:
+                room.clock = GameClock(time_control, room.game.players)
+            movetime, clocks = self.time_move(room)
             await GameUpdateMessage(
                 visibility="broadcast",
-                roomid=self.room_id,
-                board=self.game.show_board(),
-                turn=self.game.turn,
-                epoch=self.game.movenumber,
+                roomid=room.room_id,
+                board=room.game.show_board(),
+                turn=room.game.turn,
+                epoch=room.game.movenumber,
+                legalmoves=self.legal_moves(room),
+                movetime=movetime,
+                clocks=clocks,
             ).send(sio=self)
 
     @expect(RoomCreatedMessage)
     async def on_roomcreated(self, msg: RoomCreatedMessage):
         """
-        Receives confirmation that a roomcreated was created
+        Receives confirmation that a room was created
         """
-        logger.warning("Got created getting lock")
-        with self.lock:
-            logger.warning("Successfully created room")
-            self.room_id = msg.roomid
+        logger.info(f"Successfully created room {msg.roomid}")
+        self.pending_rooms = max(self.pending_rooms - 1, 0)
+        self.rooms[msg.roomid] = GameRoom(
+            game=all_games[self.game_name](), room_id=msg.roomid, resume_key=msg.resumekey
+        )
 
     @expect(RegisterMessage)
     async def on_register(self, msg: RegisterMessage):
         """
         Player requests to join a lobby
         """
-        with self.lock:
-            try:
-                gamerole = self.game.add_player(msg.playerid)
-                # Game is not ready to start
-                await JoinSuccessMessage(playerid=msg.playerid, roomid=msg.roomid, gamerole=gamerole).send(sio=self)
+        room = self.rooms.get(msg.roomid)
+        if room is None:
+            logger.warning(f"Player tried to join unknown room {msg.roomid}")
+            await JoinFailMessage(playerid=msg.playerid, roomid=msg.roomid, reason="Unknown room").send(sio=self)
+            return
+        await self.actors.run(room.room_id, partial(self.register, room, msg))
+
+    async def register(self, room: GameRoom, msg: RegisterMessage):
+        try:
+            gamerole = room.game.add_player(msg.playerid)
+            # Game is not ready to start
+            await JoinSuccessMessage(playerid=msg.playerid, roomid=msg.roomid, gamerole=gamerole).send(sio=self)
 
-            except (GameFull, ExistingPlayer) as e:
-                logger.warning(f"Player failed to join with error: {e}")
-                await JoinFailMessage(playerid=msg.playerid, roomid=msg.roomid, reason=repr(e)).send(sio=self)
+        except (GameFull, ExistingPlayer) as e:
+            logger.warning(f"Player failed to join with error: {e}")
+            await JoinFailMessage(playerid=msg.playerid, roomid=msg.roomid, reason=repr(e)).send(sio=self)
 
     @expect(PlayerMoveMessage)
     async def on_playermove(self, msg: PlayerMoveMessage):
         """
         Player sends a move
         """
-        with self.lock:
-            assert self.room_id is not None
-            try:
-                logger.debug("Starting player move")
-                self.game.move(msg.playerid, msg.move)
-                logger.debug("Finished player move")
-                await GameUpdateMessage(
-                    visibility="broadcast",
-                    roomid=msg.roomid,
-                    board=self.game.show_board(),
-                    turn=self.game.turn,
-                    epoch=self.game.movenumber,
-                    stateid=msg.stateid,
-                ).send(sio=self)
-            except GameCompleted:
-                self.game.playing = False
-                await GameUpdateMessage(
-                    visibility="broadcast",
-                    roomid=msg.roomid,
-                    board=self.game.show_board(),
-                    turn=None,
-                    epoch=self.game.movenumber,
-                    stateid=msg.stateid,
-                    finish=Finish(
-                        normal=True,
-                        scores=self.game.score(),
-                    ),
-                ).send(sio=self)
-
-                if settings.RUN_ONCE:
-                    await self.disconnect()
-                else:
-                    self.game = all_games[self.game_name]()
-                    await self.initialize()
-
-            except IllegalMove as e:
-                logger.exception(e)
-                await GameUpdateMessage(
-                    roomid=self.room_id,
-                    visibility="broadcast",
-                    epoch=self.game.movenumber,
-                    board=self.game.show_board(),
-                    turn=None,
-                    finish=Finish(
-                        normal=False,
-                        reason=e.details,
-                        fault=msg.playerid,
-                        scores={p: (-1 if p == msg.playerid else 1) for p in self.game.players},
-                    ),
-                ).send(sio=self)
+        room = self.rooms.get(msg.roomid)
+        if room is None:
+            logger.warning(f"Received move for unknown room {msg.roomid}")
+            return
+        await self.actors.run(room.room_id, partial(self.play_move, room, msg))
+
+    async def play_move(self, room: GameRoom, msg: PlayerMoveMessage):
+        if self.rooms.get(room.room_id) is not room:
+            # The game finished, such as by a player running out of time, while the move was waiting
+            return
+        game = room.game
+        try:
+            if room.clock is not None:
+                room.clock.stop(msg.playerid)
+            logger.debug("Starting player move")
+            game.move(msg.playerid, msg.move)
+            logger.debug("Finished player move")
+            movetime, clocks = self.time_move(room)
+            await GameUpdateMessage(
+                visibility="broadcast",
+                roomid=msg.roomid,
+                board=game.show_board(),
+                turn=game.turn,
+                epoch=game.movenumber,
+                stateid=msg.stateid,
+                legalmoves=self.legal_moves(room),
+                movetime=movetime,
+                clocks=clocks,
+            ).send(sio=self)
+        except GameCompleted:
+            game.playing = False
+            await GameUpdateMessage(
+                visibility="broadcast",
+                roomid=msg.roomid,
+                board=game.show_board(),
+                turn=None,
+                epoch=game.movenumber,
+                stateid=msg.stateid,
+                finish=Finish(
+                    normal=True,
+                    scores=game.score(),
+                ),
+            ).send(sio=self)
+            await self.finished(room)
+
+        except IllegalMove as e:
+            logger.exception(e)
+            await self.forfeit(room, msg.playerid, e.details)
+
+        except OutOfTime as e:
+            logger.info(f"Player {msg.playerid} ran out of time in room {room.room_id}")
+            await self.forfeit(room, msg.playerid, e.details)
+
+    async def forfeit(self, room: GameRoom, player_id: PlayerId, reason: str):
+        """
+        Ends a game abnormally, with the player at fault losing
+        """
+        game = room.game
+        game.playing = False
+        await GameUpdateMessage(
+            roomid=room.room_id,
+            visibility="broadcast",
+            epoch=game.movenumber,
+            board=game.show_board(),
+            turn=None,
+            finish=Finish(
+                normal=False,
+                reason=reason,
+                fault=player_id,
+                scores={p: (-1 if p == player_id else 1) for p in game.players},
+            ),
+        ).send(sio=self)
+        await self.finished(room)
+
+    async def finished(self, room: GameRoom):
+        """
+        Stops hosting a finished room, then either replaces it or disconnects once all rooms have finished
+        """
+        if room.clock is not None:
+            room.clock.cancel()
+        self.rooms.pop(room.room_id, None)
+        if not settings.RUN_ONCE:
+            await self.initialize()
+        elif not self.rooms and not self.pending_rooms:
+            await self.disconnect()
 
     async def on_fail(self, data):
         logger.error("error received:\n" + json.dumps(data, indent=2))
@@ -172,7 +383,7 @@ class GameServer(socketio.AsyncClientNamespace):
 async def main():
     for i in range(settings.CONNECTION_RETRIES):
         try:
-            sio = socketio.AsyncClient(reconnection_attempts=settings.CONNECTION_RETRIES)
+            sio = WireClient(reconnection_attempts=settings.CONNECTION_RETRIES, wire_format=settings.WIRE_FORMAT)
             server = GameServer()
             sio.register_namespace(server)
             await sio.connect(settings.ASIMOV_URL, headers={"X-ROLE": "gameserver", "X-API-KEY": settings.API_KEY})
@@ -180,7 +391,7 @@ async def main():
             break
         except ConnectionError:
             print(f"Connection failed (attempt {i + 1} of {settings.CONNECTION_RETRIES}), waiting 2 secs...")
-            sleep(2)
+            await asyncio.sleep(2)
 
 
 if __name__ == "__main__":
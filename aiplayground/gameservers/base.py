@@ -1,9 +1,12 @@
+import copy
 from abc import ABC, abstractmethod
-from typing import Optional, Dict
+from typing import Optional, Dict, ClassVar, Any, List, Tuple, Set, Hashable
 
-from jsonschema import validate, ValidationError
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
 
 from aiplayground.exceptions import (
+    GameCompleted,
     GameFull,
     ExistingPlayer,
     NotPlayersTurn,
@@ -11,6 +14,17 @@ from aiplayground.exceptions import (
     IllegalMove,
 )
 from aiplayground.types import GameRole, PlayerId, Board, Move
+from aiplayground.utils.clocks import TimeControl
+
+
+def compile_schema(schema: dict) -> Any:
+    """
+    Checks a move schema against its meta-schema and returns a validator for it,
+    so the work ``jsonschema.validate`` repeats on every call is done once per game
+    """
+    cls = validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
 
 
 class BaseGameServer(ABC):
@@ -24,11 +38,37 @@ class BaseGameServer(ABC):
     gamename: str = "BaseGame"
     description: str = "A base game"
     schema: dict = {}
+    move_validator: ClassVar[Any]
+    history: List[Any]
+    legal_cache: Optional[Tuple[int, Optional[List[Move]], Optional[Set[Hashable]]]] = None
+    # Time limits enforced by a GameServer hosting the game, unlimited unless a game or the GameServer sets them
+    time_control: TimeControl = TimeControl()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.move_validator = compile_schema(cls.schema)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.players = dict()
         self.roles = dict()
+        self.history = []
+
+    @classmethod
+    def from_board(cls, board: Board, roles: Dict[GameRole, PlayerId], turn: Optional[PlayerId]):
+        """
+        Creates a running game in the state a player was sent, eg. for a player to search from
+        :param board: Board as returned by show_board
+        :param roles: Player ID for each role
+        :param turn: ID of the player whose turn it is
+        """
+        game = cls()
+        game.roles = dict(roles)
+        game.players = {player_id: role for role, player_id in roles.items()}
+        game.playing = True
+        game.board = copy.deepcopy(board)
+        game.turn = turn
+        return game
 
     def add_player(self, player_id: PlayerId) -> Optional[GameRole]:
         if player_id in self.players:
@@ -41,22 +81,127 @@ class BaseGameServer(ABC):
         return None
 
     def move(self, player_id: PlayerId, move: Move) -> Board:
+        self.apply_move(player_id, move)
+        board = self.show_board()
+        assert board is not None
+        return board
+
+    def apply_move(self, player_id: PlayerId, move: Move) -> None:
+        """
+        Makes a move without building the board to return
+        :raises GameCompleted: If the move ended the game
+        """
         if not self.playing:
             raise GameNotRunning
         if player_id != self.turn:
             raise NotPlayersTurn
-        try:
-            validate(move, self.schema)
-        except ValidationError as e:
-            raise IllegalMove(details=e.message) from e
+        self.legal_moves()
+        assert self.legal_cache is not None
+        legal = self.legal_cache[2]
+        if legal is None:
+            self.validate_move(move)
+        elif self.move_key(move) not in legal:
+            # Malformed moves get the schema's error message
+            self.validate_move(move)
+            raise IllegalMove(details=f"Move {move!r} is not legal, legal moves are {self.legal_cache[1]!r}")
         self.movenumber += 1
         self.make_move(player_id=player_id, player_role=self.players.get(player_id), move=move)
-        board = self.show_board()
-        assert board is not None
-        return board
+
+    def push_move(self, player_id: PlayerId, move: Move) -> None:
+        """
+        Makes a move that can be undone with pop_move, the game stops playing if the move ends it
+        :raises GameCompleted: If the move ended the game, it can still be undone
+        :raises IllegalMove: If the move is illegal, in which case the game is left unchanged
+        """
+        # The legal moves are kept with the state, so they aren't generated again after pop_move
+        self.legal_moves()
+        state = self.snapshot()
+        legal_cache = self.legal_cache
+        try:
+            self.apply_move(player_id, move)
+        except GameCompleted:
+            self.playing = False
+            self.history.append((state, legal_cache))
+            raise
+        except Exception:
+            self.restore(state)
+            self.legal_cache = legal_cache
+            raise
+        self.history.append((state, legal_cache))
+
+    def pop_move(self) -> None:
+        """
+        Undoes the last move made with push_move
+        """
+        state, self.legal_cache = self.history.pop()
+        self.restore(state)
+
+    def snapshot(self) -> Any:
+        """
+        Returns the state of the game, that restore() can return it to
+        Games should override this and restore() with a cheap immutable copy of the state that changes during play
+        """
+        return copy.deepcopy({k: v for k, v in vars(self).items() if k not in ("history", "legal_cache")})
+
+    def restore(self, state: Any) -> None:
+        # Copied so the same state can be restored more than once
+        vars(self).update(copy.deepcopy(state))
+
+    def clone(self):
+        """
+        Returns an independent copy of the game, without the moves that can be undone
+        """
+        game = copy.copy(self)
+        game.players = dict(self.players)
+        game.roles = dict(self.roles)
+        game.history = []
+        game.restore(self.snapshot())
+        return game
+
+    def legal_moves(self) -> Optional[List[Move]]:
+        """
+        Returns the legal moves of the player whose turn it is, generated once per move number
+        Moves are validated by looking them up in these, so neither the list nor the moves in it (which games may
+        share between every game) must be modified
+        :return: The legal moves, or None if the game doesn't generate them
+        """
+        cache = self.legal_cache
+        if cache is None or cache[0] != self.movenumber:
+            moves = self.generate_legal_moves()
+            keys = None if moves is None else {self.move_key(move) for move in moves}
+            cache = self.legal_cache = (self.movenumber, moves, keys)
+        return cache[1]
+
+    def generate_legal_moves(self) -> Optional[List[Move]]:
+        """
+        Can be overridden to list the legal moves of the player whose turn it is, along with move_key
+        Games that don't are validated against their schema and rules as moves are made
+        """
+        return None
+
+    @classmethod
+    def move_key(cls, move: Move) -> Hashable:
+        """
+        Returns a hashable key identifying a move, or None if the move is malformed
+        Must distinguish every legal move, and never be None for one
+        """
+        return None
+
+    @classmethod
+    def validate_move(cls, move: Move) -> None:
+        """
+        Checks a move against the game's schema using the validator compiled for the class
+        Games can override this with a cheaper check of well formed moves, which must accept exactly the moves the
+        schema does, and call this for anything else so the error message comes from the schema
+        :raises IllegalMove: If the move doesn't match the schema
+        """
+        error = best_match(cls.move_validator.iter_errors(move))
+        if error is not None:
+            raise IllegalMove(details=error.message) from error
 
     def start(self):
         self.playing = True
+        self.legal_cache = None
         self.init_game()
 
     @abstractmethod
@@ -0,0 +1,194 @@
+"""
+Kalaha and tic tac toe rules for many games at once, stepped in lockstep with NumPy (``pip install aiplayground[batched]``)
+
+Each game in a batch is a row of the batch's arrays, roles are referred to by index (``ROLES``) rather than player ID,
+and every step applies one move to each game that hasn't finished. The rules match ``KalahaServer`` and
+``TicTacToeServer`` move for move.
+"""
+from abc import ABC, abstractmethod
+from typing import Dict, Mapping, Tuple
+
+import numpy as np
+
+from aiplayground.exceptions import IllegalMove
+from aiplayground.gameservers import kalaha, tictactoe
+from aiplayground.types import GameRole, PlayerId
+from aiplayground.utils.tictactoe import FULL, SQUARES, WIN_LINES
+
+DRAW = -1
+
+
+class BatchedGame(ABC):
+    ROLES: Tuple[GameRole, ...]
+    size: int
+    turn: np.ndarray
+    done: np.ndarray
+    winner: np.ndarray
+
+    def __init__(self, size: int):
+        self.size = size
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Starts every game in the batch again, with the first role to move
+        """
+        self.turn = np.zeros(self.size, dtype=np.int8)
+        self.done = np.zeros(self.size, dtype=bool)
+        self.winner = np.full(self.size, DRAW, dtype=np.int8)
+
+    @abstractmethod
+    def legal_moves(self) -> np.ndarray:
+        """
+        :return: Boolean array with a row per game and a column per move, no moves are legal in finished games
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def step(self, moves: np.ndarray) -> None:
+        """
+        Applies a move to each game that hasn't finished, moves for finished games are ignored
+        :param moves: Move index for each game
+        :raises IllegalMove: If a move is illegal in any unfinished game, in which case no game is changed
+        """
+        raise NotImplementedError
+
+    def check_moves(self, moves: np.ndarray) -> np.ndarray:
+        """
+        :return: Indices of the unfinished games the moves apply to
+        """
+        moves = np.asarray(moves)
+        active = np.flatnonzero(~self.done)
+        legal = self.legal_moves()
+        in_range = (moves[active] >= 0) & (moves[active] < legal.shape[1])
+        illegal = active[~in_range]
+        if not illegal.size:
+            illegal = active[~legal[active, moves[active]]]
+        if illegal.size:
+            raise IllegalMove(details=f"Illegal moves in games {illegal.tolist()}")
+        return active
+
+    def scores(self) -> np.ndarray:
+        """
+        :return: Score of each role (1, 0 or -1 for win, draw or loss) with a row per game, zero for unfinished games
+        """
+        scores = np.zeros((self.size, len(self.ROLES)), dtype=np.int8)
+        won = self.done & (self.winner != DRAW)
+        scores[won] = -1
+        scores[np.flatnonzero(won), self.winner[won]] = 1
+        return scores
+
+    def score(self, game: int, roles: Mapping[GameRole, PlayerId]) -> Dict[PlayerId, int]:
+        """
+        Score dictionary of a finished game in the form returned by ``BaseGameServer.score``
+        :param game: Index of the game in the batch
+        :param roles: Player ID for each role
+        """
+        scores = self.scores()[game]
+        return {roles[role]: int(scores[index]) for index, role in enumerate(self.ROLES)}
+
+
+# Sowing path of every pit, indexed by role then pit
+KALAHA_PATHS = np.array(kalaha.SOWING_PATHS, dtype=np.intp)
+KALAHA_PATH_LENGTH = KALAHA_PATHS.shape[2]
+KALAHA_SLOT_ROW = np.array([-1 if row is None else row for row in kalaha.SLOT_ROW], dtype=np.int8)
+KALAHA_OPPOSITE = np.array(kalaha.OPPOSITE, dtype=np.intp)
+KALAHA_FIRST_PIT = np.array(kalaha.FIRST_PIT, dtype=np.intp)
+KALAHA_BANK = np.array(kalaha.BANK, dtype=np.intp)
+
+
+class BatchedKalaha(BatchedGame):
+    """
+    Boards are stored as ``KalahaServer`` stores them, 14 slots per game in a ``(size, 14)`` array
+    """
+
+    ROLES = (kalaha.player_a, kalaha.player_b)
+    slots: np.ndarray
+
+    def reset(self) -> None:
+        super().reset()
+        self.slots = np.zeros((self.size, kalaha.SLOTS), dtype=np.int32)
+        self.slots[:, kalaha.FIRST_PIT[0] : kalaha.BANK[0]] = 6
+        self.slots[:, kalaha.FIRST_PIT[1] : kalaha.BANK[1]] = 6
+
+    def row_totals(self) -> np.ndarray:
+        return np.stack(
+            [
+                self.slots[:, kalaha.FIRST_PIT[0] : kalaha.BANK[0]].sum(axis=1),
+                self.slots[:, kalaha.FIRST_PIT[1] : kalaha.BANK[1]].sum(axis=1),
+            ],
+            axis=1,
+        )
+
+    def legal_moves(self) -> np.ndarray:
+        pits = KALAHA_FIRST_PIT[self.turn][:, None] + np.arange(kalaha.PITS)
+        return (np.take_along_axis(self.slots, pits, axis=1) > 0) & ~self.done[:, None]
+
+    def step(self, moves: np.ndarray) -> None:
+        games = self.check_moves(moves)
+        slots = self.slots
+        role = self.turn[games].astype(np.intp)
+        pit = np.asarray(moves)[games].astype(np.intp)
+        start = KALAHA_FIRST_PIT[role] + pit
+        pips = slots[games, start]
+        slots[games, start] = 0
+
+        # Sow whole laps into every slot of the path and the remainder into its first slots
+        paths = KALAHA_PATHS[role, pit]
+        laps, remainder = np.divmod(pips, KALAHA_PATH_LENGTH)
+        sown = laps[:, None] + (np.arange(KALAHA_PATH_LENGTH) < remainder[:, None])
+        slots[games[:, None], paths] += sown
+        last = paths[np.arange(games.size), (remainder - 1) % KALAHA_PATH_LENGTH]
+
+        # Capture if the last pip landed in one of the player's empty pits
+        opposite = KALAHA_OPPOSITE[last]
+        capture = (slots[games, last] == 1) & (KALAHA_SLOT_ROW[last] == role) & (slots[games, opposite] > 0)
+        captured, capture_last, capture_opposite = games[capture], last[capture], opposite[capture]
+        slots[captured, KALAHA_BANK[role[capture]]] += slots[captured, capture_opposite] + 1
+        slots[captured, capture_opposite] = 0
+        slots[captured, capture_last] = 0
+
+        self.turn[games] = np.where(last == KALAHA_BANK[role], role, 1 - role)
+
+        # The game ends once either row is empty, the pips left in a row count towards its bank
+        totals = self.row_totals()[games]
+        finished = (totals == 0).any(axis=1)
+        banks = totals[finished] + slots[games[finished]][:, KALAHA_BANK]
+        self.done[games[finished]] = True
+        self.winner[games[finished]] = np.select([banks[:, 0] > banks[:, 1], banks[:, 1] > banks[:, 0]], [0, 1], DRAW)
+
+
+TICTACTOE_LINES = np.array(WIN_LINES, dtype=np.uint16)
+
+
+class BatchedTicTacToe(BatchedGame):
+    """
+    Boards are stored as ``TicTacToeServer`` stores them, a bitmask of squares per role in a ``(size, 2)`` array
+    Moves are square indices, ``row * 3 + col``
+    """
+
+    ROLES = (tictactoe.player_x, tictactoe.player_o)
+    masks: np.ndarray
+
+    def reset(self) -> None:
+        super().reset()
+        self.masks = np.zeros((self.size, 2), dtype=np.uint16)
+
+    def occupied(self) -> np.ndarray:
+        return self.masks[:, 0] | self.masks[:, 1]
+
+    def legal_moves(self) -> np.ndarray:
+        empty = (self.occupied()[:, None] >> np.arange(SQUARES, dtype=np.uint16)) & 1 == 0
+        return empty & ~self.done[:, None]
+
+    def step(self, moves: np.ndarray) -> None:
+        games = self.check_moves(moves)
+        role = self.turn[games].astype(np.intp)
+        mask = self.masks[games, role] | np.left_shift(1, np.asarray(moves)[games]).astype(np.uint16)
+        self.masks[games, role] = mask
+        won = ((mask[:, None] & TICTACTOE_LINES) == TICTACTOE_LINES).any(axis=1)
+        drawn = ~won & (self.occupied()[games] == FULL)
+        self.done[games[won | drawn]] = True
+        self.winner[games[won]] = role[won]
+        # As with TicTacToeServer, the turn is left with the last player once a game ends
+        self.turn[games[~(won | drawn)]] = 1 - role[~(won | drawn)]
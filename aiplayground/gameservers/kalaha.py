@@ -1,6 +1,6 @@
+import logging
 import random
-from typing import Dict, Optional, List, Union, Iterator
-import itertools
+from typing import Dict, Optional, List, Tuple
 
 from aiplayground.exceptions import GameCompleted, IllegalMove
 from aiplayground.gameservers.base import BaseGameServer
@@ -15,33 +15,33 @@ def other(current: GameRole) -> GameRole:
     return player_a if current == player_b else player_b
 
 
-def getter(state, path: List[Union[int, str]]):
-    if len(path):
-        [idx, *path_rem] = path
-        return getter(state[idx], path_rem)
-    return state
+# The board is stored as 14 slots, pits_a 0-5, bank_a 6, pits_b 7-12 and bank_b 13
+PITS = 6
+SLOTS = 14
+ROLE_INDEX: Dict[GameRole, int] = {player_a: 0, player_b: 1}
+FIRST_PIT = (0, 7)
+BANK = (6, 13)
+# Row (0 for a, 1 for b) each slot belongs to, or None for banks
+SLOT_ROW: Tuple[Optional[int], ...] = (*[0] * PITS, None, *[1] * PITS, None)
+# The pit opposite each pit, pit i of one row faces pit 5 - i of the other
+OPPOSITE: Tuple[int, ...] = tuple(12 - slot for slot in range(SLOTS))
 
 
-def setter(state, path: List[Union[int, str]], value):
-    assert len(path) > 0
-    if len(path) > 1:
-        [idx, *path_rem] = path
-        setter(state[idx], path_rem, value)
-    else:
-        state[path[0]] = value
+def sowing_path(role: int, pit: int) -> Tuple[int, ...]:
+    """
+    :return: The 13 slots pips from a pit are sown into in order, which skips the opponent's bank
+    """
+    start = FIRST_PIT[role] + pit
+    opponent_bank = BANK[1 - role]
+    path = [slot % SLOTS for slot in range(start + 1, start + SLOTS + 1)]
+    return tuple(slot for slot in path if slot != opponent_bank)
 
 
-path_orders: List[List[Union[str, int]]] = [
-    *[["pits_a", i] for i in range(6)],
-    ["bank_a"],
-    *[["pits_b", i] for i in range(6)],
-    ["bank_b"],
-]
+SOWING_PATHS: Tuple[Tuple[Tuple[int, ...], ...], ...] = tuple(
+    tuple(sowing_path(role, pit) for pit in range(PITS)) for role in range(2)
+)
 
-
-def skip(itera: Iterator, c: int):
-    for i in range(c):
-        next(itera)
+PIT_MOVES: Tuple[Move, ...] = tuple(Move({"move": pit}) for pit in range(PITS))
 
 
 class KalahaServer(BaseGameServer):
@@ -49,16 +49,63 @@ class KalahaServer(BaseGameServer):
     max_players = 2
     description = "Kalaha - (6, 6)"
     winner: Optional[PlayerId] = None
+    slots: List[int]
+    row_totals: List[int]
     schema = {
         "$schema": "http://json-schema.org/draft-07/schema#",
         "type": "object",
         "required": ["move"],
         "properties": {
-            "move": {"type": "integer", "min": 0, "max": 5},
+            "move": {"type": "integer", "minimum": 0, "maximum": 5},
         },
         "additionalProperties": False,
     }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.slots = [0] * SLOTS
+        self.row_totals = [0, 0]
+
+    @classmethod
+    def validate_move(cls, move: Move) -> None:
+        if type(move) is dict and len(move) == 1 and type(move.get("move")) is int and 0 <= move["move"] < PITS:
+            return
+        super().validate_move(move)
+        raise IllegalMove(details="Pit must be an integer between 0 and 5")
+
+    @classmethod
+    def move_key(cls, move: Move) -> Optional[int]:
+        if type(move) is dict and len(move) == 1:
+            pit = move.get("move")
+            if type(pit) is int:
+                return pit
+        return None
+
+    def generate_legal_moves(self) -> List[Move]:
+        if not self.playing or self.turn is None:
+            return []
+        first = FIRST_PIT[ROLE_INDEX[self.players[self.turn]]]
+        slots = self.slots
+        return [PIT_MOVES[pit] for pit in range(PITS) if slots[first + pit]]
+
+    @property
+    def board(self) -> Board:
+        slots = self.slots
+        return Board({"bank_a": slots[6], "bank_b": slots[13], "pits_a": slots[0:6], "pits_b": slots[7:13]})
+
+    @board.setter
+    def board(self, board: Board):
+        self.slots = [*board["pits_a"], board["bank_a"], *board["pits_b"], board["bank_b"]]
+        self.row_totals = [sum(board["pits_a"]), sum(board["pits_b"])]
+
+    def snapshot(self) -> Tuple:
+        return self.movenumber, self.turn, self.playing, self.winner, tuple(self.slots), tuple(self.row_totals)
+
+    def restore(self, state: Tuple) -> None:
+        self.movenumber, self.turn, self.playing, self.winner, slots, row_totals = state
+        self.slots = list(slots)
+        self.row_totals = list(row_totals)
+
     def init_game(self):
         self.board = Board({"bank_a": 0, "bank_b": 0, "pits_a": [6] * 6, "pits_b": [6] * 6})
         self.turn = self.roles[player_a]
@@ -74,48 +121,55 @@ class KalahaServer(BaseGameServer):
         return role
 
     def make_move(self, player_id: PlayerId, player_role: Optional[GameRole], move: Move):
-        logger.debug(f"Making move for role: {player_role}")
+        logger.debug("Making move for role: %s", player_role)
         if player_role is None:
             raise IllegalMove("Require game role")
+        role = ROLE_INDEX[player_role]
         selected = move["move"]
-        offset = 0 if player_role == player_a else 7
-        board_positions = itertools.cycle(path_orders)
-        skip(board_positions, selected + offset)
-        current_path = next(board_positions)
-        pips = getter(self.board, current_path)
+        if not 0 <= selected < PITS:
+            raise IllegalMove("Pit must be between 0 and 5")
+        slots = self.slots
+        row_totals = self.row_totals
+        start = FIRST_PIT[role] + selected
+        pips = slots[start]
         if pips == 0:
             raise IllegalMove("Empty pit chosen")
-        setter(self.board, current_path, 0)
-        other_bank = f"bank_{other(player_role)}"
-        player_bank = f"bank_{player_role}"
-        current_pips = 0
-        # Distribute Pips
-        for pip in range(pips):
-            current_path = next(board_positions)
-            if current_path[0] == other_bank:
-                # Skip opponent bank
-                current_path = next(board_positions)
-            current_pips = getter(self.board, current_path)
-            setter(self.board, current_path, current_pips + 1)
-
-        if current_pips == 0 and current_path[0] == f"pits_{player_role}":
-            pit = current_path[1]
-            opposite_path = [f"pits_{other(player_role)}", 5 - pit]
-            opposite_pips = getter(self.board, opposite_path)
+        slots[start] = 0
+        row_totals[role] -= pips
+        # Distribute Pips, whole laps of the 13 sowable slots first
+        path = SOWING_PATHS[role][selected]
+        laps, remainder = divmod(pips, len(path))
+        if laps:
+            for slot in path:
+                slots[slot] += laps
+            row_totals[0] += laps * PITS
+            row_totals[1] += laps * PITS
+        last = path[remainder - 1] if remainder else path[-1]
+        for slot in path[:remainder]:
+            slots[slot] += 1
+            row = SLOT_ROW[slot]
+            if row is not None:
+                row_totals[row] += 1
+
+        # Capture if the last pip landed in one of the player's empty pits
+        if slots[last] == 1 and SLOT_ROW[last] == role:
+            opposite = OPPOSITE[last]
+            opposite_pips = slots[opposite]
             if opposite_pips > 0:
-                bank_balance = getter(self.board, [player_bank])
                 # Bank balance gains opposite pips and the pip just placed
-                setter(self.board, [player_bank], bank_balance + opposite_pips + 1)
-                setter(self.board, opposite_path, 0)
-                setter(self.board, current_path, 0)
+                slots[BANK[role]] += opposite_pips + 1
+                slots[opposite] = 0
+                slots[last] = 0
+                row_totals[role] -= 1
+                row_totals[1 - role] -= opposite_pips
 
-        next_role = player_role if current_path[0] == f"bank_{player_role}" else other(player_role)
+        next_role = player_role if last == BANK[role] else other(player_role)
         self.turn = self.roles[next_role]
 
-        if sum(self.board["pits_a"]) == 0 or sum(self.board["pits_b"]) == 0:
+        if row_totals[0] == 0 or row_totals[1] == 0:
             # End of game
-            bank_a = sum(self.board["pits_a"]) + self.board["bank_a"]
-            bank_b = sum(self.board["pits_b"]) + self.board["bank_b"]
+            bank_a = row_totals[0] + slots[6]
+            bank_b = row_totals[1] + slots[13]
             if bank_a > bank_b:
                 self.winner = self.roles[player_a]
             elif bank_b > bank_a:
@@ -132,11 +186,13 @@ class KalahaServer(BaseGameServer):
             return {k: 1 if k == self.winner else -1 for k in self.players}
 
     def show_board(self) -> Board:
-        top_border = ">" * 25
-        a_row = "| B|" + "|".join(f"{x: >2}" for x in self.board["pits_a"]) + "| A|"
-        bank_row = f"|{self.board['bank_b']: >2}+" + ("--|" * 6) + f"{self.board['bank_a']: >2}|"
-        b_row = "|  |" + "|".join(f"{x: >2}" for x in reversed(self.board["pits_b"])) + "|  |"
-        bottom_border = "<" * 25
-        board_repr = "\n".join([top_border, a_row, bank_row, b_row, bottom_border])
-        logger.debug(f"Board:\n{board_repr}")
-        return self.board
+        board = self.board
+        if logger.isEnabledFor(logging.DEBUG):
+            top_border = ">" * 25
+            a_row = "| B|" + "|".join(f"{x: >2}" for x in board["pits_a"]) + "| A|"
+            bank_row = f"|{board['bank_b']: >2}+" + ("--|" * 6) + f"{board['bank_a']: >2}|"
+            b_row = "|  |" + "|".join(f"{x: >2}" for x in reversed(board["pits_b"])) + "|  |"
+            bottom_border = "<" * 25
+            board_repr = "\n".join([top_border, a_row, bank_row, b_row, bottom_border])
+            logger.debug(f"Board:\n{board_repr}")
+        return board
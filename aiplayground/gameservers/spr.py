@@ -1,12 +1,13 @@
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
-from aiplayground.exceptions import GameCompleted
+from aiplayground.exceptions import GameCompleted, IllegalMove
 from aiplayground.gameservers.base import BaseGameServer
 from aiplayground.logging import logger
 from aiplayground.types import GameRole, PlayerId, Board, Move
 
 player_a = GameRole("a")
 player_b = GameRole("b")
+CHOICE_MOVES: Tuple[Move, ...] = tuple(Move({"move": choice}) for choice in ("scissors", "paper", "rock"))
 
 
 class ScissorsPaperRockServer(BaseGameServer):
@@ -16,11 +17,47 @@ class ScissorsPaperRockServer(BaseGameServer):
     move_map = {"scissors": 0, "paper": 1, "rock": 2}
     winner: Optional[PlayerId] = None
     board: Board
+    schema = {
+        "$schema": "http://json-schema.org/draft-07/schema#",
+        "type": "object",
+        "required": ["move"],
+        "properties": {
+            "move": {"enum": ["scissors", "paper", "rock"]},
+        },
+        "additionalProperties": False,
+    }
 
     def init_game(self):
         self.board = Board({player_a: None, player_b: None})
         self.turn = self.roles[player_a]
 
+    @classmethod
+    def validate_move(cls, move: Move) -> None:
+        if type(move) is dict and len(move) == 1 and type(move.get("move")) is str and move["move"] in cls.move_map:
+            return
+        super().validate_move(move)
+        raise IllegalMove(details="Move must be one of scissors, paper or rock")
+
+    @classmethod
+    def move_key(cls, move: Move) -> Optional[str]:
+        if type(move) is dict and len(move) == 1:
+            choice = move.get("move")
+            if type(choice) is str:
+                return choice
+        return None
+
+    def generate_legal_moves(self) -> List[Move]:
+        if not self.playing:
+            return []
+        return list(CHOICE_MOVES)
+
+    def snapshot(self) -> Tuple:
+        return self.movenumber, self.turn, self.playing, self.winner, self.board.get(player_a), self.board.get(player_b)
+
+    def restore(self, state: Tuple) -> None:
+        self.movenumber, self.turn, self.playing, self.winner, move_a, move_b = state
+        self.board = Board({player_a: move_a, player_b: move_b})
+
     def show_board(self) -> Board:
         return Board(
             {k: None if self.playing else v for k, v in self.board.items()} if self.board is not None else None
@@ -39,7 +76,7 @@ class ScissorsPaperRockServer(BaseGameServer):
         m: str = move["move"]
         if m not in ["scissors", "paper", "rock"]:
             raise ValueError
-        logger.debug(f"Player Role: {player_role}")
+        logger.debug("Player Role: %s", player_role)
         if player_role == player_a:
             self.board[player_a] = m
             self.turn = self.roles[player_b]
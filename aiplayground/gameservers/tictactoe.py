@@ -1,10 +1,20 @@
+import logging
 import random
-from typing import Dict, Optional, List
+from typing import Dict, List, Optional, Tuple
 
 from aiplayground.exceptions import GameCompleted, IllegalMove
 from aiplayground.gameservers.base import BaseGameServer
 from aiplayground.logging import logger
 from aiplayground.types import GameRole, PlayerId, Move, Board
+from aiplayground.utils.tictactoe import (
+    EMPTY_SQUARES,
+    FULL,
+    SQUARE_MOVES,
+    completes_line,
+    grid_from_masks,
+    masks_from_grid,
+    square,
+)
 
 player_x = GameRole("x")
 player_o = GameRole("o")
@@ -15,17 +25,65 @@ class TicTacToeServer(BaseGameServer):
     max_players = 2
     description = "Naughts and crosses"
     winner: Optional[str] = None
+    masks: Dict[GameRole, int]
+    occupied: int
     schema = {
         "$schema": "http://json-schema.org/draft-07/schema#",
         "type": "object",
         "required": ["row", "col"],
         "properties": {
-            "row": {"type": "integer", "min": 0, "max": 2},
-            "col": {"type": "integer", "min": 0, "max": 2},
+            "row": {"type": "integer", "minimum": 0, "maximum": 2},
+            "col": {"type": "integer", "minimum": 0, "maximum": 2},
         },
         "additionalProperties": False,
     }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.masks = {player_x: 0, player_o: 0}
+        self.occupied = 0
+
+    @classmethod
+    def validate_move(cls, move: Move) -> None:
+        if type(move) is dict and len(move) == 2:
+            row = move.get("row")
+            col = move.get("col")
+            if type(row) is int and type(col) is int and 0 <= row < 3 and 0 <= col < 3:
+                return
+        super().validate_move(move)
+        raise IllegalMove(details="Row and column must be integers between 0 and 2")
+
+    @classmethod
+    def move_key(cls, move: Move) -> Optional[int]:
+        if type(move) is dict and len(move) == 2:
+            row = move.get("row")
+            col = move.get("col")
+            if type(row) is int and type(col) is int and 0 <= row < 3 and 0 <= col < 3:
+                return square(row, col)
+        return None
+
+    def generate_legal_moves(self) -> List[Move]:
+        if not self.playing:
+            return []
+        return [SQUARE_MOVES[sq] for sq in EMPTY_SQUARES[self.occupied]]  # type: ignore
+
+    @property
+    def board(self) -> Board:
+        return Board({"grid": grid_from_masks(self.masks)})
+
+    @board.setter
+    def board(self, board: Board):
+        self.masks = {player_x: 0, player_o: 0, **masks_from_grid(board["grid"])}
+        self.occupied = self.masks[player_x] | self.masks[player_o]
+
+    def snapshot(self) -> Tuple:
+        return self.movenumber, self.turn, self.playing, self.winner, self.masks[player_x], self.masks[player_o]
+
+    def restore(self, state: Tuple) -> None:
+        self.movenumber, self.turn, self.playing, self.winner, mask_x, mask_o = state
+        self.masks = {player_x: mask_x, player_o: mask_o}
+        self.occupied = mask_x | mask_o
+
     def init_game(self):
         self.board = Board({"grid": [[None for _i in range(3)] for _j in range(3)]})
         self.turn = self.roles[player_x]
@@ -41,24 +99,26 @@ class TicTacToeServer(BaseGameServer):
         return role
 
     def make_move(self, player_id: PlayerId, player_role: Optional[GameRole], move: Move):
-        logger.debug(f"Making move for role: {player_role}")
+        logger.debug("Making move for role: %s", player_role)
+        if player_role is None:
+            raise IllegalMove(details="Require game role")
         col: int = move["col"]
         row: int = move["row"]
-        grid: List[List[Optional[GameRole]]] = self.board["grid"]
-        if grid[row][col] is not None:
+        if not (0 <= row < 3 and 0 <= col < 3):
+            raise IllegalMove(details="Row and column must be between 0 and 2")
+        sq = square(row, col)
+        bit = 1 << sq
+        if self.occupied & bit:
             raise IllegalMove(details="Attempted to play in square that is already occupied")
-        grid[row][col] = player_role
-
-        if (
-            all(grid[row][i] == player_role for i in range(3))
-            or all(grid[i][col] == player_role for i in range(3))
-            or all(grid[i][i] == player_role for i in range(3))
-            or all(grid[i][2 - i] == player_role for i in range(3))
-        ):
+        mask = self.masks[player_role] | bit
+        self.masks[player_role] = mask
+        self.occupied |= bit
+
+        if completes_line(mask, sq):
             # Player won
             self.winner = player_id
             raise GameCompleted
-        elif all(cell is not None for row in grid for cell in row):
+        elif self.occupied == FULL:
             # Match is a draw
             self.winner = None
             raise GameCompleted
@@ -74,8 +134,10 @@ class TicTacToeServer(BaseGameServer):
             return {k: 1 if k == self.winner else -1 for k in self.players}
 
     def show_board(self) -> Board:
-        board_repr = "\n -+-+-\n ".join(
-            "|".join(" " if cell is None else cell for cell in row) for row in self.board["grid"]
-        )
-        logger.debug(f"Board:\n {board_repr}")
-        return self.board
+        board = self.board
+        if logger.isEnabledFor(logging.DEBUG):
+            board_repr = "\n -+-+-\n ".join(
+                "|".join(" " if cell is None else cell for cell in row) for row in board["grid"]
+            )
+            logger.debug(f"Board:\n {board_repr}")
+        return board
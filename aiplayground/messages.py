@@ -1,7 +1,8 @@
 import json
-from typing import Optional, Dict, Callable
+from datetime import datetime
+from typing import Optional, Dict, Callable, ClassVar, List
 
-from pydantic import BaseModel, PrivateAttr
+from pydantic import BaseModel, PrivateAttr, Field
 
 from aiplayground.exceptions import all_exceptions
 from aiplayground.types import (
@@ -18,23 +19,38 @@ from aiplayground.types import (
     TournamentId,
 )
 from aiplayground.logging import logger
+from aiplayground.settings import settings
+from aiplayground.utils.wire import Encoded, Payload, packb
 
 
 class MessageBase(BaseModel):
+    message_name: ClassVar[str]
     _callback: Optional[Callable] = PrivateAttr()
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.message_name = cls.__name__[:-7].lower()
+
     def to_dict(self) -> dict:
         return json.loads(self.json())
 
+    def encode(self) -> Encoded:
+        """
+        Encodes the message payload once, socket.io sends it to every recipient without encoding it again
+        """
+        return Encoded(self.json(separators=(",", ":")))
+
+    def encode_msgpack(self) -> bytes:
+        return packb(self.dict())
+
     async def send(self, sio, to: Optional[SioSID] = None, callback: Optional[Callable] = None):
-        message_name = self.__class__.__name__[:-7].lower()
         self._callback = callback
         if to is None:
-            logger.debug(f"Sending message {message_name}:\n{self!r}")
-            await sio.emit(message_name, self.to_dict(), callback=self.callback)
+            logger.debug("Sending message %s:\n%r", self.message_name, self)
+            await sio.emit(self.message_name, Payload(self), callback=self.callback)
         else:
-            logger.debug(f"Sending message {message_name} to {to!r}:\n{self!r}")
-            await sio.emit(message_name, self.to_dict(), room=to, callback=self.callback)
+            logger.debug("Sending message %s to %r:\n%r", self.message_name, to, self)
+            await sio.emit(self.message_name, Payload(self), room=to, callback=self.callback)
 
     async def callback(self, msgtype=None, *args):
         if msgtype == "fail":
@@ -70,6 +86,9 @@ class GamestateMessage(MessageBase):
     :param str playerid|None: Intended recipient of the message
     :param str|None turn: ID of player who's turn it is
     :param Finish|None finish: Info on the end of the game
+    :param list|None legalmoves: Legal moves of the player who's turn it is, if the game server sends them
+    :param float|None movetime: Seconds the player who's turn it is has to move, if moves are timed
+    :param dict|None clocks: Seconds each player has left for the rest of their moves, if games have a time limit
 
     Message from broker to players to indicate a change in game state
     """
@@ -80,6 +99,66 @@ class GamestateMessage(MessageBase):
     playerid: Optional[PlayerId] = None
     turn: Optional[PlayerId] = None
     finish: Optional[Finish] = None
+    legalmoves: Optional[List[Move]] = None
+    movetime: Optional[float] = None
+    clocks: Optional[Dict[PlayerId, float]] = None
+
+
+class SpectatorStateMessage(MessageBase):
+    """
+    :param str roomid: ID of room that the state belongs to
+    :param str stateid: ID of the state
+    :param int epoch: Number of state updates that occured before this state update
+    :param datetime timestamp: When the state was created
+    :param dict|None move: Move that resulted in the state
+    :param dict|None board: Game board after the move
+    :param str|None turn: ID of player who's turn it is
+    :param Finish|None finish: Info on the end of the game
+
+    Message from broker to spectators with a state of the game, either as part of a reply to
+    a SpectateMessage or as a live update
+    """
+
+    roomid: RoomId
+    stateid: StateId
+    epoch: int
+    timestamp: datetime
+    move: Optional[Move] = None
+    board: Optional[Board] = None
+    turn: Optional[PlayerId] = None
+    finish: Optional[Finish] = None
+
+
+class LobbyRoom(MessageBase):
+    """
+    :param str name: Name of the room
+    :param str game: Name of the game that will be played
+    :param int maxplayers: The number of players allowed in the game
+    :param int players: The number of players that have joined
+    :param str status: Status of the room
+
+    A room in the lobby directory
+    """
+
+    name: RoomName
+    game: GameName
+    maxplayers: int
+    players: int
+    status: str
+
+
+class LobbyUpdateMessage(MessageBase):
+    """
+    :param str action: How the lobby directory changed ('add', 'update' or 'remove')
+    :param str roomid: Room that changed
+    :param LobbyRoom|None room: The room after the change, or None if it was removed
+
+    Message from broker to clients subscribed to the lobby directory when a room is added, joined or leaves the lobby
+    """
+
+    action: str
+    roomid: RoomId
+    room: Optional[LobbyRoom] = None
 
 
 class PlayerJoinedMessage(MessageBase):
@@ -95,6 +174,7 @@ class JoinedMessage(MessageBase):
     :param str roomid: ID of room that the player joined
     :param str|None gamerole: Role the player has in the game, eg. 'white' in chess
     :param bool broadcast: Whether this message is a broadcast (which does not need processing)
+    :param str|None resumekey: Key to resume playing with after reconnecting, only sent to the player that joined
 
     Message from broker to players on successfully joining a room
     """
@@ -104,6 +184,7 @@ class JoinedMessage(MessageBase):
     roomid: RoomId
     gamerole: Optional[GameRole] = None
     broadcast: bool = False
+    resumekey: Optional[str] = None
 
 
 class PlayerMoveMessage(MessageBase):
@@ -137,11 +218,13 @@ class RegisterMessage(MessageBase):
 class RoomCreatedMessage(MessageBase):
     """
     :param str roomid: ID of the new game room
+    :param str|None resumekey: Key to carry on hosting the room with after reconnecting
 
     Message from broker to game server acknowledging creation of a game room
     """
 
     roomid: RoomId
+    resumekey: Optional[str] = None
 
 
 class JoinAcknowledgementMessage(MessageBase):
@@ -209,6 +292,9 @@ class GameUpdateMessage(MessageBase):
     :param str|None playerid: Player to send private update to
     :param str|None turn: Player who's turn it is
     :param str|Finish finish: How the game finished
+    :param list|None legalmoves: Legal moves of the player who's turn it is
+    :param float|None movetime: Seconds the player who's turn it is has to move
+    :param dict|None clocks: Seconds each player has left for the rest of their moves
 
     From gameserver, informing broker that a player failed to join a room
     """
@@ -221,6 +307,21 @@ class GameUpdateMessage(MessageBase):
     playerid: Optional[PlayerId] = None
     turn: Optional[PlayerId] = None
     finish: Optional[Finish] = None
+    legalmoves: Optional[List[Move]] = None
+    movetime: Optional[float] = None
+    clocks: Optional[Dict[PlayerId, float]] = None
+
+
+class ResumeRoomsMessage(MessageBase):
+    """
+    :param dict rooms: Key from the room's RoomCreatedMessage for each room to carry on hosting, by room ID
+
+    Message from game server to broker after reconnecting, to carry on hosting its rooms
+    Replies with the IDs of the rooms that were resumed in 'rooms', rooms that have finished or can't be
+    resumed are left out
+    """
+
+    rooms: Dict[RoomId, str]
 
 
 # Sent from player
@@ -260,12 +361,33 @@ class MoveMessage(MessageBase):
     move: Move
 
 
+class ResumeMessage(MessageBase):
+    """
+    :param str roomid: Room the player was playing in
+    :param str playerid: Player to carry on playing as
+    :param str resumekey: Key from the player's JoinedMessage
+    :param int|None epoch: Epoch of the last game state the player received
+
+    Message from player to broker after reconnecting, to carry on playing in a room
+    The game states after epoch are sent to the player in GamestateMessages before the reply, which has
+    'resumed' set if the player can carry on playing
+    """
+
+    roomid: RoomId
+    playerid: PlayerId
+    resumekey: str
+    epoch: Optional[int] = None
+
+
 class ListMessage(MessageBase):
     """
+    :param bool subscribe: Whether to receive LobbyUpdateMessages as the rooms change afterwards, otherwise
+        stops any earlier subscription
+
     Player requests list of available rooms
     """
 
-    pass
+    subscribe: bool = False
 
 
 class ListTournamentsMessage(MessageBase):
@@ -279,8 +401,15 @@ class ListTournamentsMessage(MessageBase):
 class SpectateMessage(MessageBase):
     """
     :param str roomid: Room to spectate
+    :param int|None since_epoch: Only reply with states after this epoch, eg. the last epoch seen before reconnecting
+    :param int limit: Maximum number of states in the reply
 
     Spectator subscribes to state updates for a game
+    Replies with a page of states in epoch order, if 'more' is set in the reply the next page is
+    requested with since_epoch set to the last epoch received. Later states are sent as they
+    happen in SpectatorStateMessages
     """
 
     roomid: RoomId
+    since_epoch: Optional[int] = None
+    limit: int = Field(settings.SPECTATE_PAGE_SIZE, ge=1, le=settings.SPECTATE_MAX_PAGE_SIZE)
@@ -1,8 +1,7 @@
 import asyncio
 import json
-import time
-from time import sleep
-from typing import Optional, Type, Dict
+from functools import partial
+from typing import Optional, Type, Dict, List, Tuple
 
 import socketio
 from socketio.exceptions import ConnectionError
@@ -13,13 +12,18 @@ from aiplayground.messages import (
     JoinMessage,
     JoinedMessage,
     ListMessage,
+    LobbyRoom,
+    LobbyUpdateMessage,
     MoveMessage,
+    ResumeMessage,
     Finish,
 )
-from aiplayground.players import all_players, BasePlayer
+from aiplayground.players import all_players, player_for, BasePlayer
+from aiplayground.players.executor import MoveExecutor
 from aiplayground.settings import settings
 from aiplayground.types import PlayerId, RoomId, RoomName, GameName, PlayerName
 from aiplayground.utils.expect import expect
+from aiplayground.utils.wire import WireClient
 
 
 class PlayerClient(socketio.AsyncClientNamespace):
@@ -28,37 +32,75 @@ class PlayerClient(socketio.AsyncClientNamespace):
     game_name: Optional[GameName] = None
     room_name: Optional[RoomName] = None
     player: Optional[BasePlayer] = None
+    resume_key: Optional[str] = None
+    epoch: Optional[int] = None
     player_name: PlayerName
+    lobbies: Dict[RoomId, LobbyRoom]
+    executor: MoveExecutor
+    update_lock: asyncio.Lock
 
-    def __init__(self, player_name: PlayerName = settings.PLAYER_NAME):
+    def __init__(self, player_name: PlayerName = settings.PLAYER_NAME, executor: Optional[MoveExecutor] = None):
         super().__init__()
         self.player_name = player_name
+        self.lobbies = dict()
+        self.executor = executor or MoveExecutor()
+        # Game states are shown to the player one at a time, in the order they arrive
+        self.update_lock = asyncio.Lock()
 
     async def on_connect(self):
-        # TODO: Handle reconnection properly
+        if self.room_id is not None and self.player_id is not None and self.resume_key is not None:
+            logger.info("Reconnected to broker, resuming game")
+            await ResumeMessage(
+                roomid=self.room_id, playerid=self.player_id, resumekey=self.resume_key, epoch=self.epoch
+            ).send(sio=self, callback=self.resume_callback)
+            return
         logger.info("Connected to broker")
+        await self.find_game()
+
+    async def resume_callback(self, data: Dict[str, bool]):
+        if not data.get("resumed"):
+            logger.info("Couldn't resume game, looking for a new one")
+            await self.find_game()
+
+    async def find_game(self):
         self.room_id = None
         self.player_id = None
         self.game_name = None
         self.room_name = None
         self.player = None
-        await ListMessage().send(sio=self, callback=self.rooms_callback)
+        self.resume_key = None
+        self.epoch = None
+        self.lobbies = dict()
+        await ListMessage(subscribe=True).send(sio=self, callback=self.rooms_callback)
 
     async def rooms_callback(self, rooms: Dict[str, Dict]):
+        logger.debug(f"Games available: {rooms}")
+        self.lobbies = {RoomId(k): LobbyRoom.parse_obj(v) for k, v in rooms.items()}
+        await self.join_lobby()
+
+    @expect(LobbyUpdateMessage)
+    async def on_lobbyupdate(self, msg: LobbyUpdateMessage):
+        if msg.room is None:
+            self.lobbies.pop(msg.roomid, None)
+        else:
+            self.lobbies[msg.roomid] = msg.room
+        await self.join_lobby()
+
+    async def join_lobby(self):
         if self.room_id is not None:
-            logger.warning("Received rooms callback after joining a room")
             return
-        logger.debug(f"Games available: {rooms}")
         lobbies = [
-            (k, v["game"], v["name"]) for k, v in rooms.items() if v["status"] == "lobby" and v["game"] in all_players
+            (k, v.game, v.name)
+            for k, v in self.lobbies.items()
+            if v.status == "lobby" and v.game in all_players and v.players < v.maxplayers
         ]
         if not lobbies:
-            logger.warning("No verified lobbies found, sleeping for 2s")
-            time.sleep(2)
-            await ListMessage().send(sio=self, callback=self.rooms_callback)
+            logger.debug("No verified lobbies found, waiting for one to be created")
             return
         self.room_id, self.game_name, self.room_name = lobbies[0]
         await JoinMessage(roomid=self.room_id, name=self.player_name).send(sio=self)
+        # Stop receiving lobby updates until looking for another game
+        await ListMessage(subscribe=False).send(sio=self)
 
     @expect(JoinedMessage)
     async def on_joined(self, msg: JoinedMessage):
@@ -67,8 +109,9 @@ class PlayerClient(socketio.AsyncClientNamespace):
         assert self.game_name is not None
         self.player_id = msg.playerid
         self.room_id = msg.roomid
+        self.resume_key = msg.resumekey
         logger.info(f"Joined Game: {self.room_name}({self.game_name})")
-        player: Type[BasePlayer] = all_players[self.game_name]
+        player: Type[BasePlayer] = player_for(self.game_name, search=settings.PLAYER_SEARCH)
         self.player = player(gamerole=msg.gamerole, player_id=msg.playerid)
 
     @expect(GamestateMessage)
@@ -76,16 +119,22 @@ class PlayerClient(socketio.AsyncClientNamespace):
         if msg.finish is not None:
             await self.finished(msg.finish)
             return
-        if msg.roomid != self.room_id:
-            return
-        assert self.player is not None
-        assert self.room_id is not None
-        assert self.player_id is not None
-        if msg.roomid != self.room_id:
-            return
-        move = self.player.update(board=msg.board, turn=msg.turn)
-        if move is not None:
-            await MoveMessage(roomid=self.room_id, playerid=self.player_id, move=move).send(sio=self)
+        async with self.update_lock:
+            # The game may have finished while waiting for the player to see the last state
+            if msg.roomid != self.room_id or self.player is None:
+                return
+            assert self.room_id is not None
+            assert self.player_id is not None
+            self.epoch = msg.epoch
+            player = self.player
+            move, updated = await self.executor.update(
+                player, board=msg.board, turn=msg.turn, legal_moves=msg.legalmoves
+            )
+            if self.player is not player:
+                return
+            self.player = updated
+            if move is not None:
+                await MoveMessage(roomid=self.room_id, playerid=self.player_id, move=move).send(sio=self)
 
     async def finished(self, finish: Finish):
         assert self.player_id is not None
@@ -103,19 +152,271 @@ class PlayerClient(socketio.AsyncClientNamespace):
             if settings.RUN_ONCE:
                 await self.disconnect()
             else:
-                await self.on_connect()
+                await self.find_game()
         else:
             logger.error(f"Game finished with error: {finish.reason}")
             if finish.fault == self.player_id:
                 logger.error("AND IT WAS ALL OUR FAULT D:")
                 if settings.LEEROY_JENKINS:
                     logger.error("But YOLO I'll try again")
-                    await self.on_connect()
+                    await self.find_game()
                 else:
                     await self.disconnect()
+            elif settings.RUN_ONCE:
+                await self.disconnect()
+            else:
+                await self.find_game()
+
+    async def on_fail(self, data):
+        logger.error(f"Received fail:\n{json.dumps(data, indent=2)}")
+        if self.player_id is None and data.get("roomid") == self.room_id and data.get("name") == self.player_name:
+            logger.info("Couldn't join the game, looking for another one")
+            await self.find_game()
+
+    async def on_disconnect(self):
+        logger.error("Disconnected!")
+
+
+class BotSlot:
+    """
+    One of the bots played over a MultiplexedPlayerClient's connection, and the game it is in
+    """
+
+    name: PlayerName
+    room_id: Optional[RoomId] = None
+    game_name: Optional[GameName] = None
+    room_name: Optional[RoomName] = None
+    player_id: Optional[PlayerId] = None
+    player: Optional[BasePlayer] = None
+    resume_key: Optional[str] = None
+    epoch: Optional[int] = None
+    retired: bool = False
+    update_lock: asyncio.Lock
+
+    def __init__(self, name: PlayerName):
+        self.name = name
+        self.update_lock = asyncio.Lock()
+
+    @property
+    def idle(self) -> bool:
+        return self.room_id is None and not self.retired
+
+    def leave(self) -> None:
+        self.room_id = None
+        self.game_name = None
+        self.room_name = None
+        self.player_id = None
+        self.player = None
+        self.resume_key = None
+        self.epoch = None
+
+
+class MultiplexedPlayerClient(socketio.AsyncClientNamespace):
+    """
+    Plays many bots over a single connection, each joining and playing its own games
+
+    Bots are named after the client with their index appended, which the broker echoes back when
+    a bot joins a room. Game states are routed to the bots in the room they're for, or to the bot
+    they're addressed to. After reconnecting, bots that were playing resume their games.
+    """
+
+    player_name: PlayerName
+    slots: List[BotSlot]
+    lobbies: Dict[RoomId, LobbyRoom]
+    joining: Dict[Tuple[RoomId, PlayerName], BotSlot]
+    players: Dict[PlayerId, BotSlot]
+    room_slots: Dict[RoomId, List[BotSlot]]
+    subscribed: bool
+    executor: MoveExecutor
+
+    def __init__(
+        self,
+        player_name: PlayerName = settings.PLAYER_NAME,
+        instances: int = settings.PLAYER_INSTANCES,
+        executor: Optional[MoveExecutor] = None,
+    ):
+        super().__init__()
+        self.player_name = player_name
+        self.executor = executor or MoveExecutor()
+        self.slots = [BotSlot(PlayerName(f"{player_name} ({i + 1})")) for i in range(instances)]
+        self.reset()
+
+    def reset(self) -> None:
+        self.lobbies = dict()
+        self.joining = dict()
+        self.players = dict()
+        self.room_slots = dict()
+        self.subscribed = False
+        for slot in self.slots:
+            slot.leave()
+
+    async def on_connect(self):
+        resuming = [slot for slot in self.slots if slot.player_id is not None and slot.resume_key is not None]
+        if not resuming:
+            logger.info(f"Connected to broker with {len(self.slots)} bots")
+            self.reset()
+            await self.subscribe()
+            return
+        logger.info(f"Reconnected to broker, resuming {len(resuming)} games")
+        self.lobbies = dict()
+        self.joining = dict()
+        self.subscribed = False
+        for slot in self.slots:
+            if slot not in resuming:
+                self.release(slot)
+        for slot in resuming:
+            assert slot.room_id is not None and slot.player_id is not None and slot.resume_key is not None
+            await ResumeMessage(
+                roomid=slot.room_id, playerid=slot.player_id, resumekey=slot.resume_key, epoch=slot.epoch
+            ).send(sio=self, callback=partial(self.resume_callback, slot))
+        if any(slot.idle for slot in self.slots):
+            await self.subscribe()
+
+    async def resume_callback(self, slot: BotSlot, data: Dict[str, bool]):
+        if not data.get("resumed"):
+            logger.info(f"{slot.name} couldn't resume its game, looking for a new one")
+            self.release(slot)
+            await self.subscribe()
+
+    async def subscribe(self):
+        if not self.subscribed:
+            self.subscribed = True
+            await ListMessage(subscribe=True).send(sio=self, callback=self.rooms_callback)
+
+    async def rooms_callback(self, rooms: Dict[str, Dict]):
+        self.lobbies = {RoomId(k): LobbyRoom.parse_obj(v) for k, v in rooms.items()}
+        await self.join_lobbies()
+
+    @expect(LobbyUpdateMessage)
+    async def on_lobbyupdate(self, msg: LobbyUpdateMessage):
+        if msg.room is None:
+            self.lobbies.pop(msg.roomid, None)
+        else:
+            self.lobbies[msg.roomid] = msg.room
+        await self.join_lobbies()
+
+    def free_seats(self, room_id: RoomId, room: LobbyRoom) -> int:
+        # Joins that haven't been confirmed yet aren't counted by the lobby directory
+        pending = sum(1 for joining_room, _ in self.joining if joining_room == room_id)
+        return room.maxplayers - room.players - pending
+
+    async def join_lobbies(self):
+        """
+        Sends each idle bot to a lobby with a free seat, and stops receiving lobby updates once no bots are idle
+        """
+        idle = [slot for slot in self.slots if slot.idle]
+        for room_id, room in list(self.lobbies.items()):
+            if not idle:
+                break
+            if room.status != "lobby" or room.game not in all_players:
+                continue
+            for _ in range(self.free_seats(room_id, room)):
+                if not idle:
+                    break
+                slot = idle.pop()
+                slot.room_id, slot.game_name, slot.room_name = room_id, room.game, room.name
+                self.joining[(room_id, slot.name)] = slot
+                await JoinMessage(roomid=room_id, name=slot.name).send(sio=self)
+        if not any(slot.idle for slot in self.slots) and self.subscribed:
+            self.subscribed = False
+            await ListMessage(subscribe=False).send(sio=self)
+
+    @expect(JoinedMessage)
+    async def on_joined(self, msg: JoinedMessage):
+        if msg.broadcast:
+            return
+        slot = self.joining.pop((msg.roomid, msg.name), None)
+        if slot is None:
+            logger.warning(f"Received join confirmation for unknown bot {msg.name} in room {msg.roomid}")
+            return
+        assert slot.game_name is not None
+        logger.info(f"{slot.name} joined Game: {slot.room_name}({slot.game_name})")
+        slot.player_id = msg.playerid
+        slot.resume_key = msg.resumekey
+        player = player_for(slot.game_name, search=settings.PLAYER_SEARCH)
+        slot.player = player(gamerole=msg.gamerole, player_id=msg.playerid)
+        self.players[msg.playerid] = slot
+        self.room_slots.setdefault(msg.roomid, []).append(slot)
+
+    @expect(GamestateMessage)
+    async def on_gamestate(self, msg: GamestateMessage):
+        if msg.playerid is not None:
+            slot = self.players.get(msg.playerid)
+            slots = [] if slot is None else [slot]
+        else:
+            slots = list(self.room_slots.get(msg.roomid, []))
+        if msg.finish is not None:
+            for slot in slots:
+                await self.finished(slot, msg.finish)
+            return
+        # Bots in the same room think at the same time
+        await asyncio.gather(*[self.update_slot(slot, msg) for slot in slots])
+
+    async def update_slot(self, slot: BotSlot, msg: GamestateMessage):
+        async with slot.update_lock:
+            # The bot's game may have finished while waiting for it to see the last state
+            if slot.room_id != msg.roomid or slot.player is None:
+                return
+            assert slot.player_id is not None
+            slot.epoch = msg.epoch
+            player = slot.player
+            move, updated = await self.executor.update(
+                player, board=msg.board, turn=msg.turn, legal_moves=msg.legalmoves
+            )
+            if slot.player is not player:
+                return
+            slot.player = updated
+            if move is not None:
+                await MoveMessage(roomid=msg.roomid, playerid=slot.player_id, move=move).send(sio=self)
+
+    async def finished(self, slot: BotSlot, finish: Finish):
+        assert slot.player_id is not None and slot.room_id is not None
+        if finish.normal:
+            assert finish.scores is not None
+            score = finish.scores[slot.player_id]
+            logger.info(f"{slot.name} {'won' if score > 0 else 'tied' if score == 0 else 'lost'}")
+            slot.retired = settings.RUN_ONCE
+        else:
+            logger.error(f"{slot.name}'s game finished with error: {finish.reason}")
+            if finish.fault == slot.player_id:
+                logger.error(f"AND IT WAS {slot.name}'s FAULT D:")
+                slot.retired = settings.RUN_ONCE or not settings.LEEROY_JENKINS
+            else:
+                slot.retired = settings.RUN_ONCE
+        self.release(slot)
+        if all(slot.retired for slot in self.slots):
+            await self.disconnect()
+        elif slot.idle:
+            await self.subscribe()
+
+    def release(self, slot: BotSlot) -> None:
+        """
+        Takes a bot out of its game, so it can join another
+        """
+        if slot.player_id is not None:
+            self.players.pop(slot.player_id, None)
+        if slot.room_id is not None:
+            room_slots = self.room_slots.get(slot.room_id, [])
+            if slot in room_slots:
+                room_slots.remove(slot)
+            if not room_slots:
+                self.room_slots.pop(slot.room_id, None)
+        slot.leave()
 
     async def on_fail(self, data):
         logger.error(f"Received fail:\n{json.dumps(data, indent=2)}")
+        room_id = data.get("roomid")
+        slot = self.joining.pop((room_id, data.get("name")), None)
+        if slot is None:
+            return
+        logger.info(f"{slot.name} couldn't join room {room_id}, looking for another one")
+        self.release(slot)
+        # Most likely another client took the last seat, so the room is skipped until the lobby directory updates it
+        self.lobbies.pop(room_id, None)
+        if self.subscribed:
+            await self.join_lobbies()
+        else:
+            await self.subscribe()
 
     async def on_disconnect(self):
         logger.error("Disconnected!")
@@ -128,15 +429,23 @@ async def main():
                 headers = {"X-API-KEY": settings.API_KEY}
             else:
                 headers = {}
-            sio = socketio.AsyncClient(reconnection_attempts=settings.CONNECTION_RETRIES)
-            player_client = PlayerClient()
+            sio = WireClient(reconnection_attempts=settings.CONNECTION_RETRIES, wire_format=settings.WIRE_FORMAT)
+            executor = MoveExecutor()
+            player_client: socketio.AsyncClientNamespace
+            if settings.PLAYER_INSTANCES > 1:
+                player_client = MultiplexedPlayerClient(executor=executor)
+            else:
+                player_client = PlayerClient(executor=executor)
             sio.register_namespace(player_client)
-            await sio.connect(settings.ASIMOV_URL, headers=headers)
-            await sio.wait()
+            try:
+                await sio.connect(settings.ASIMOV_URL, headers=headers)
+                await sio.wait()
+            finally:
+                executor.shutdown()
             break
         except ConnectionError:
             logger.warning(f"Connection failed (attempt {i + 1} of {settings.CONNECTION_RETRIES}), waiting 2 secs...")
-            sleep(2)
+            await asyncio.sleep(2)
 
 
 if __name__ == "__main__":
@@ -2,9 +2,10 @@ from typing import Dict, Type
 from aiplayground.types import GameName
 
 from aiplayground.players.base import BasePlayer
+from aiplayground.players.search import SearchPlayer
 from aiplayground.players.spr import ScissorsPaperRockPlayer
-from aiplayground.players.tictactoe import TicTacToeRandomPlayer
-from aiplayground.players.kalaha import KalahaRandomPlayer
+from aiplayground.players.tictactoe import TicTacToeRandomPlayer, TicTacToeSearchPlayer, TicTacToeMCTSPlayer
+from aiplayground.players.kalaha import KalahaRandomPlayer, KalahaSearchPlayer, KalahaMCTSPlayer
 
 
 all_players: Dict[GameName, Type[BasePlayer]] = {
@@ -12,3 +13,22 @@ all_players: Dict[GameName, Type[BasePlayer]] = {
     TicTacToeRandomPlayer.gamename: TicTacToeRandomPlayer,
     KalahaRandomPlayer.gamename: KalahaRandomPlayer,
 }
+
+search_players: Dict[GameName, Type[SearchPlayer]] = {
+    TicTacToeSearchPlayer.gamename: TicTacToeSearchPlayer,
+    KalahaSearchPlayer.gamename: KalahaSearchPlayer,
+}
+
+players_by_name: Dict[str, Type[BasePlayer]] = {
+    player.__name__: player
+    for player in [*all_players.values(), *search_players.values(), TicTacToeMCTSPlayer, KalahaMCTSPlayer]  # type: ignore
+}
+
+
+def player_for(game: GameName, search: bool = False) -> Type[BasePlayer]:
+    """
+    :param search: Use the game's search player, if it has one
+    """
+    if search and game in search_players:
+        return search_players[game]
+    return all_players[game]
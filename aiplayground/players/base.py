@@ -1,5 +1,7 @@
+import random
 from abc import ABC, abstractmethod
-from typing import Optional
+from time import time
+from typing import Optional, List
 
 from aiplayground.logging import logger
 from aiplayground.types import Move, PlayerId, GameName, Board, GameRole
@@ -10,6 +12,8 @@ class BasePlayer(ABC):
     gamerole: Optional[GameRole]
     player_id: PlayerId
     board: Optional[Board] = None
+    legal_moves: Optional[List[Move]] = None
+    deadline: Optional[float] = None
 
     def __init__(self, player_id: PlayerId, gamerole: Optional[GameRole] = None):
         self.gamerole = gamerole
@@ -19,6 +23,7 @@ class BasePlayer(ABC):
         """
         Can be overridden to do processing even when not the player's turn
         Also can be overridden if players want to keep track of previous states
+        The legal moves are in ``self.legal_moves``, if the game server sends them
         :param turn: ID of player who'd turn it is
         :param board: New board state
         """
@@ -32,3 +37,33 @@ class BasePlayer(ABC):
     @abstractmethod
     def get_move(self) -> Move:
         pass
+
+    def time_left(self) -> Optional[float]:
+        """
+        Players that think for a long time should check this and return their best move so far once it's 0
+        :return: Seconds left to make the current move in, or None if moves aren't timed
+        """
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time())
+
+    def fallback_move(self) -> Optional[Move]:
+        """
+        Move made instead if ``get_move`` runs out of time, should be quick to choose
+        Defaults to a random legal move, if the game server sends them
+        """
+        if not self.legal_moves:
+            return None
+        return Move(dict(random.choice(self.legal_moves)))
+
+
+def show_state(
+    player: BasePlayer, board: Board, turn: Optional[PlayerId] = None, legal_moves: Optional[List[Move]] = None
+) -> Optional[Move]:
+    """
+    Updates a player with a new game state, setting its legal moves first so players overriding ``update``
+    with its original signature keep working
+    :param legal_moves: Legal moves of the player who's turn it is, if the game server sends them
+    """
+    player.legal_moves = legal_moves
+    return player.update(board=board, turn=turn)
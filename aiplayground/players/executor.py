@@ -0,0 +1,117 @@
+"""
+Runs players off the event loop, so a player client's connection stays responsive while its bots think
+
+Players are updated in a thread pool, a process pool, or inline on the event loop (``MOVE_EXECUTOR``).
+When a move has a time budget (``MOVE_TIME_BUDGET``) and the player hasn't moved before it runs out,
+the player's ``fallback_move`` is made instead and the late move is discarded. Threads and processes can't be
+stopped part way through a move, so players that think for a long time should check ``time_left`` and return
+their best move so far once it reaches 0. A player still making a late move in a thread isn't shown the next
+game state until it's done, so it's never updated by two threads at once.
+"""
+import asyncio
+import os
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from time import time
+from typing import Dict, Optional, List, Tuple
+
+from aiplayground.logging import logger
+from aiplayground.players.base import BasePlayer, show_state
+from aiplayground.settings import settings
+from aiplayground.types import Board, Move, PlayerId
+
+INLINE = "inline"
+THREAD = "thread"
+PROCESS = "process"
+
+# Allowance for getting a move back from a worker, so players that stop at their deadline still make their move
+GRACE = 0.05
+
+
+def update_player(
+    player: BasePlayer,
+    board: Board,
+    turn: Optional[PlayerId],
+    legal_moves: Optional[List[Move]],
+    deadline: Optional[float],
+) -> Tuple[Optional[Move], BasePlayer]:
+    """
+    Updates a player in a worker, returning the player too, as a worker process updates a copy of it
+    """
+    player.deadline = deadline
+    return show_state(player, board=board, turn=turn, legal_moves=legal_moves), player
+
+
+class MoveExecutor:
+    """
+    Updates players in a pool of workers, with a time budget for each move
+    """
+
+    mode: str
+    budget: Optional[float]
+    pool: Optional[Executor]
+    # Updates of players in threads that ran out of time but haven't finished yet
+    late: Dict[PlayerId, Future]
+
+    def __init__(
+        self,
+        mode: str = settings.MOVE_EXECUTOR,
+        workers: Optional[int] = settings.MOVE_WORKERS,
+        budget: Optional[float] = settings.MOVE_TIME_BUDGET,
+    ):
+        self.mode = mode
+        self.budget = budget
+        self.late = dict()
+        if mode == THREAD:
+            self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="player")
+        elif mode == PROCESS:
+            self.pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+        elif mode == INLINE:
+            self.pool = None
+        else:
+            raise ValueError(f"Unknown move executor {mode!r}, expected {INLINE!r}, {THREAD!r} or {PROCESS!r}")
+
+    async def update(
+        self,
+        player: BasePlayer,
+        board: Board,
+        turn: Optional[PlayerId] = None,
+        legal_moves: Optional[List[Move]] = None,
+    ) -> Tuple[Optional[Move], BasePlayer]:
+        """
+        Shows a player a new game state, and gets its move if it's the player's turn
+        :return: The move to make, if any, and the updated player, which is a new object when updated in a process
+        """
+        our_move = turn is not None and turn == player.player_id
+        deadline = time() + self.budget if our_move and self.budget is not None else None
+        if self.pool is None:
+            return update_player(player, board, turn, legal_moves, deadline)
+        late = self.late.pop(player.player_id, None)
+        if late is not None and not late.done():
+            logger.warning(f"Player {player.player_id} is still making a late move, waiting for it to finish")
+            await asyncio.wait([asyncio.wrap_future(late)])
+        # The fallback move is chosen from what's known here, as the worker may not have started (or is a process)
+        player.board = board
+        player.legal_moves = legal_moves
+        work = self.pool.submit(update_player, player, board, turn, legal_moves, deadline)
+        future = asyncio.wrap_future(work)
+        if deadline is None:
+            return await future
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=deadline - time() + GRACE)
+        except asyncio.TimeoutError:
+            pass
+        fallback = player.fallback_move()
+        if fallback is None:
+            logger.warning(f"Player {player.player_id} ran out of time without a fallback move, waiting for its move")
+            return await future
+        logger.warning(f"Player {player.player_id} ran out of time, making its fallback move")
+        # Stops the update if it hasn't started yet, otherwise the late move is ignored when it completes
+        future.cancel()
+        player.deadline = 0.0
+        if self.mode == THREAD and not work.done():
+            self.late[player.player_id] = work
+        return fallback, player
+
+    def shutdown(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
@@ -1,22 +1,103 @@
 import logging
 import random
 from time import sleep
+from typing import List, Optional, Tuple
 
+from aiplayground.gameservers.kalaha import BANK, OPPOSITE, PIT_MOVES, PITS, SOWING_PATHS, SLOTS, player_b
 from aiplayground.logging import logger
 from aiplayground.players.base import BasePlayer
+from aiplayground.players.search import MCTS, WIN, SearchPlayer
+from aiplayground.solutions import kalaha as kalaha_solution
 from aiplayground.types import GameName, Move
 
+# Search states are the 14 slots as the server stores them, but rotated so the player to move has pits 0-5
+KalahaState = Tuple[int, ...]
+# Pits nearest the bank are tried first, as they're likelier to end in the bank for another turn
+PIT_ORDER = tuple(reversed(range(PITS)))
+
 
 class KalahaRandomPlayer(BasePlayer):
     gamename: GameName = GameName("Kalaha")
     description = "A random player for Kalaha"
 
     def get_move(self) -> Move:
-        assert self.board is not None
-        assert self.gamerole is not None
-        player_pits = self.board[f"pits_{self.gamerole}"]
-        legal_moves = [{"move": idx} for idx, pits in enumerate(player_pits) if pits > 0]
         logger.debug(self.board)
         if logger.isEnabledFor(logging.DEBUG):
             sleep(1.5)
-        return Move(random.choice(legal_moves))
+        return self.random_move()
+
+    def fallback_move(self) -> Move:
+        return self.random_move()
+
+    def random_move(self) -> Move:
+        assert self.board is not None
+        assert self.gamerole is not None
+        legal_moves = self.legal_moves
+        if legal_moves is None:
+            player_pits = self.board[f"pits_{self.gamerole}"]
+            legal_moves = [{"move": idx} for idx, pits in enumerate(player_pits) if pits > 0]
+        # Legal moves from a game server in the same process are shared between games, so the move is a copy
+        return Move(dict(random.choice(legal_moves)))
+
+
+class KalahaSearchPlayer(SearchPlayer[KalahaState]):
+    gamename: GameName = GameName("Kalaha")
+    description = "An alpha-beta search player for Kalaha"
+
+    def root(self) -> KalahaState:
+        assert self.board is not None
+        board = self.board
+        if self.gamerole == player_b:
+            return (*board["pits_b"], board["bank_b"], *board["pits_a"], board["bank_a"])
+        return (*board["pits_a"], board["bank_a"], *board["pits_b"], board["bank_b"])
+
+    def moves(self, state: KalahaState) -> List[int]:
+        return [pit for pit in PIT_ORDER if state[pit]]
+
+    def play(self, state: KalahaState, move: int) -> Tuple[KalahaState, bool]:
+        slots = list(state)
+        pips = slots[move]
+        slots[move] = 0
+        path = SOWING_PATHS[0][move]
+        laps, remainder = divmod(pips, len(path))
+        if laps:
+            for slot in path:
+                slots[slot] += laps
+        for slot in path[:remainder]:
+            slots[slot] += 1
+        last = path[remainder - 1] if remainder else path[-1]
+        if last == BANK[0]:
+            return tuple(slots), False
+        if last < PITS and slots[last] == 1 and slots[OPPOSITE[last]]:
+            slots[BANK[0]] += slots[OPPOSITE[last]] + 1
+            slots[OPPOSITE[last]] = 0
+            slots[last] = 0
+        return (*slots[PITS + 1 :], *slots[: PITS + 1]), True
+
+    def terminal(self, state: KalahaState) -> Optional[float]:
+        ours = sum(state[:PITS])
+        theirs = sum(state[PITS + 1 : SLOTS - 1])
+        if ours and theirs:
+            solution = self.solution
+            if solution is None or ours + theirs > solution.parameter:
+                return None
+            pits = (*state[:PITS], *state[PITS + 1 : SLOTS - 1])
+            margin = state[BANK[0]] - state[BANK[1]] + solution[kalaha_solution.index(pits, ours + theirs)]
+        else:
+            margin = ours + state[BANK[0]] - theirs - state[BANK[1]]
+        if margin > 0:
+            return WIN + margin
+        if margin < 0:
+            return -WIN + margin
+        return 0.0
+
+    def evaluate(self, state: KalahaState) -> float:
+        return state[BANK[0]] - state[BANK[1]]
+
+    def to_move(self, move: int) -> Move:
+        return Move(dict(PIT_MOVES[move]))
+
+
+class KalahaMCTSPlayer(KalahaSearchPlayer):
+    description = "A Monte Carlo tree search player for Kalaha"
+    algorithm = MCTS
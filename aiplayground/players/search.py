@@ -0,0 +1,459 @@
+"""
+Players that search for their moves, with iterative deepening alpha-beta or Monte Carlo tree search
+
+Games are searched over a compact, immutable state seen from the side of the player to move, rather than
+the game server's board, so trying a move is a tuple copy with no validation or undo.
+Both searches share a fixed size transposition table, so a player's memory is bounded however long it thinks,
+and positions reached by different orders of moves are searched once.
+A search stops at the player's ``time_left`` if its moves are timed, and after ``search_time`` otherwise.
+"""
+import math
+import random
+from abc import abstractmethod
+from array import array
+from dataclasses import dataclass
+from time import time
+from typing import Generic, Hashable, List, Optional, Tuple, TypeVar
+
+from aiplayground.logging import logger
+from aiplayground.players.base import BasePlayer
+from aiplayground.settings import settings
+from aiplayground.solutions import SolutionTable, open_solution
+from aiplayground.types import Move
+
+State = TypeVar("State", bound=Hashable)
+
+ALPHABETA = "alphabeta"
+MCTS = "mcts"
+
+# Scores of at least WIN are won games, from the point of view of the player to move
+WIN = 1000.0
+
+# Flags of table entries, EMPTY entries have never been stored
+EMPTY = 0
+EXACT = 1
+LOWER = 2
+UPPER = 3
+
+# Nodes searched between checks of the time
+CHECK_EVERY = 1024
+
+
+class TranspositionTable:
+    """
+    Results of searching positions, in a fixed number of entries indexed by a hash of the position
+
+    Each hash maps to a bucket of two entries. The first keeps the deepest result stored this search, and the
+    second takes whatever else was stored last, including the result the first entry held before a deeper one
+    replaced it. So deep results survive a search while shallow ones near the leaves are still kept.
+    Results of earlier searches (eg. previous moves) are reused, but are replaced first.
+    Entries are stored as columns of arrays, about 34 bytes each.
+    """
+
+    size: int
+    generation: int = 0
+    probes: int = 0
+    hits: int = 0
+
+    def __init__(self, size: int = settings.SEARCH_TABLE_SIZE):
+        """
+        :param size: Number of entries, rounded down to an even power of two
+        """
+        buckets = 1 << max(0, size.bit_length() - 2)
+        self.mask = buckets - 1
+        self.size = buckets * 2
+        self.keys = array("q", [0]) * self.size
+        # Depth searched, or for MCTS the number of visits, entries with more are kept over those with less
+        self.depths = array("l", [0]) * self.size
+        self.values = array("d", [0.0]) * self.size
+        self.flags = array("b", [EMPTY]) * self.size
+        # Best move found, or -1
+        self.moves = array("b", [-1]) * self.size
+        self.ages = array("l", [0]) * self.size
+
+    def new_search(self) -> None:
+        """
+        Marks the entries stored so far as belonging to an earlier search
+        """
+        self.generation += 1
+
+    def probe(self, key: int) -> int:
+        """
+        :return: Index of the entry for the key, or -1 if it isn't stored
+        """
+        self.probes += 1
+        index = (key & self.mask) << 1
+        keys = self.keys
+        flags = self.flags
+        if keys[index] == key and flags[index]:
+            self.hits += 1
+            return index
+        index += 1
+        if keys[index] == key and flags[index]:
+            self.hits += 1
+            return index
+        return -1
+
+    def store(self, key: int, depth: int, value: float, flag: int, move: int) -> None:
+        index = (key & self.mask) << 1
+        keys = self.keys
+        flags = self.flags
+        recent = index + 1
+        if keys[index] == key and flags[index]:
+            pass
+        elif keys[recent] == key and flags[recent]:
+            index = recent
+        elif self.ages[index] != self.generation or depth >= self.depths[index]:
+            # The entry being replaced moves to the second entry, in place of the one there
+            keys[recent] = keys[index]
+            self.depths[recent] = self.depths[index]
+            self.values[recent] = self.values[index]
+            flags[recent] = flags[index]
+            self.moves[recent] = self.moves[index]
+            self.ages[recent] = self.ages[index]
+        else:
+            index = recent
+        keys[index] = key
+        self.depths[index] = depth
+        self.values[index] = value
+        flags[index] = flag
+        self.moves[index] = move
+        self.ages[index] = self.generation
+
+    def clear(self) -> None:
+        self.flags = array("b", [EMPTY]) * self.size
+        self.probes = self.hits = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+
+@dataclass
+class SearchStats:
+    """
+    Statistics of a player's last search
+    :param depth: Deepest iteration completed by alpha-beta
+    :param iterations: Playouts made by MCTS
+    """
+
+    nodes: int = 0
+    seconds: float = 0.0
+    depth: int = 0
+    iterations: int = 0
+    probes: int = 0
+    hits: int = 0
+    value: float = 0.0
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+class SearchPlayer(BasePlayer, Generic[State]):
+    """
+    Base for players that search a game, games implement its state and rules with the abstract methods
+
+    Moves are small ints (eg. a pit or square), and values are from the point of view of the player to move,
+    with positive values being better for them.
+    """
+
+    algorithm: str = ALPHABETA
+    # Seconds to think for each move, moves are made sooner if the player's time runs out first
+    search_time: float = settings.SEARCH_TIME
+    table_size: int = settings.SEARCH_TABLE_SIZE
+    max_depth: int = 64
+    # Exploration constant of UCT
+    exploration: float = 1.4
+    table: TranspositionTable
+    stats: SearchStats
+    # The game's solution table, if one has been generated, which terminal() can look positions up in
+    solution: Optional[SolutionTable]
+    # The root state and best move of the last search, which fallback_move makes if its still the position
+    best: Optional[Tuple[State, int]] = None
+    # Time the current search stops at, and whether it stopped short of the end of the game anywhere
+    stop_at: float = 0.0
+    cutoff: bool = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.table = TranspositionTable(self.table_size)
+        self.stats = SearchStats()
+        self.solution = open_solution(self.gamename)
+
+    def __getstate__(self):
+        # Tables aren't copied to and from worker processes, players updated in one start each search with a new table
+        # and the solution table mapped by that process
+        state = dict(vars(self))
+        del state["table"]
+        del state["solution"]
+        return state
+
+    def __setstate__(self, state):
+        vars(self).update(state)
+        self.table = TranspositionTable(self.table_size)
+        self.solution = open_solution(self.gamename)
+
+    @abstractmethod
+    def root(self) -> State:
+        """
+        :return: The state of the current board, with the player to move
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def moves(self, state: State) -> List[int]:
+        """
+        :return: A new list of the legal moves, those most likely to be best first
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def play(self, state: State, move: int) -> Tuple[State, bool]:
+        """
+        :return: The state after a move, and whether it's then the other player's turn
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def terminal(self, state: State) -> Optional[float]:
+        """
+        :return: None if the game isn't over, otherwise 0 for a draw, at least WIN for a win and at most -WIN for a loss
+        Games with a solution table return the value of the positions in it, as if the game were over
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def evaluate(self, state: State) -> float:
+        """
+        :return: Estimated value of a state that isn't terminal, less than WIN
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def to_move(self, move: int) -> Move:
+        raise NotImplementedError
+
+    def key(self, state: State) -> int:
+        """
+        Hash of a state for the transposition table, which should fit in 64 bits
+        Games can override this with a hash without collisions, otherwise states that collide share results
+        """
+        return hash(state)
+
+    def get_move(self) -> Move:
+        root = self.root()
+        self.stats = stats = SearchStats()
+        started = time()
+        stop_at = started + self.search_time
+        time_left = self.time_left()
+        if time_left is not None:
+            stop_at = min(stop_at, started + time_left)
+        table = self.table
+        table.new_search()
+        probes, hits = table.probes, table.hits
+        if self.algorithm == MCTS:
+            move = self.search_mcts(root, stop_at)
+        else:
+            move = self.search_alphabeta(root, stop_at)
+        stats.seconds = time() - started
+        stats.probes = table.probes - probes
+        stats.hits = table.hits - hits
+        logger.debug(f"Searched {stats}")
+        return self.to_move(move)
+
+    def fallback_move(self) -> Optional[Move]:
+        best = self.best
+        if best is not None and self.board is not None and best[0] == self.root():
+            return self.to_move(best[1])
+        return super().fallback_move()
+
+    def search_alphabeta(self, root: State, stop_at: float) -> int:
+        """
+        Searches one ply deeper at a time until time runs out, the result is proven or max_depth is reached
+        :return: The best move of the deepest search completed
+        """
+        stats = self.stats
+        moves = self.moves(root)
+        best_move = moves[0]
+        self.best = (root, best_move)
+        started = time()
+        for depth in range(1, self.max_depth + 1):
+            self.cutoff = False
+            try:
+                value, move = self.search_root(root, moves, depth, stop_at)
+            except _OutOfTime:
+                break
+            best_move = move
+            self.best = (root, best_move)
+            stats.depth = depth
+            stats.value = value
+            # Moves found best are searched first next time, which makes cutoffs likelier
+            moves.remove(move)
+            moves.insert(0, move)
+            if abs(value) >= WIN or not self.cutoff:
+                break
+            # The next iteration would take at least as long as all those before it
+            if time() + (time() - started) > stop_at:
+                break
+        return best_move
+
+    def search_root(self, root: State, moves: List[int], depth: int, stop_at: float) -> Tuple[float, int]:
+        self.stop_at = stop_at
+        alpha = -math.inf
+        best_move = moves[0]
+        for move in moves:
+            child, switched = self.play(root, move)
+            if switched:
+                value = -self.alphabeta(child, depth - 1, -math.inf, -alpha)
+            else:
+                value = self.alphabeta(child, depth - 1, alpha, math.inf)
+            if value > alpha:
+                alpha, best_move = value, move
+        self.table.store(self.key(root), depth, alpha, EXACT, best_move)
+        return alpha, best_move
+
+    def alphabeta(self, state: State, depth: int, alpha: float, beta: float) -> float:
+        stats = self.stats
+        stats.nodes += 1
+        if stats.nodes % CHECK_EVERY == 0 and time() > self.stop_at:
+            raise _OutOfTime
+        value = self.terminal(state)
+        if value is not None:
+            return value
+        if depth <= 0:
+            self.cutoff = True
+            return self.evaluate(state)
+        table = self.table
+        key = self.key(state)
+        entry = table.probe(key)
+        hint = -1
+        if entry >= 0:
+            if table.depths[entry] >= depth:
+                value = table.values[entry]
+                flag = table.flags[entry]
+                if flag == EXACT or (flag == LOWER and value >= beta) or (flag == UPPER and value <= alpha):
+                    # Results that aren't proven may have stopped short of the end of the game
+                    if abs(value) < WIN:
+                        self.cutoff = True
+                    return value
+            hint = table.moves[entry]
+        moves = self.moves(state)
+        if hint in moves and moves[0] != hint:
+            moves.remove(hint)
+            moves.insert(0, hint)
+        original_alpha = alpha
+        best = -math.inf
+        best_move = -1
+        for move in moves:
+            child, switched = self.play(state, move)
+            if switched:
+                value = -self.alphabeta(child, depth - 1, -beta, -alpha)
+            else:
+                value = self.alphabeta(child, depth - 1, alpha, beta)
+            if value > best:
+                best, best_move = value, move
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+        flag = UPPER if best <= original_alpha else LOWER if best >= beta else EXACT
+        table.store(key, depth, best, flag, best_move)
+        return best
+
+    def search_mcts(self, root: State, stop_at: float) -> int:
+        """
+        Plays out random games from the root until time runs out, choosing moves to explore with UCT
+        Visits and total results of each state are kept in the transposition table
+        :return: The most visited move
+        """
+        stats = self.stats
+        moves = self.moves(root)
+        self.best = (root, moves[0])
+        while True:
+            self.mcts_iteration(root)
+            stats.iterations += 1
+            if stats.iterations % 16 == 0 and time() > stop_at:
+                break
+        table = self.table
+        best_move, most_visits = moves[0], -1
+        for move in moves:
+            child, switched = self.play(root, move)
+            entry = table.probe(self.key(child))
+            if entry >= 0 and table.depths[entry] > most_visits:
+                best_move, most_visits = move, table.depths[entry]
+                stats.value = table.values[entry] / table.depths[entry] * (-1 if switched else 1)
+        self.best = (root, best_move)
+        return best_move
+
+    def mcts_iteration(self, root: State) -> None:
+        table = self.table
+        stats = self.stats
+        # Keys of the states visited, with whether their player to move is the root's
+        path: List[Tuple[int, bool]] = []
+        state = root
+        ours = True
+        while True:
+            stats.nodes += 1
+            key = self.key(state)
+            entry = table.probe(key)
+            path.append((key, ours))
+            # The root's moves are searched even if its value is known, to find the move that achieves it
+            value = self.terminal(state) if len(path) > 1 else None
+            if value is not None:
+                result = math.copysign(1.0, value) if value else 0.0
+                break
+            if entry < 0:
+                result = self.playout(state)
+                break
+            # Unvisited moves are tried first, then the move with the highest upper confidence bound
+            log_visits = math.log(table.depths[entry] or 1)
+            selected = None
+            best_bound = -math.inf
+            for move in self.moves(state):
+                child, switched = self.play(state, move)
+                child_entry = table.probe(self.key(child))
+                if child_entry < 0:
+                    selected = child, switched
+                    break
+                visits = table.depths[child_entry]
+                mean = table.values[child_entry] / visits
+                bound = (-mean if switched else mean) + self.exploration * math.sqrt(log_visits / visits)
+                if bound > best_bound:
+                    selected, best_bound = (child, switched), bound
+            assert selected is not None
+            state, switched = selected
+            if switched:
+                ours = not ours
+        # The result is from the point of view of the last state's player to move
+        if not ours:
+            result = -result
+        for key, node_ours in path:
+            value = result if node_ours else -result
+            entry = table.probe(key)
+            if entry >= 0:
+                table.store(key, table.depths[entry] + 1, table.values[entry] + value, EXACT, -1)
+            else:
+                table.store(key, 1, value, EXACT, -1)
+
+    def playout(self, state: State) -> float:
+        """
+        Plays random moves until the game ends
+        :return: 1, 0 or -1 for a win, draw or loss of the state's player to move
+        """
+        sign = 1.0
+        while True:
+            value = self.terminal(state)
+            if value is not None:
+                return sign * math.copysign(1.0, value) if value else 0.0
+            state, switched = self.play(state, random.choice(self.moves(state)))
+            if switched:
+                sign = -sign
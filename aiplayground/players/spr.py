@@ -11,3 +11,6 @@ class ScissorsPaperRockPlayer(BasePlayer):
     def get_move(self) -> Move:
         move = random.choice(["scissors", "paper", "rock"])
         return Move({"move": move})
+
+    def fallback_move(self) -> Move:
+        return self.get_move()
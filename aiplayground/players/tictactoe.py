@@ -1,10 +1,32 @@
 import logging
 import random
 from time import sleep
+from typing import List, Optional, Tuple
 
 from aiplayground.logging import logger
 from aiplayground.players.base import BasePlayer
+from aiplayground.players.search import MCTS, WIN, SearchPlayer
+from aiplayground.solutions import UNSOLVED, tictactoe as tictactoe_solution
 from aiplayground.types import GameName, Move
+from aiplayground.utils.tictactoe import (
+    EMPTY_SQUARES,
+    FULL,
+    SQUARE_MOVES,
+    SQUARES,
+    WIN_LINES,
+    masks_from_grid,
+    occupied_mask,
+)
+
+# Search states are the squares of the player to move and of their opponent
+TicTacToeState = Tuple[int, int]
+# Whether a set of squares includes a line, for every set of squares
+WON: Tuple[bool, ...] = tuple(any(mask & line == line for line in WIN_LINES) for mask in range(FULL + 1))
+# Empty squares with the centre first and corners before edges, as they're on more lines
+SQUARE_ORDER: Tuple[int, ...] = (4, 0, 2, 6, 8, 1, 3, 5, 7)
+ORDERED_EMPTY_SQUARES: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(sq for sq in SQUARE_ORDER if sq in empty) for empty in EMPTY_SQUARES
+)
 
 
 class TicTacToeRandomPlayer(BasePlayer):
@@ -12,12 +34,69 @@ class TicTacToeRandomPlayer(BasePlayer):
     description = "A random player for tic tac toe"
 
     def get_move(self) -> Move:
-        assert self.board is not None
         logger.debug(self.board)
         if logger.isEnabledFor(logging.DEBUG):
             sleep(1.5)
-        available_moves = [
-            {"row": row, "col": col} for row in range(3) for col in range(3) if self.board["grid"][row][col] is None
-        ]
-        random.choice(available_moves)
-        return Move(random.choice(available_moves))
+        return self.random_move()
+
+    def fallback_move(self) -> Move:
+        return self.random_move()
+
+    def random_move(self) -> Move:
+        assert self.board is not None
+        if self.legal_moves is not None:
+            return Move(dict(random.choice(self.legal_moves)))
+        available_squares = EMPTY_SQUARES[occupied_mask(self.board["grid"])]
+        return Move(dict(SQUARE_MOVES[random.choice(available_squares)]))
+
+
+class TicTacToeSearchPlayer(SearchPlayer[TicTacToeState]):
+    """
+    Searches the whole game from its first move, so never loses, or looks its moves up if the game's been solved
+    """
+
+    gamename: GameName = GameName("TicTacToe")
+    description = "An alpha-beta search player for tic tac toe"
+    max_depth = SQUARES
+
+    def root(self) -> TicTacToeState:
+        assert self.board is not None
+        masks = masks_from_grid(self.board["grid"])
+        ours = masks.pop(self.gamerole, 0) if self.gamerole is not None else 0
+        return ours, sum(masks.values())
+
+    def moves(self, state: TicTacToeState) -> List[int]:
+        return list(ORDERED_EMPTY_SQUARES[state[0] | state[1]])
+
+    def play(self, state: TicTacToeState, move: int) -> Tuple[TicTacToeState, bool]:
+        return (state[1], state[0] | 1 << move), True
+
+    def terminal(self, state: TicTacToeState) -> Optional[float]:
+        # Only the player who just moved can have won
+        if WON[state[1]]:
+            return -WIN
+        if state[0] | state[1] == FULL:
+            return 0.0
+        if self.solution is not None:
+            value = self.solution[tictactoe_solution.index(*state)]
+            if value > 0:
+                return WIN + value
+            if value < 0 and value != UNSOLVED:
+                return -WIN + value
+            if value == 0:
+                return 0.0
+        return None
+
+    def evaluate(self, state: TicTacToeState) -> float:
+        return 0.0
+
+    def key(self, state: TicTacToeState) -> int:
+        return state[0] | state[1] << SQUARES
+
+    def to_move(self, move: int) -> Move:
+        return Move(dict(SQUARE_MOVES[move]))
+
+
+class TicTacToeMCTSPlayer(TicTacToeSearchPlayer):
+    description = "A Monte Carlo tree search player for tic tac toe"
+    algorithm = MCTS
@@ -0,0 +1,223 @@
+"""
+Plays games between players in a single process, without a broker, redis or socket.io
+
+Every player is shown every game state as it would be over socket.io, and the player whose turn it is moves::
+
+    python -m aiplayground.runner --game Kalaha --games 10000
+    python -m aiplayground.runner --game TicTacToe --player TicTacToeRandomPlayer --player TicTacToeRandomPlayer
+    python -m aiplayground.runner --game Kalaha --games 20 --player KalahaSearchPlayer --player KalahaRandomPlayer
+"""
+import argparse
+import random
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Dict, List, Optional, Sequence, Type
+
+from aiplayground.exceptions import GameCompleted, IllegalMove
+from aiplayground.gameservers import all_games, BaseGameServer
+from aiplayground.players import all_players, players_by_name, BasePlayer
+from aiplayground.players.base import show_state
+from aiplayground.types import PlayerId
+
+
+@dataclass
+class MatchResult:
+    scores: Dict[PlayerId, int]
+    moves: int
+    normal: bool = True
+    fault: Optional[PlayerId] = None
+    reason: Optional[str] = None
+
+
+@dataclass
+class LatencyStats:
+    """
+    Per-move latencies, with a fixed size random sample of them kept for percentiles
+    """
+
+    sample_size: int = 100000
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    samples: List[float] = field(default_factory=list)
+
+    def add(self, latency: float) -> None:
+        self.count += 1
+        self.total += latency
+        if latency > self.max:
+            self.max = latency
+        if len(self.samples) < self.sample_size:
+            self.samples.append(latency)
+        else:
+            i = random.randrange(self.count)
+            if i < self.sample_size:
+                self.samples[i] = latency
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+@dataclass
+class RunReport:
+    """
+    Results of a run, ``wins``, ``draws`` and ``losses`` are counted per seat
+    """
+
+    game: str
+    players: List[str]
+    games: int = 0
+    moves: int = 0
+    seconds: float = 0.0
+    illegal: int = 0
+    wins: List[int] = field(default_factory=list)
+    draws: List[int] = field(default_factory=list)
+    losses: List[int] = field(default_factory=list)
+    latency: LatencyStats = field(default_factory=LatencyStats)
+
+    def __post_init__(self):
+        seats = len(self.players)
+        self.wins = self.wins or [0] * seats
+        self.draws = self.draws or [0] * seats
+        self.losses = self.losses or [0] * seats
+
+    def add(self, seat_ids: Sequence[PlayerId], result: MatchResult) -> None:
+        self.games += 1
+        self.moves += result.moves
+        if not result.normal:
+            self.illegal += 1
+        for seat, player_id in enumerate(seat_ids):
+            score = result.scores.get(player_id, 0)
+            if score > 0:
+                self.wins[seat] += 1
+            elif score == 0:
+                self.draws[seat] += 1
+            else:
+                self.losses[seat] += 1
+
+    @property
+    def games_per_second(self) -> float:
+        return self.games / self.seconds if self.seconds else 0.0
+
+    @property
+    def moves_per_second(self) -> float:
+        return self.moves / self.seconds if self.seconds else 0.0
+
+
+def play_match(
+    game_type: Type[BaseGameServer],
+    player_types: Sequence[Type[BasePlayer]],
+    seat_ids: Sequence[PlayerId],
+    latency: Optional[LatencyStats] = None,
+) -> MatchResult:
+    """
+    Plays one game to completion
+    :param game_type: Game to play
+    :param player_types: Player for each seat, in the order they join the game
+    :param seat_ids: Player ID for each seat
+    :param latency: Records the time from each state being shown to the players until the move has been made
+    """
+    game = game_type()
+    players = []
+    for player_id, player_type in zip(seat_ids, player_types):
+        gamerole = game.add_player(player_id)
+        players.append(player_type(player_id=player_id, gamerole=gamerole))
+    game.start()
+    board = game.show_board()
+    while True:
+        turn = game.turn
+        started = perf_counter()
+        # As sent by a game server with SEND_LEGAL_MOVES, they're reused to validate the move
+        legal_moves = game.legal_moves()
+        move = None
+        for player in players:
+            player_move = show_state(player, board=board, turn=turn, legal_moves=legal_moves)
+            if player.player_id == turn:
+                move = player_move
+        assert turn is not None and move is not None
+        try:
+            board = game.move(turn, move)
+        except GameCompleted:
+            game.playing = False
+            return MatchResult(scores=game.score(), moves=game.movenumber)
+        except IllegalMove as e:
+            return MatchResult(
+                scores={p: (-1 if p == turn else 1) for p in game.players},
+                moves=game.movenumber,
+                normal=False,
+                fault=turn,
+                reason=e.details,
+            )
+        finally:
+            if latency is not None:
+                latency.add(perf_counter() - started)
+
+
+def run(game_type: Type[BaseGameServer], player_types: Sequence[Type[BasePlayer]], games: int) -> RunReport:
+    """
+    Plays a number of games between the same players
+    """
+    if len(player_types) != game_type.max_players:
+        raise ValueError(f"{game_type.gamename} needs {game_type.max_players} players, got {len(player_types)}")
+    for player_type in player_types:
+        if player_type.gamename != game_type.gamename:
+            raise ValueError(f"{player_type.__name__} plays {player_type.gamename}, not {game_type.gamename}")
+    report = RunReport(game=game_type.gamename, players=[player_type.__name__ for player_type in player_types])
+    seat_ids = [PlayerId(f"seat-{seat}") for seat in range(len(player_types))]
+    started = perf_counter()
+    for _ in range(games):
+        report.add(seat_ids, play_match(game_type, player_types, seat_ids, latency=report.latency))
+    report.seconds = perf_counter() - started
+    return report
+
+
+def print_report(report: RunReport) -> None:
+    latency = report.latency
+    print(f"{report.games} games of {report.game}, {report.moves} moves in {report.seconds:.2f}s")
+    print(f"{report.games_per_second:.0f} games/s ({report.games_per_second * 3600:.0f} games/h)")
+    print(f"{report.moves_per_second:.0f} moves/s")
+    print(
+        f"Move latency us: mean {latency.mean * 1e6:.1f}, p50 {latency.percentile(50) * 1e6:.1f}, "
+        f"p99 {latency.percentile(99) * 1e6:.1f}, max {latency.max * 1e6:.1f}"
+    )
+    if report.illegal:
+        print(f"{report.illegal} games ended with an illegal move")
+    print(f"{'seat':>4} {'player':>24} {'wins':>8} {'draws':>8} {'losses':>8}")
+    for seat, name in enumerate(report.players):
+        print(f"{seat:>4} {name:>24} {report.wins[seat]:>8} {report.draws[seat]:>8} {report.losses[seat]:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--game", choices=sorted(all_games), required=True)
+    parser.add_argument(
+        "--player",
+        action="append",
+        choices=sorted(players_by_name),
+        help="Player for each seat, in order, defaults to the game's player in every seat",
+    )
+    parser.add_argument("--games", type=int, default=1000, help="Number of games to play")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    game_type = all_games[args.game]
+    if args.player:
+        player_types = [players_by_name[name] for name in args.player]
+    else:
+        player_types = [all_players[game_type.gamename]] * game_type.max_players
+    try:
+        report = run(game_type, player_types, args.games)
+    except ValueError as e:
+        parser.error(str(e))
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -21,7 +21,24 @@ class Settings(BaseSettings):
     REDIS_URL: Optional[str] = Field(None)
     REDORM_URL: Optional[str] = None
     SOCKETIO_REDIS_URL: Optional[str] = None
+    GAMESERVER_KEY: Optional[str] = Field(
+        None, description="API key of trusted game servers, whose messages only get a structural check"
+    )
+    VALIDATION_STATS_INTERVAL: Optional[float] = Field(
+        None, description="Seconds between logging inbound message validation counters, disabled if not set"
+    )
     USER_APPROVAL_REQUIRED: bool = Field(False, description="Require admin approval of users before the can signin")
+    CACHE_FLUSH_INTERVAL: float = Field(0.25, description="Seconds between writing cached room changes to redis")
+    CACHE_MAX_STALENESS: float = Field(
+        0.5, description="Seconds before a cached room owned by another broker worker is reloaded from redis"
+    )
+    CACHE_IDLE_TIMEOUT: float = Field(
+        600.0, description="Seconds a cached room can go unused before it's evicted, eg. if its game server is gone"
+    )
+    SPECTATE_PAGE_SIZE: int = Field(100, description="Number of game states sent per spectate reply by default")
+    SPECTATE_MAX_PAGE_SIZE: int = Field(
+        1000, description="Largest number of game states a spectator can request at once"
+    )
 
     # Game Server / Player Settings
     ASIMOV_URL: str = Field("http://127.0.0.1:8000", description="URL for asimov broker / API")
@@ -30,14 +47,35 @@ class Settings(BaseSettings):
     PASSWORD: str = ""
     RUN_ONCE: bool = Field(False, description="Whether to quit after one game")
     CONNECTION_RETRIES: int = 5
+    WIRE_FORMAT: str = Field("json", description="Format of messages to and from the broker, 'json' or 'msgpack'")
 
     # Game Server Settings
     GAME: str = "ScissorsPaperRock"
     LOBBY_NAME: str = "Some lobby"
+    MAX_ROOMS: int = Field(1, description="Number of rooms a game server hosts at once")
+    SEND_LEGAL_MOVES: bool = Field(
+        False, description="Include the legal moves of the player who's turn it is in game updates"
+    )
+    MOVE_TIME_LIMIT: Optional[float] = Field(
+        None, description="Seconds players have for each move, overrides the game's time control if set"
+    )
+    GAME_TIME_LIMIT: Optional[float] = Field(
+        None, description="Seconds players have for all their moves in a game, overrides the game's time control if set"
+    )
 
     # Player Settings
     PLAYER_NAME: PlayerName = Field("Some Player", description="")
     LEEROY_JENKINS: bool = Field(False, description="Whether to keep playing new games after making an illegal move")
+    PLAYER_INSTANCES: int = Field(1, description="Number of bots played at once over a single connection")
+    MOVE_EXECUTOR: str = Field("thread", description="Where bots compute moves, 'thread', 'process' or 'inline'")
+    MOVE_WORKERS: Optional[int] = Field(None, description="Number of threads or processes bots compute moves in")
+    MOVE_TIME_BUDGET: Optional[float] = Field(
+        None, description="Seconds a bot has to move before its fallback move is made, unlimited if not set"
+    )
+    PLAYER_SEARCH: bool = Field(False, description="Whether bots use a game's search player instead of its random one")
+    SEARCH_TIME: float = Field(0.1, description="Seconds search players think for per move, if they have the time")
+    SEARCH_TABLE_SIZE: int = Field(1 << 17, description="Entries in each search player's transposition table")
+    SOLUTIONS_DIR: str = Field("solutions", description="Directory of solution tables search players look up")
 
     @validator("REDORM_URL", pre=True, always=True)
     def default_redorm_url(cls, v, values):
@@ -0,0 +1 @@
+from aiplayground.solutions.table import SolutionTable, open_solution, solution_path, write_solution, UNSOLVED
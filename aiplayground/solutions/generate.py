@@ -0,0 +1,39 @@
+"""
+Generates the solution tables of games, which search players use when they're in ``SOLUTIONS_DIR``
+
+TicTacToe is solved completely, and Kalaha for every position with up to ``--seeds`` seeds in the pits::
+
+    python -m aiplayground.solutions.generate --game TicTacToe
+    python -m aiplayground.solutions.generate --game Kalaha --seeds 10
+"""
+import argparse
+from time import perf_counter
+
+from aiplayground.solutions import kalaha, tictactoe
+from aiplayground.solutions.table import UNSOLVED, solution_path, write_solution
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--game", choices=[tictactoe.GAME, kalaha.GAME], action="append", help="Defaults to both")
+    parser.add_argument("--seeds", type=int, default=8, help="Most seeds in the pits of Kalaha positions solved")
+    parser.add_argument("--directory", default=None, help="Defaults to SOLUTIONS_DIR")
+    args = parser.parse_args()
+    for game in args.game or [tictactoe.GAME, kalaha.GAME]:
+        started = perf_counter()
+        if game == kalaha.GAME:
+            if not 0 <= args.seeds <= kalaha.MAX_SEEDS:
+                parser.error(f"--seeds must be between 0 and {kalaha.MAX_SEEDS}")
+            parameter = args.seeds
+            values = kalaha.solve(args.seeds)
+        else:
+            parameter = 0
+            values = tictactoe.solve()
+        path = solution_path(game, args.directory)
+        write_solution(path, game, parameter, values)
+        solved = len(values) - values.count(UNSOLVED)
+        print(f"{game}: solved {solved} of {len(values)} positions in {perf_counter() - started:.1f}s, wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
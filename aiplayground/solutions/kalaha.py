@@ -0,0 +1,136 @@
+"""
+Perfect play of Kalaha endgames, solved for every position with up to a number of seeds left in the pits
+
+Banks don't change what's best once the seeds in the pits are known, so positions are the 12 pits seen from
+the player to move, their own pits first. Values are the most seeds the player to move can finish with more than
+their opponent, counting only seeds in the pits, so a position's final margin is its bank difference plus its value.
+Positions are ranked by their number of seeds, then as compositions of those seeds over the pits, so every
+position with up to the most seeds has an index without any gaps.
+"""
+import sys
+from array import array
+from itertools import combinations
+from typing import List, Sequence, Tuple
+
+from aiplayground.exceptions import GameCompleted
+from aiplayground.gameservers.kalaha import KalahaServer, PITS, player_a, player_b
+from aiplayground.solutions.table import UNSOLVED
+from aiplayground.types import Board, PlayerId
+
+GAME = KalahaServer.gamename
+ALL_PITS = PITS * 2
+# Tables take a byte per position, positions(23) is about 834 million, and positions(24) over a GiB
+MAX_SEEDS = 23
+
+# Binomial coefficients, COMBINATIONS[n][k] is n choose k
+COMBINATIONS: List[List[int]] = [[1]]
+for _n in range(1, MAX_SEEDS + ALL_PITS + 1):
+    _row = COMBINATIONS[-1]
+    COMBINATIONS.append([1, *[_row[k - 1] + _row[k] for k in range(1, _n)], 1])
+
+
+def choose(n: int, k: int) -> int:
+    return COMBINATIONS[n][k] if 0 <= k <= n else 0
+
+
+def positions(max_seeds: int) -> int:
+    """
+    :return: Number of positions with up to max_seeds seeds
+    """
+    return choose(max_seeds + ALL_PITS, ALL_PITS)
+
+
+def index(pits: Sequence[int], seeds: int) -> int:
+    """
+    :param pits: The pits of the player to move, then their opponent's
+    :param seeds: Total seeds in the pits
+    """
+    # Positions with fewer seeds come first
+    position = choose(seeds + ALL_PITS - 1, ALL_PITS)
+    remaining = seeds
+    for i in range(ALL_PITS - 1):
+        parts = ALL_PITS - i
+        # Compositions with fewer seeds in this pit come first
+        position += choose(remaining + parts - 1, parts - 1) - choose(remaining - pits[i] + parts - 1, parts - 1)
+        remaining -= pits[i]
+    return position
+
+
+def compositions(seeds: int):
+    """
+    Every way of putting a number of seeds in the pits
+    """
+    for bars in combinations(range(seeds + ALL_PITS - 1), ALL_PITS - 1):
+        previous = -1
+        pits = []
+        for bar in bars:
+            pits.append(bar - previous - 1)
+            previous = bar
+        pits.append(seeds + ALL_PITS - 2 - previous)
+        yield tuple(pits)
+
+
+def solve(max_seeds: int) -> array:
+    """
+    :return: The value of every position with up to max_seeds seeds
+    """
+    if not 0 <= max_seeds <= MAX_SEEDS:
+        raise ValueError(f"Most seeds must be between 0 and {MAX_SEEDS}")
+    values = array("b", [UNSOLVED]) * positions(max_seeds)
+    mover, opponent = PlayerId(player_a), PlayerId(player_b)
+    game = KalahaServer.from_board(
+        Board({"bank_a": 0, "bank_b": 0, "pits_a": [0] * PITS, "pits_b": [0] * PITS}),
+        roles={player_a: mover, player_b: opponent},
+        turn=mover,
+    )
+
+    def value(pits: Tuple[int, ...]) -> int:
+        seeds = sum(pits)
+        position = index(pits, seeds)
+        if values[position] != UNSOLVED:
+            return values[position]
+        ours = sum(pits[:PITS])
+        if not ours or ours == seeds:
+            values[position] = ours - (seeds - ours)
+            return values[position]
+        game.board = Board({"bank_a": 0, "bank_b": 0, "pits_a": pits[:PITS], "pits_b": pits[PITS:]})
+        game.turn = mover
+        game.legal_cache = None
+        # Each move's seeds banked, and the position after it unless it ended the game
+        children = []
+        legal_moves = game.legal_moves()
+        assert legal_moves
+        for move in list(legal_moves):
+            try:
+                game.push_move(mover, move)
+            except GameCompleted:
+                slots = game.slots
+                children.append((slots[PITS] + sum(slots[:PITS]) - sum(slots[PITS + 1 : -1]), None, False))
+            else:
+                slots = game.slots
+                if game.turn == mover:
+                    children.append((slots[PITS], (*slots[:PITS], *slots[PITS + 1 : -1]), False))
+                else:
+                    children.append((slots[PITS], (*slots[PITS + 1 : -1], *slots[:PITS]), True))
+            game.pop_move()
+        best = -MAX_SEEDS
+        for banked, child, switched in children:
+            if child is None:
+                best = max(best, banked)
+            elif switched:
+                best = max(best, banked - value(child))
+            else:
+                best = max(best, banked + value(child))
+        values[position] = best
+        return best
+
+    recursion_limit = sys.getrecursionlimit()
+    # Moves that don't reach a bank move seeds towards it, so a line of moves is at most this long
+    sys.setrecursionlimit(max(recursion_limit, (max_seeds + 1) * (PITS * max_seeds + 1) + 100))
+    try:
+        for seeds in range(max_seeds + 1):
+            for pits in compositions(seeds):
+                value(pits)
+    finally:
+        sys.setrecursionlimit(recursion_limit)
+    return values
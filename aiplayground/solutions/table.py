@@ -0,0 +1,91 @@
+"""
+On disk format of solution tables, which bots memory-map rather than read
+
+A table is a header followed by one signed byte per position, at the position's index. Lookups index the
+mapped file directly, so a table's pages are only read as they're used, and are shared through the page cache
+by every process on a host that maps the same file.
+"""
+import mmap
+import os
+import struct
+from array import array
+from functools import lru_cache
+from typing import Optional
+
+from aiplayground.settings import settings
+
+MAGIC = b"AIPS"
+VERSION = 1
+# Magic, version, game name, game specific parameter (eg. the most seeds of Kalaha positions) and positions
+HEADER = struct.Struct("<4sH32sHQ")
+
+# Value of positions that weren't solved, eg. because they can't be reached
+UNSOLVED = -128
+
+
+class SolutionTable:
+    """
+    Values of a game's positions, read from a memory-mapped file
+    """
+
+    game: str
+    parameter: int
+    positions: int
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, game, self.parameter, self.positions = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            self.map.close()
+            raise ValueError(f"{path} isn't a version {VERSION} solution table")
+        if len(self.map) != HEADER.size + self.positions:
+            self.map.close()
+            raise ValueError(f"{path} should have {self.positions} positions, but is {len(self.map)} bytes")
+        self.game = game.rstrip(b"\0").decode()
+        self.values = memoryview(self.map)[HEADER.size :].cast("b")
+
+    def __getitem__(self, index: int) -> int:
+        return self.values[index]
+
+    def __len__(self) -> int:
+        return self.positions
+
+    def close(self) -> None:
+        self.values.release()
+        self.map.close()
+
+
+def solution_path(game: str, directory: Optional[str] = None) -> str:
+    return os.path.join(directory or settings.SOLUTIONS_DIR, f"{game}.solution")
+
+
+def write_solution(path: str, game: str, parameter: int, values: array) -> None:
+    """
+    Writes a table, replacing any existing one at once so bots that have the old one mapped keep working
+    :param values: Signed byte value of each position
+    """
+    assert values.typecode == "b"
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    partial = f"{path}.partial"
+    with open(partial, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, game.encode(), parameter, len(values)))
+        values.tofile(f)
+    os.replace(partial, path)
+
+
+@lru_cache(maxsize=None)
+def open_solution(game: str) -> Optional[SolutionTable]:
+    """
+    Maps a game's table from ``SOLUTIONS_DIR`` once per process
+    :return: The table, or None if it hasn't been generated
+    """
+    path = solution_path(game)
+    if not os.path.exists(path):
+        return None
+    table = SolutionTable(path)
+    if table.game != game:
+        raise ValueError(f"{path} is a table of {table.game}, not {game}")
+    return table
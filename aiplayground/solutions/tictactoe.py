@@ -0,0 +1,87 @@
+"""
+Perfect play of tic tac toe, solved by playing out every game with TicTacToeServer
+
+Positions are indexed by their squares in base 3, seen from the player to move: 0 for empty, 1 for theirs
+and 2 for their opponent's. Values are from the player to move's point of view, 10 - n for a win n moves from now,
+-(10 - n) for a loss and 0 for a draw, so the quickest wins and slowest losses are worth most.
+"""
+from array import array
+from typing import Dict, Tuple
+
+from aiplayground.exceptions import GameCompleted
+from aiplayground.gameservers.tictactoe import TicTacToeServer, player_o, player_x
+from aiplayground.solutions.table import UNSOLVED
+from aiplayground.types import PlayerId
+from aiplayground.utils.tictactoe import FULL, SQUARES
+
+GAME = TicTacToeServer.gamename
+POSITIONS = 3**SQUARES
+# Value of the position after the opponent won
+LOST = -10
+
+# Base 3 digits of each set of squares, all 1s
+TERNARY: Tuple[int, ...] = tuple(sum(3**sq for sq in range(SQUARES) if mask >> sq & 1) for mask in range(FULL + 1))
+
+
+def index(ours: int, theirs: int) -> int:
+    """
+    :param ours: Squares of the player to move
+    :param theirs: Squares of their opponent
+    """
+    return TERNARY[ours] + 2 * TERNARY[theirs]
+
+
+def previous(value: int) -> int:
+    """
+    :return: Value of a position to the player who moved into a position with the given value
+    """
+    if value > 0:
+        return -value + 1
+    if value < 0:
+        return -value - 1
+    return 0
+
+
+def solve() -> array:
+    """
+    :return: The value of every position that can be reached, others are UNSOLVED
+    """
+    values = array("b", [UNSOLVED]) * POSITIONS
+    game = TicTacToeServer()
+    game.add_player(PlayerId(player_x))
+    game.add_player(PlayerId(player_o))
+    game.start()
+    solved: Dict[int, int] = dict()
+
+    def masks() -> Tuple[int, int]:
+        assert game.turn is not None
+        role = game.players[game.turn]
+        return game.masks[role], game.masks[player_o if role == player_x else player_x]
+
+    def value() -> int:
+        position = index(*masks())
+        if position in solved:
+            return solved[position]
+        best = LOST
+        legal_moves = game.legal_moves()
+        assert legal_moves
+        for move in list(legal_moves):
+            try:
+                game.push_move(game.turn, move)
+            except GameCompleted:
+                ours, theirs = masks()
+                # The player to move is unchanged when the game ends, so the position is seen from the other side
+                child = index(theirs, ours)
+                solved[child] = LOST if game.winner is not None else 0
+            else:
+                child = index(*masks())
+                value()
+            game.pop_move()
+            best = max(best, previous(solved[child]))
+        solved[position] = best
+        return best
+
+    value()
+    for position, position_value in solved.items():
+        values[position] = position_value
+    return values
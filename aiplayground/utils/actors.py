@@ -0,0 +1,76 @@
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, Tuple, TypeVar, Any
+
+T = TypeVar("T")
+Mailbox = Deque[Tuple[Callable[[], Awaitable[Any]], asyncio.Future]]
+
+
+class RoomActors:
+    """
+    Runs the events for each room one at a time in the order they arrive,
+    while events for different rooms run concurrently
+
+    An event for an idle room runs immediately in the caller's task, events arriving while a
+    room is busy are queued in the room's mailbox and drained by a task that exits once the mailbox is empty.
+    """
+
+    mailboxes: Dict[Hashable, Mailbox]
+
+    def __init__(self):
+        self.mailboxes = dict()
+
+    def busy(self, key: Hashable) -> bool:
+        return key in self.mailboxes
+
+    async def run(self, key: Hashable, f: Callable[[], Awaitable[T]]) -> T:
+        """
+        :param key: Room (or other actor) the event belongs to
+        :param f: Coroutine function handling the event
+        :return: The result of f, any exception raised by f is propagated to the caller
+        """
+        mailbox = self.mailboxes.get(key)
+        if mailbox is not None:
+            future = asyncio.get_event_loop().create_future()
+            mailbox.append((f, future))
+            return await future
+        self.mailboxes[key] = deque()
+        try:
+            return await f()
+        finally:
+            self._next(key)
+
+    def _next(self, key: Hashable) -> None:
+        if self.mailboxes[key]:
+            asyncio.ensure_future(self._drain(key))
+        else:
+            del self.mailboxes[key]
+
+    async def _drain(self, key: Hashable) -> None:
+        mailbox = self.mailboxes[key]
+        try:
+            while mailbox:
+                f, future = mailbox.popleft()
+                if future.cancelled():
+                    continue
+                try:
+                    result = await f()
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    if not future.cancelled():
+                        future.set_exception(e)
+                except BaseException as e:
+                    if not future.cancelled():
+                        future.set_exception(e)
+                    raise
+                else:
+                    if not future.cancelled():
+                        future.set_result(result)
+        finally:
+            # If draining was interrupted, fail the events still queued rather than leaving their callers waiting
+            while mailbox:
+                _, future = mailbox.popleft()
+                future.cancel()
+            del self.mailboxes[key]
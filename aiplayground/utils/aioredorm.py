@@ -0,0 +1,421 @@
+"""
+Asyncio access to redorm models
+
+Reads and writes the same keys, indexes and relationships as redorm, through aioredis instead of
+redorm's blocking client, so the broker and API can use models without blocking the event loop.
+Without a REDORM_URL it shares the fake redis server redorm falls back to.
+"""
+import asyncio
+import json
+from collections import Counter
+from dataclasses import fields
+from secrets import token_hex
+from typing import Any, Callable, Dict, List, Optional, Set, Type, TypeVar, Union, Iterable
+from uuid import uuid4
+
+import aioredis
+from aioredis.errors import ReplyError
+from redorm import RedormBase, InstanceNotFound, red
+from redorm.client import UNIQUE_SAVE
+from redorm.exceptions import (
+    UniqueContstraintViolation,
+    UnknownFieldName,
+    FilterOnUnindexedField,
+    MultipleInstancesReturned,
+)
+from redorm.model import FieldChange
+from redorm.relationships import Relationship, RelationshipConfigEnum
+
+from aiplayground.logging import logger
+from aiplayground.settings import settings
+
+S = TypeVar("S", bound=RedormBase)
+
+RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def encode_arg(arg: Any) -> Union[str, int, float]:
+    # Matches how redis-py encodes the values redorm writes with its blocking client
+    if arg is None:
+        return ""
+    if isinstance(arg, bool):
+        return str(arg)
+    return arg
+
+
+class AsyncLock:
+    """
+    Redis lock that yields to the event loop while waiting, compatible with redis-py's locks on the same key
+    """
+
+    def __init__(self, ared: "AsyncRedorm", name: str, timeout: Optional[float] = None, sleep: float = 0.02):
+        self.ared = ared
+        self.name = name
+        self.timeout = timeout
+        self.sleep = sleep
+        self.token = token_hex(16)
+
+    async def __aenter__(self) -> "AsyncLock":
+        client = await self.ared.client()
+        pexpire = int(self.timeout * 1000) if self.timeout is not None else 0
+        while not await client.set(self.name, self.token, pexpire=pexpire, exist=client.SET_IF_NOT_EXIST):
+            await asyncio.sleep(self.sleep)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.ared.eval(RELEASE_LOCK, keys=[self.name], args=[self.token])
+
+
+class AsyncRedorm:
+    """
+    Async counterpart of redorm's model methods, eg. ``await ared.get(Room, room_id)`` instead of ``Room.get(room_id)``
+
+    Relationships must be read with :meth:`related` rather than through the model attribute,
+    which would make a blocking request.
+    """
+
+    def __init__(self, url: Optional[str] = settings.REDORM_URL):
+        self.url = url
+        self._client: Optional[aioredis.Redis] = None
+        self._connecting: Optional[asyncio.Future] = None
+        self._scripts: Dict[str, str] = dict()
+
+    def bind(self, url: Optional[str]) -> None:
+        self.url = url
+        self._client = None
+        self._connecting = None
+
+    async def client(self) -> aioredis.Redis:
+        if self._client is not None:
+            return self._client
+        if self._connecting is None:
+            self._connecting = asyncio.ensure_future(self._connect())
+        self._client = await asyncio.shield(self._connecting)
+        return self._client
+
+    async def _connect(self) -> aioredis.Redis:
+        if self.url is None:
+            from fakeredis.aioredis import create_redis_pool
+
+            return await create_redis_pool(red.client.connection_pool.connection_kwargs["server"], encoding="utf-8")
+        return await aioredis.create_redis_pool(self.url, encoding="utf-8")
+
+    async def eval(self, script: str, keys: List[str], args: List[Any]) -> Any:
+        client = await self.client()
+        sha = self._scripts.get(script)
+        if sha is None:
+            sha = self._scripts[script] = await client.script_load(script)
+        try:
+            return await client.evalsha(sha, keys=keys, args=args)
+        except ReplyError as e:
+            if not str(e).startswith("NOSCRIPT"):
+                raise
+            return await client.eval(script, keys=keys, args=args)
+
+    def lock(self, instance: RedormBase, timeout: Optional[float] = None, sleep: float = 0.02) -> AsyncLock:
+        """
+        Same lock as ``instance.lock()``
+        """
+        return AsyncLock(self, f"{type(instance).__name__}:userlock:{instance.id}", timeout=timeout, sleep=sleep)
+
+    async def get(self, model: Type[S], instance_id: Optional[str] = None, **kwargs) -> S:
+        """
+        :raises InstanceNotFound: If no instance matches
+        :raises MultipleInstancesReturned: If filtering by kwargs matches more than one instance
+        """
+        if kwargs:
+            instance_ids = await self.list_ids(model, **kwargs)
+            if instance_id is not None:
+                instance_ids &= {instance_id}
+            if len(instance_ids) > 1:
+                raise MultipleInstancesReturned
+            elif not instance_ids:
+                raise InstanceNotFound
+            [instance_id] = instance_ids
+        if instance_id is None:
+            raise InstanceNotFound
+        client = await self.client()
+        data = await client.get(f"{model.__name__}:member:{instance_id}")
+        if data is None:
+            raise InstanceNotFound
+        return model.from_json(data, validate=False)
+
+    async def get_bulk(self, model: Type[S], instance_ids: Iterable[str]) -> List[S]:
+        keys = [f"{model.__name__}:member:{instance_id}" for instance_id in instance_ids]
+        if not keys:
+            return []
+        client = await self.client()
+        return [model.from_json(data, validate=False) for data in await client.mget(*keys) if data is not None]
+
+    async def list_ids(self, model: Type[RedormBase], **kwargs) -> Set[str]:
+        client = await self.client()
+        name = model.__name__
+        if not kwargs:
+            return set(await client.smembers(f"{name}:all"))
+        field_dict = {f.name: f for f in fields(model)}
+        matches: List[Set[str]] = []
+        indexes: List[str] = []
+        for k, v in kwargs.items():
+            if k in field_dict:
+                f = field_dict[k]
+                if f.metadata.get("unique"):
+                    if v is None:
+                        matches.append(set(await client.smembers(f"{name}:keynull:{k}")))
+                    else:
+                        key = encode_arg(model._encode_field(f.type, v, omit_none=False))
+                        instance_id = await client.hget(f"{name}:key:{k}", key)
+                        matches.append(set() if instance_id is None else {instance_id})
+                elif f.metadata.get("index"):
+                    if v is None:
+                        indexes.append(f"{name}:indexnull:{k}")
+                    else:
+                        indexes.append(
+                            f"{name}:index:{k}:{encode_arg(model._encode_field(f.type, v, omit_none=False))}"
+                        )
+                else:
+                    raise FilterOnUnindexedField(f"Trying to filter on unindexed field: {k}")
+            elif k in model._relationships:
+                rel: Relationship = model._relationships[k]
+                if rel.to_many:
+                    raise NotImplementedError("Can't filter based off to-many relationships")
+                if rel.backref is None:
+                    raise NotImplementedError("Filtering on a relationship requires a backref")
+                ref = f"{rel.get_foreign_type().__name__}:relationship:{rel.backref}:{getattr(v, 'id', v)}"
+                if rel.many_to:
+                    indexes.append(ref)
+                else:
+                    instance_id = await client.get(ref)
+                    matches.append(set() if instance_id is None else {instance_id})
+            else:
+                raise UnknownFieldName(k)
+        if indexes:
+            matches.append(set(await client.sinter(*indexes)))
+        return set.intersection(*matches)
+
+    async def list(self, model: Type[S], **kwargs) -> List[S]:
+        return await self.get_bulk(model, await self.list_ids(model, **kwargs))
+
+    async def create(self, model: Type[S], **kwargs) -> S:
+        field_names = {f.name for f in fields(model)}
+        instance = model.from_dict(dict(id=str(uuid4()), **{k: v for k, v in kwargs.items() if k in field_names}))
+        await self.save(instance)
+        for k, v in kwargs.items():
+            if k in field_names:
+                continue
+            if k in model._relationships:
+                await self.set_related(instance, k, v)
+            else:
+                setattr(instance, k, v)
+        return instance
+
+    async def save(self, instance: RedormBase) -> None:
+        model = type(instance)
+        name = model.__name__
+        client = await self.client()
+        old_json = await client.get(f"{name}:member:{instance.id}")
+        new = old_json is None
+        old_dict = {} if new else model.from_json(old_json, validate=False).to_dict(omit_none=False)
+        instance_dict = instance.to_dict(omit_none=True)
+        instance_fields = fields(model)
+        key_changes = [
+            FieldChange(f.name, old_dict.get(f.name), instance_dict.get(f.name))
+            for f in instance_fields
+            if f.metadata.get("unique") and (new or instance_dict.get(f.name) != old_dict.get(f.name))
+        ]
+        index_changes = [
+            FieldChange(f.name, old_dict.get(f.name), instance_dict.get(f.name))
+            for f in instance_fields
+            if not f.metadata.get("unique")
+            and f.metadata.get("index")
+            and (new or instance_dict.get(f.name) != old_dict.get(f.name))
+        ]
+        unique = [change for change in key_changes if change.new is not None]
+        unique_null = [change for change in key_changes if change.new is None]
+        index = [change for change in index_changes if change.new is not None]
+        index_null = [change for change in index_changes if change.new is None]
+        args = [
+            len(unique),
+            len(unique_null),
+            len(index),
+            len(index_null),
+            json.dumps(instance_dict, sort_keys=True),
+            instance.id,
+            name,
+            *[elem for change in unique for elem in change],
+            *[elem for change in unique_null for elem in change],
+            *[elem for change in index for elem in change],
+            *[elem for change in index_null for elem in change],
+        ]
+        try:
+            await self.eval(UNIQUE_SAVE, keys=[], args=[encode_arg(arg) for arg in args])
+        except ReplyError as e:
+            raise UniqueContstraintViolation(*e.args) from e
+
+    async def reindex(self, model: Type[RedormBase], regenerate: Optional[Dict[str, Callable[[], Any]]] = None) -> int:
+        """
+        Adds every stored instance of a model to its unique keys and indexes, eg. after making a field unique,
+        as only instances saved since then are in them
+        :param regenerate: Factories for unique fields whose values are shared by several instances, each of which
+            is given a new value instead
+        :raises UniqueContstraintViolation: If instances share the value of any other unique field
+        :return: Number of instances indexed
+        """
+        regenerate = regenerate or dict()
+        client = await self.client()
+        name = model.__name__
+        indexed = [f for f in fields(model) if f.metadata.get("unique") or f.metadata.get("index")]
+        instances = await self.get_bulk(model, await client.smembers(f"{name}:all"))
+        for field_name, factory in regenerate.items():
+            shared = Counter(getattr(instance, field_name) for instance in instances)
+            duplicates = [instance for instance in instances if shared[getattr(instance, field_name)] > 1]
+            for instance in duplicates:
+                setattr(instance, field_name, factory())
+                await self.save(instance)
+            if duplicates:
+                logger.warning(f"Gave {len(duplicates)} instances of {name} a new {field_name}, as it was shared")
+        for instance in instances:
+            instance_dict = instance.to_dict(omit_none=True)
+            for f in indexed:
+                value = instance_dict.get(f.name)
+                if f.metadata.get("unique"):
+                    if value is None:
+                        await client.sadd(f"{name}:keynull:{f.name}", instance.id)
+                        continue
+                    existing = await client.hget(f"{name}:key:{f.name}", encode_arg(value))
+                    if existing is not None and existing != instance.id:
+                        raise UniqueContstraintViolation(
+                            f"Unique Violation: {f.name} of {name} {instance.id} is the same as {existing}"
+                        )
+                    await client.hset(f"{name}:key:{f.name}", encode_arg(value), instance.id)
+                elif value is None:
+                    await client.sadd(f"{name}:indexnull:{f.name}", instance.id)
+                else:
+                    await client.sadd(f"{name}:index:{f.name}:{encode_arg(value)}", instance.id)
+        return len(instances)
+
+    async def update(self, instance: RedormBase, **kwargs) -> None:
+        """
+        Same as ``instance.update(**kwargs)``, applies the changes to the latest stored version of the instance
+        """
+        model = type(instance)
+        client = await self.client()
+        async with AsyncLock(self, f"{model.__name__}:lock:{instance.id}"):
+            latest = await client.get(f"{model.__name__}:member:{instance.id}")
+            if latest is None:
+                raise InstanceNotFound
+            for k, v in json.loads(latest).items():
+                setattr(instance, k, v)
+            for k, v in kwargs.items():
+                setattr(instance, k, v)
+            await self.save(instance)
+
+    async def related(self, instance: RedormBase, name: str) -> Union[None, RedormBase, List[RedormBase]]:
+        """
+        Async equivalent of reading the relationship attribute ``name`` of instance
+        """
+        rel: Relationship = type(instance)._relationships[name]
+        client = await self.client()
+        key = f"{rel.relationship_base}:{instance.id}"
+        if rel.to_many:
+            return await self.get_bulk(rel.get_foreign_type(), await client.smembers(key))
+        related_id = await client.get(key)
+        if related_id is None:
+            return None
+        try:
+            return await self.get(rel.get_foreign_type(), related_id)
+        except InstanceNotFound:
+            return None
+
+    async def related_ids(self, instance: RedormBase, name: str) -> Union[None, str, Set[str]]:
+        rel: Relationship = type(instance)._relationships[name]
+        client = await self.client()
+        key = f"{rel.relationship_base}:{instance.id}"
+        if rel.to_many:
+            return set(await client.smembers(key))
+        return await client.get(key)
+
+    async def count_related(self, instance: RedormBase, name: str) -> int:
+        rel: Relationship = type(instance)._relationships[name]
+        assert rel.to_many
+        client = await self.client()
+        return await client.scard(f"{rel.relationship_base}:{instance.id}")
+
+    async def set_related(
+        self, instance: RedormBase, name: str, value: Union[None, str, RedormBase, List[Union[str, RedormBase]]]
+    ) -> None:
+        """
+        Async equivalent of assigning to the relationship attribute ``name`` of instance
+        """
+        rel: Relationship = type(instance)._relationships[name]
+        foreign_name = rel.get_foreign_type().__name__
+        client = await self.client()
+        key = f"{rel.relationship_base}:{instance.id}"
+        if not rel.to_many:
+            if value is not None and not isinstance(value, (str, RedormBase)):
+                raise ValueError("Expected new value of string or Model")
+            new_id = value.id if isinstance(value, RedormBase) else value
+            if new_id is None:
+                transaction = client.multi_exec()
+                old_future = transaction.get(key)
+                transaction.delete(key)
+                await transaction.execute()
+                old_id = await old_future
+            else:
+                old_id = await client.getset(key, new_id)
+            if new_id == old_id or rel.backref is None:
+                return
+            rel_new = f"{foreign_name}:relationship:{rel.backref}:{new_id}"
+            rel_old = f"{foreign_name}:relationship:{rel.backref}:{old_id}"
+            if rel.config == RelationshipConfigEnum.MANY_TO_ONE:
+                if old_id is None:
+                    await client.sadd(rel_new, instance.id)
+                elif new_id is None:
+                    await client.srem(rel_old, instance.id)
+                else:
+                    await client.smove(rel_old, rel_new, instance.id)
+            else:
+                if old_id is None:
+                    await client.set(rel_new, instance.id)
+                elif new_id is None:
+                    await client.delete(rel_new)
+                else:
+                    await client.rename(rel_old, rel_new)
+            return
+        if not isinstance(value, (list, set)):
+            raise ValueError("Expected list or set for new relationships")
+        old_ids = set(await client.smembers(key))
+        new_ids = {r.id if isinstance(r, RedormBase) else r for r in value}
+        if not old_ids ^ new_ids:
+            return
+        transaction = client.multi_exec()
+        transaction.delete(key)
+        if new_ids:
+            transaction.sadd(key, *new_ids)
+        if rel.backref is not None:
+            reverse = f"{foreign_name}:relationship:{rel.backref}"
+            if rel.config == RelationshipConfigEnum.MANY_TO_MANY:
+                for related_id in old_ids - new_ids:
+                    transaction.srem(f"{reverse}:{related_id}", instance.id)
+                for related_id in new_ids - old_ids:
+                    transaction.sadd(f"{reverse}:{related_id}", instance.id)
+            else:
+                for related_id in old_ids - new_ids:
+                    transaction.delete(f"{reverse}:{related_id}")
+                for related_id in new_ids - old_ids:
+                    transaction.set(f"{reverse}:{related_id}", instance.id)
+        await transaction.execute()
+
+    async def expand(self, instance: RedormBase, *names: str) -> Dict[str, Any]:
+        """
+        Returns the fields of an instance along with the named relationships, for use with orm_mode schemas
+        """
+        related = await asyncio.gather(*[self.related(instance, name) for name in names])
+        return {**vars(instance), **dict(zip(names, related))}
+
+
+ared = AsyncRedorm()
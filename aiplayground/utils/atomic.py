@@ -1,16 +1,17 @@
-from threading import Lock
+class AtomicCounter:
+    """
+    Counter shared by coroutines on one event loop
 
+    Updates never await, so no lock is needed for them to be atomic with respect to other coroutines.
+    Not safe to share between threads.
+    """
 
-class AtomicCounter:
     def __init__(self, value: int = 0):
-        self.lock = Lock()
         self.value = value
 
     def set(self, value: int = 0):
-        with self.lock:
-            self.value = value
+        self.value = value
 
     def increment_then_get(self, step: int = 1):
-        with self.lock:
-            self.value += step
-            return self.value
+        self.value += step
+        return self.value
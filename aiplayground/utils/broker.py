@@ -1,4 +1,4 @@
-from typing import Optional, Tuple
+from typing import Optional, Tuple, List
 from redorm import InstanceNotFound
 from aiplayground.exceptions import (
     NoSuchPlayer,
@@ -7,22 +7,28 @@ from aiplayground.exceptions import (
     UnauthorizedPlayer,
     PlayerNotInRoom,
 )
-from aiplayground.api.rooms import Room
+from aiplayground.api.rooms import Room, GameState
 from aiplayground.api.players import Player
+from aiplayground.types import RoomId, StateId
+from aiplayground.utils.aioredorm import ared
+from aiplayground.utils.cache import ModelCache
 
 
-def get_room_player(sid: str, roomid: str, playerid: Optional[str], check_server=True) -> Tuple[Room, Optional[Player]]:
+async def get_room_player(
+    cache: ModelCache, sid: str, roomid: str, playerid: Optional[str], check_server=True
+) -> Tuple[Room, Optional[Player]]:
     """
     Checks if a server has permission to act for the room as well as whether the room and player
     are correct.
     returns the room and player
+    :param cache: Cache of the broker worker to look the room and player up in
     :param sid:
     :param roomid:
     :param playerid:
     :param check_server: Whether to check if the other party has game server permissions
     """
     try:
-        room = Room.get(roomid)
+        room = await cache.get(Room, roomid)
     except InstanceNotFound as e:
         raise NoSuchRoom from e
     if check_server and sid != room.server_sid:
@@ -30,11 +36,44 @@ def get_room_player(sid: str, roomid: str, playerid: Optional[str], check_server
     if playerid is None:
         return room, None
     try:
-        player = Player.get(playerid)
+        player = await cache.get(Player, playerid)
     except InstanceNotFound as e:
         raise NoSuchPlayer from e
     if not check_server and player.sid != sid:
         raise UnauthorizedPlayer
-    if player.room is not None and player.room.id != roomid:
+    player_room = await cache.room_of(player)
+    if player_room is not None and player_room != roomid:
         raise PlayerNotInRoom
     return room, player
+
+
+def epoch_index_key(room_id: RoomId) -> str:
+    return f"Room:epochs:{room_id}"
+
+
+async def index_state_epoch(room_id: RoomId, state_id: StateId, epoch: int) -> None:
+    """
+    Records the epoch of a room's game state in a sorted set, so spectators can page through states by epoch
+    """
+    client = await ared.client()
+    await client.zadd(epoch_index_key(room_id), epoch, state_id)
+
+
+async def get_states_since(room_id: RoomId, since_epoch: Optional[int], limit: int) -> Tuple[List[GameState], bool]:
+    """
+    Returns the states of a room after an epoch in epoch order
+    :param room_id:
+    :param since_epoch: Epoch to return states after, or None to return states from the start of the game
+    :param limit: Maximum number of states to return
+    :return: The states, and whether there are more states after them
+    """
+    client = await ared.client()
+    state_ids = await client.zrangebyscore(
+        epoch_index_key(room_id),
+        min=float("-inf") if since_epoch is None else since_epoch,
+        exclude=None if since_epoch is None else client.ZSET_EXCLUDE_MIN,
+        offset=0,
+        count=limit + 1,
+    )
+    states = await ared.get_bulk(GameState, state_ids[:limit])
+    return states, len(state_ids) > limit
@@ -0,0 +1,248 @@
+import asyncio
+import copy
+from collections import defaultdict
+from time import monotonic
+from typing import Dict, Set, Tuple, Type, TypeVar, Optional, Any, List
+
+from redorm import RedormBase, InstanceNotFound
+
+from aiplayground.api.rooms import Room
+from aiplayground.logging import logger
+from aiplayground.settings import settings
+from aiplayground.types import RoomId
+from aiplayground.utils.aioredorm import ared
+
+S = TypeVar("S", bound=RedormBase)
+CacheKey = Tuple[str, str]
+
+
+def cache_key(instance_type: Type[RedormBase], instance_id: str) -> CacheKey:
+    return instance_type.__name__, instance_id
+
+
+class ModelCache:
+    """
+    Write-behind cache of the redorm models used by the broker
+
+    Instances created by this worker are owned by it, and the cached copy is authoritative.
+    Instances loaded from redis (eg. rooms owned by another broker worker) are reloaded once they
+    are older than ``max_staleness`` seconds.
+    Updates are applied to the cached instance immediately and written to redis in batches by a
+    background task at most ``flush_interval`` seconds later.
+    Rooms and everything in them are evicted when the room finishes, or once none of them have been
+    used for ``idle_timeout`` seconds (eg. abandoned lobbies), after which they're loaded from redis again if needed.
+
+    Owned instances aren't reloaded by ``get``, so rooms shared between broker workers must be read with ``reload``
+    and flushed once they've been changed, as the broker does while holding a shared room's redis lock.
+    """
+
+    instances: Dict[CacheKey, RedormBase]
+    loaded_at: Dict[CacheKey, float]
+    used_at: Dict[CacheKey, float]
+    owned: Set[CacheKey]
+    pending: Dict[CacheKey, Dict[str, Any]]
+    room_members: Dict[RoomId, Set[CacheKey]]
+    member_room: Dict[CacheKey, RoomId]
+
+    def __init__(
+        self,
+        flush_interval: float = settings.CACHE_FLUSH_INTERVAL,
+        max_staleness: float = settings.CACHE_MAX_STALENESS,
+        idle_timeout: float = settings.CACHE_IDLE_TIMEOUT,
+    ):
+        self.flush_interval = flush_interval
+        self.max_staleness = max_staleness
+        self.idle_timeout = idle_timeout
+        self.instances = dict()
+        self.loaded_at = dict()
+        self.used_at = dict()
+        self.owned = set()
+        self.pending = dict()
+        self.room_members = defaultdict(set)
+        self.member_room = dict()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Future] = None
+
+    def start(self) -> None:
+        """
+        Starts the background flush task if it isn't already running, must be called from within the event loop
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                await self.evict_idle()
+            except Exception as e:
+                logger.exception(e)
+
+    def track(self, instance: S, room_id: Optional[RoomId] = None, owned: bool = True) -> S:
+        """
+        Adds an instance to the cache
+        :param instance: Model instance to cache
+        :param room_id: Room the instance belongs to, it is evicted along with the room
+        :param owned: Whether this worker is authoritative for the instance
+        """
+        key = cache_key(type(instance), instance.id)
+        self.instances[key] = instance
+        self.loaded_at[key] = self.used_at[key] = monotonic()
+        if owned:
+            self.owned.add(key)
+        if room_id is not None:
+            self.room_members[room_id].add(key)
+            self.member_room[key] = room_id
+        return instance
+
+    def owns(self, instance_type: Type[RedormBase], instance_id: str) -> bool:
+        return cache_key(instance_type, instance_id) in self.owned
+
+    async def create(self, instance_type: Type[S], room_id: Optional[RoomId] = None, **kwargs) -> S:
+        """
+        Creates an instance in redis immediately (so ids, indexes and relationships exist) and caches it
+        """
+        instance = await ared.create(instance_type, **kwargs)
+        return self.track(instance, room_id=room_id)
+
+    async def get(self, instance_type: Type[S], instance_id: str) -> S:
+        """
+        :raises InstanceNotFound: If the instance is neither cached nor in redis
+        """
+        key = cache_key(instance_type, instance_id)
+        instance = self.instances.get(key)
+        now = monotonic()
+        if instance is not None and (key in self.owned or now - self.loaded_at[key] < self.max_staleness):
+            self.used_at[key] = now
+            return instance  # type: ignore
+        return await self.reload(instance_type, instance_id)
+
+    async def reload(self, instance_type: Type[S], instance_id: str) -> S:
+        """
+        Reads an instance from redis even if it's cached, keeping any local changes that haven't been flushed
+        :raises InstanceNotFound: If the instance isn't in redis
+        """
+        key = cache_key(instance_type, instance_id)
+        fresh = await ared.get(instance_type, instance_id)
+        changes = self.pending.get(key)
+        if changes:
+            # Don't lose local writes that haven't been flushed yet
+            for k, v in changes.items():
+                setattr(fresh, k, v)
+        return self.track(fresh, owned=False)
+
+    def update(self, instance: RedormBase, **kwargs) -> None:
+        """
+        Updates the cached instance, the changes are written to redis by the next flush
+        """
+        key = cache_key(type(instance), instance.id)
+        if key not in self.instances:
+            self.track(instance, owned=False)
+        self.used_at[key] = monotonic()
+        for k, v in kwargs.items():
+            setattr(instance, k, v)
+        self.pending.setdefault(key, dict()).update(kwargs)
+
+    async def room_of(self, instance: RedormBase) -> Optional[RoomId]:
+        """
+        Returns the ID of the room a cached instance belongs to, falling back to its room relationship
+        """
+        key = cache_key(type(instance), instance.id)
+        try:
+            return self.member_room[key]
+        except KeyError:
+            room_id = await ared.related_ids(instance, "room")
+            if room_id is None:
+                return None
+            self.room_members[room_id].add(key)
+            self.member_room[key] = room_id
+            return room_id
+
+    async def flush(self, keys: Optional[List[CacheKey]] = None) -> None:
+        """
+        Writes pending changes to redis
+        :param keys: Only flush these instances, defaults to all instances with pending changes
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if keys is None:
+                batch, self.pending = self.pending, dict()
+            else:
+                batch = {key: self.pending.pop(key) for key in keys if key in self.pending}
+            if not batch:
+                return
+            # Copies are written so refreshing from redis can't clobber newer local changes
+            results = await asyncio.gather(
+                *[ared.update(copy.copy(self.instances[key]), **changes) for key, changes in batch.items()],
+                return_exceptions=True,
+            )
+            for (key, changes), result in zip(batch.items(), results):
+                if isinstance(result, InstanceNotFound):
+                    logger.warning(f"Dropping cached changes for deleted instance {key!r}")
+                elif isinstance(result, Exception):
+                    logger.exception(result)
+                    # Retry on the next flush, keeping any changes made since
+                    self.pending[key] = {**changes, **self.pending.get(key, dict())}
+            logger.debug(f"Flushed {len(batch)} cached instances")
+
+    async def flush_room(self, room_id: RoomId) -> None:
+        """
+        Writes pending changes to a room and everything that belongs to it
+        """
+        await self.flush([cache_key(Room, room_id), *self.room_members.get(room_id, set())])
+
+    async def evict(self, instance_type: Type[RedormBase], instance_id: str) -> None:
+        """
+        Flushes an instance, then removes it from the cache
+        """
+        key = cache_key(instance_type, instance_id)
+        await self.flush([key])
+        self.forget(key)
+
+    async def evict_room(self, room_id: RoomId) -> None:
+        """
+        Flushes a room and everything that belongs to it, then removes them from the cache
+        """
+        keys = [cache_key(Room, room_id), *self.room_members.pop(room_id, set())]
+        await self.flush(keys)
+        for key in keys:
+            self.forget(key)
+
+    async def evict_idle(self) -> None:
+        """
+        Evicts rooms, along with everything that belongs to them, and other instances that haven't been used
+        for ``idle_timeout`` seconds
+        """
+        cutoff = monotonic() - self.idle_timeout
+        # Most recent use of anything in each room
+        room_used: Dict[RoomId, float] = dict()
+        idle: List[CacheKey] = []
+        for key, used_at in self.used_at.items():
+            room_id = RoomId(key[1]) if key[0] == Room.__name__ else self.member_room.get(key)
+            if room_id is not None:
+                room_used[room_id] = max(used_at, room_used.get(room_id, used_at))
+            elif used_at < cutoff:
+                idle.append(key)
+        idle_rooms = [room_id for room_id, used_at in room_used.items() if used_at < cutoff]
+        for room_id in idle_rooms:
+            await self.evict_room(room_id)
+        if idle:
+            await self.flush(idle)
+            for key in idle:
+                self.forget(key)
+        if idle_rooms or idle:
+            logger.debug(f"Evicted {len(idle_rooms)} idle rooms and {len(idle)} other idle cached instances")
+
+    def forget(self, key: CacheKey) -> None:
+        """
+        Removes an instance from the cache without flushing it
+        """
+        self.instances.pop(key, None)
+        self.loaded_at.pop(key, None)
+        self.used_at.pop(key, None)
+        self.owned.discard(key)
+        room_id = self.member_room.pop(key, None)
+        if room_id is not None and room_id in self.room_members:
+            self.room_members[room_id].discard(key)
@@ -0,0 +1,100 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional
+
+from aiplayground.exceptions import OutOfTime
+from aiplayground.types import PlayerId
+
+
+@dataclass(frozen=True)
+class TimeControl:
+    """
+    :param move: Seconds a player has for each move
+    :param total: Seconds a player has for all of their moves in a game
+    """
+
+    move: Optional[float] = None
+    total: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.move is not None or self.total is not None
+
+
+class GameClock:
+    """
+    Times the moves of a game's players, timing one player at a time
+
+    The time allowed for a move runs out after its per move limit or the player's remaining total time, whichever
+    is sooner. A single timer handle on the event loop is kept per game, rather than a task, so thousands of games
+    can be timed at once.
+    Time is measured by the game server, so it includes the time taken to reach the player and back.
+    """
+
+    time_control: TimeControl
+    remaining: Dict[PlayerId, float]
+    player_id: Optional[PlayerId] = None
+    started: float = 0.0
+    timer: Optional[asyncio.TimerHandle] = None
+
+    def __init__(self, time_control: TimeControl, player_ids: Iterable[PlayerId]):
+        self.time_control = time_control
+        total = time_control.total
+        self.remaining = {player_id: total for player_id in player_ids} if total is not None else {}
+
+    def allowed(self, player_id: PlayerId) -> float:
+        """
+        :return: Seconds the player has for their next move
+        """
+        limits = [t for t in (self.time_control.move, self.remaining.get(player_id)) if t is not None]
+        return max(0.0, min(limits)) if limits else float("inf")
+
+    def start(self, player_id: PlayerId, on_timeout: Callable[[], None]) -> float:
+        """
+        Starts timing a player's move, calling on_timeout if it isn't stopped in time
+        :return: Seconds allowed for the move
+        """
+        self.cancel()
+        loop = asyncio.get_event_loop()
+        allowed = self.allowed(player_id)
+        self.player_id = player_id
+        self.started = loop.time()
+        if allowed != float("inf"):
+            self.timer = loop.call_at(self.started + allowed, on_timeout)
+        return allowed
+
+    def time_left(self) -> Optional[float]:
+        """
+        :return: Seconds left for the move being timed, or None if no move is being timed
+        """
+        if self.player_id is None:
+            return None
+        elapsed = asyncio.get_event_loop().time() - self.started
+        return max(0.0, self.allowed(self.player_id) - elapsed)
+
+    def stop(self, player_id: PlayerId) -> None:
+        """
+        Stops timing a player's move, charging the time taken to their total
+        :raises OutOfTime: If the player took longer than they were allowed
+        """
+        if player_id != self.player_id:
+            return
+        elapsed = asyncio.get_event_loop().time() - self.started
+        allowed = self.allowed(player_id)
+        self.cancel()
+        if player_id in self.remaining:
+            self.remaining[player_id] -= elapsed
+        if elapsed > allowed:
+            raise OutOfTime(details=f"Took {elapsed:.3f}s to move, {allowed:.3f}s were allowed")
+
+    def cancel(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.player_id = None
+
+    def clocks(self) -> Optional[Dict[PlayerId, float]]:
+        """
+        :return: Total time remaining for each player, as of the start of the current move
+        """
+        return {player_id: max(0.0, remaining) for player_id, remaining in self.remaining.items()} or None
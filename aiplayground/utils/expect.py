@@ -1,10 +1,18 @@
+import asyncio
 import json
+from collections import defaultdict
+from dataclasses import dataclass
 from functools import wraps
-from pydantic import ValidationError
-from typing import TYPE_CHECKING, Callable, Type, Union, Tuple, Optional, Any, Awaitable
+from time import perf_counter
+from pydantic import BaseModel, ValidationError
+from pydantic.error_wrappers import ErrorWrapper
+from pydantic.errors import MissingError
+from pydantic.typing import get_origin
+from typing import TYPE_CHECKING, Callable, Type, Union, Tuple, Optional, Any, Awaitable, Dict, List, Mapping
 from aiplayground.logging import logger
 from aiplayground.exceptions import AsimovErrorBase
 from aiplayground.messages import MessageBase
+from aiplayground.utils.wire import unpack
 
 if TYPE_CHECKING:
     from aiplayground.broker import GameBroker
@@ -15,10 +23,115 @@ if TYPE_CHECKING:
 else:
     SocketioType = Any
 
+FULL = "full"
+TRUSTED = "trusted"
+
+
+@dataclass
+class ValidationStats:
+    count: int = 0
+    failures: int = 0
+    seconds: float = 0.0
+
+
+# Keyed by message type name and validation tier
+validation_stats: Dict[Tuple[str, str], ValidationStats] = defaultdict(ValidationStats)
+
+
+def structural_type(field_type: Any) -> Any:
+    """
+    :return: The python type(s) a JSON value must be an instance of for a field, a pydantic model
+        for nested messages, or None if the field isn't checked
+    """
+    while hasattr(field_type, "__supertype__"):
+        field_type = field_type.__supertype__
+    origin = get_origin(field_type)
+    if origin is not None:
+        if isinstance(origin, type) and issubclass(origin, Mapping):
+            return dict
+        if origin in (list, tuple, set):
+            return list
+        return None
+    if field_type is float:
+        return int, float
+    if field_type in (str, int, bool, dict, list) or (
+        isinstance(field_type, type) and issubclass(field_type, BaseModel)
+    ):
+        return field_type
+    return None
+
+
+class StructuralCheck:
+    """
+    Lighter validation for messages from trusted peers
+
+    Only checks required fields are present and fields have the right JSON type, nested messages
+    are fully validated, then builds the message with ``construct()``.
+    Compiled once per message type.
+    """
+
+    def __init__(self, message_type: Type[MessageBase]):
+        self.message_type = message_type
+        self.fields: List[Tuple[str, bool, Any]] = [
+            (field.alias, field.required, structural_type(field.outer_type_))
+            for field in message_type.__fields__.values()
+        ]
+
+    def __call__(self, data: dict) -> MessageBase:
+        values = dict()
+        errors = []
+        for name, required, expected in self.fields:
+            value = data.get(name)
+            if value is None:
+                if required:
+                    errors.append(ErrorWrapper(MissingError(), loc=name))
+                continue
+            if isinstance(expected, type) and issubclass(expected, BaseModel):
+                try:
+                    value = expected.parse_obj(value)
+                except ValidationError as e:
+                    errors.append(ErrorWrapper(e, loc=name))
+                    continue
+            elif expected is not None and not isinstance(value, expected):
+                errors.append(ErrorWrapper(TypeError(f"{type(value).__name__} is not a valid type"), loc=name))
+                continue
+            values[name] = value
+        if errors:
+            raise ValidationError(errors, self.message_type)
+        return self.message_type.construct(**values)
+
+
+def full_validation(message_type: Type[MessageBase]) -> Callable[[dict], MessageBase]:
+    def validate(data: dict) -> MessageBase:
+        return message_type.parse_obj({k: v for k, v in data.items() if v is not None})
+
+    return validate
+
+
+async def log_validation_stats(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        for (message_name, tier), stats in sorted(validation_stats.items()):
+            if not stats.count:
+                continue
+            logger.info(
+                f"Validated {stats.count} {message_name} ({tier}), {stats.failures} failed, "
+                f"{stats.seconds * 1e6 / max(stats.count, 1):.1f}us per message"
+            )
+
 
 def expect(
     message_type: Type[MessageBase],
 ) -> Callable[[Callable[..., Awaitable]], Callable[[SocketioType, str, dict], Awaitable[Optional[Tuple]]]]:
+    """
+    Validates the data of an inbound event as a message_type before calling the handler with it
+
+    Messages from sids the socketio namespace trusts (``sio.is_trusted(sid)``) only get a structural
+    check, everything else is fully validated. Validation time is counted in validation_stats.
+    """
+    validators = {FULL: full_validation(message_type), TRUSTED: StructuralCheck(message_type)}
+    stats = {tier: validation_stats[message_type.__name__, tier] for tier in validators}
+
     def decorator(f: Callable[..., Awaitable]):
         @wraps(f)
         async def wrapper(sio: SocketioType, *args):
@@ -27,12 +140,19 @@ def expect(
                 sid = None
             else:
                 [sid, data] = args
+            data = unpack(data)
             if data is None:
                 data = dict()
-            m = {k: v for k, v in data.items() if v is not None}
+            is_trusted = getattr(sio, "is_trusted", None)
+            tier = TRUSTED if sid is not None and is_trusted is not None and is_trusted(sid) else FULL
+            tier_stats = stats[tier]
+            start = perf_counter()
             try:
-                msg = message_type.parse_obj(m)
+                msg = validators[tier](data)
             except ValidationError as e:
+                tier_stats.count += 1
+                tier_stats.failures += 1
+                tier_stats.seconds += perf_counter() - start
                 logger.debug(f"Receieved invalid data:\n{json.dumps(data, indent=2)}")
                 logger.warning(f"Validation encountered for {f.__name__}: {e!r}")
                 return (
@@ -42,6 +162,8 @@ def expect(
                         "details": e.json(),
                     },
                 )
+            tier_stats.count += 1
+            tier_stats.seconds += perf_counter() - start
 
             try:
                 if sid is None:
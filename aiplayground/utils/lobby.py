@@ -0,0 +1,65 @@
+import json
+from typing import Dict, Optional
+
+from aiplayground.api.rooms import Room
+from aiplayground.messages import LobbyRoom, LobbyUpdateMessage
+from aiplayground.types import RoomId, BroadcastSID
+from aiplayground.utils.aioredorm import ared
+
+LOBBY_SID = BroadcastSID("lobby")
+LOBBY_KEY = "Room:lobby"
+
+
+class LobbyDirectory:
+    """
+    Public rooms that are still in the lobby, with the number of players that have joined them
+
+    Kept up to date by the broker as rooms are created, joined and started, each change is pushed to
+    subscribed clients as a LobbyUpdateMessage.
+    Events for a room are always handled by the broker worker its game server is connected to, so each worker
+    is authoritative for the rooms it created. When rooms are shared between workers, the directory is
+    mirrored to a redis hash so any worker can give subscribers the full directory.
+    """
+
+    rooms: Dict[RoomId, LobbyRoom]
+
+    def __init__(self, sio, shared: bool = False):
+        self.sio = sio
+        self.shared = shared
+        self.rooms = dict()
+
+    async def snapshot(self) -> Dict[RoomId, dict]:
+        if not self.shared:
+            return {room_id: lobby_room.dict() for room_id, lobby_room in self.rooms.items()}
+        client = await ared.client()
+        return {room_id: json.loads(data) for room_id, data in (await client.hgetall(LOBBY_KEY)).items()}
+
+    async def add(self, room: Room) -> None:
+        if room.private or room.status != "lobby":
+            return
+        lobby_room = LobbyRoom(
+            name=room.name, game=room.game, maxplayers=room.maxplayers, players=0, status=room.status
+        )
+        self.rooms[room.id] = lobby_room
+        await self._publish("add", room.id, lobby_room)
+
+    async def player_joined(self, room_id: RoomId) -> None:
+        lobby_room = self.rooms.get(room_id)
+        if lobby_room is None:
+            return
+        lobby_room.players += 1
+        await self._publish("update", room_id, lobby_room)
+
+    async def remove(self, room_id: RoomId) -> None:
+        if self.rooms.pop(room_id, None) is None:
+            return
+        await self._publish("remove", room_id, None)
+
+    async def _publish(self, action: str, room_id: RoomId, lobby_room: Optional[LobbyRoom]) -> None:
+        if self.shared:
+            client = await ared.client()
+            if lobby_room is None:
+                await client.hdel(LOBBY_KEY, room_id)
+            else:
+                await client.hset(LOBBY_KEY, room_id, lobby_room.json())
+        await LobbyUpdateMessage(action=action, roomid=room_id, room=lobby_room).send(self.sio, to=LOBBY_SID)
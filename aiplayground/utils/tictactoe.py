@@ -0,0 +1,76 @@
+"""
+Bitboard helpers for tic tac toe
+
+Squares are numbered row * 3 + col, and a set of squares (eg. those played by one player) is
+stored as an int with bit n set for square n.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+SQUARES = 9
+FULL = (1 << SQUARES) - 1
+
+
+def square(row: int, col: int) -> int:
+    return row * 3 + col
+
+
+def line_mask(squares: Sequence[int]) -> int:
+    return sum(1 << sq for sq in squares)
+
+
+WIN_LINES: Tuple[int, ...] = (
+    *[line_mask([square(row, col) for col in range(3)]) for row in range(3)],
+    *[line_mask([square(row, col) for row in range(3)]) for col in range(3)],
+    line_mask([square(i, i) for i in range(3)]),
+    line_mask([square(i, 2 - i) for i in range(3)]),
+)
+# Only the lines through a square can be completed by playing in it
+SQUARE_LINES: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(line for line in WIN_LINES if line >> sq & 1) for sq in range(SQUARES)
+)
+# Empty squares for every set of occupied squares
+EMPTY_SQUARES: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(sq for sq in range(SQUARES) if not occupied >> sq & 1) for occupied in range(FULL + 1)
+)
+SQUARE_MOVES: Tuple[Dict[str, int], ...] = tuple({"row": sq // 3, "col": sq % 3} for sq in range(SQUARES))
+
+
+def completes_line(mask: int, sq: int) -> bool:
+    """
+    :param mask: Squares of a player, including sq
+    :param sq: Square just played
+    """
+    for line in SQUARE_LINES[sq]:
+        if mask & line == line:
+            return True
+    return False
+
+
+def grid_from_masks(masks: Dict[str, int]) -> List[List[Optional[str]]]:
+    """
+    :param masks: Squares of each player keyed by their role
+    """
+    grid: List[List[Optional[str]]] = [[None] * 3 for _ in range(3)]
+    for role, mask in masks.items():
+        for sq in range(SQUARES):
+            if mask >> sq & 1:
+                grid[sq // 3][sq % 3] = role
+    return grid
+
+
+def masks_from_grid(grid: List[List[Optional[str]]]) -> Dict[str, int]:
+    masks: Dict[str, int] = dict()
+    for row, cells in enumerate(grid):
+        for col, role in enumerate(cells):
+            if role is not None:
+                masks[role] = masks.get(role, 0) | 1 << square(row, col)
+    return masks
+
+
+def occupied_mask(grid: List[List[Optional[str]]]) -> int:
+    mask = 0
+    for row, cells in enumerate(grid):
+        for col, role in enumerate(cells):
+            if role is not None:
+                mask |= 1 << square(row, col)
+    return mask
@@ -0,0 +1,144 @@
+"""
+Wire formats for messages sent over socket.io
+
+python-socketio encodes the packet separately for every recipient of an emit, so a broadcast
+serializes the same message once per player and spectator. Messages are instead sent as a
+:class:`Payload`, encoded at most once per wire format, and the JSON encoding is spliced into
+each packet without being encoded again.
+
+Bots can negotiate MessagePack (if msgpack is installed) by connecting with the ``X-WIRE-FORMAT``
+header set to ``msgpack``, the broker then sends them messages as binary socket.io events.
+Everything else, including the webclient, is sent JSON. Messages are decoded by
+:func:`aiplayground.utils.expect.expect` based on what arrives, so either format is always accepted.
+"""
+import json
+from typing import Any, Dict, Union, Optional
+
+import socketio
+from pydantic.json import pydantic_encoder
+
+try:
+    import msgpack
+except ImportError:  # Only needed by bots and brokers using the msgpack wire format
+    msgpack = None
+
+JSON = "json"
+MSGPACK = "msgpack"
+WIRE_FORMAT_HEADER = "X-WIRE-FORMAT"
+
+
+class Encoded(str):
+    """
+    JSON text of a message payload
+    """
+
+
+class PacketJSON:
+    """
+    JSON module for socket.io packets that includes :class:`Encoded` payloads as is
+    """
+
+    loads = staticmethod(json.loads)
+
+    @staticmethod
+    def dumps(obj: Any, *args, **kwargs) -> str:
+        # Event packets are encoded as [event name, *arguments]
+        if isinstance(obj, list) and obj and isinstance(obj[-1], Encoded):
+            if len(obj) == 1:
+                return f"[{obj[-1]}]"
+            head = json.dumps(obj[:-1], *args, **kwargs)
+            return f"{head[:-1]},{obj[-1]}]"
+        return json.dumps(obj, *args, **kwargs)
+
+
+def negotiate(requested: Optional[str]) -> str:
+    """
+    :param requested: Wire format a client asked for
+    :return: The wire format to send to the client
+    """
+    if requested is not None and requested.lower() == MSGPACK and msgpack is not None:
+        return MSGPACK
+    return JSON
+
+
+def packb(data: dict) -> bytes:
+    return msgpack.packb(data, default=pydantic_encoder, use_bin_type=True)
+
+
+def unpack(data: Union[dict, bytes, None]) -> Optional[dict]:
+    """
+    Decodes a received payload, which is bytes if it was sent as msgpack
+    """
+    if isinstance(data, bytes):
+        if msgpack is None:
+            raise ImportError("msgpack must be installed to receive msgpack messages")
+        return msgpack.unpackb(data, raw=False)
+    return data
+
+
+class Payload:
+    """
+    A message that is encoded in the wire format of each recipient, at most once per format
+    """
+
+    def __init__(self, message):
+        self.message = message
+        self.encoded: Dict[str, Union[Encoded, bytes]] = dict()
+
+    def encode(self, wire_format: str) -> Union[Encoded, bytes]:
+        try:
+            return self.encoded[wire_format]
+        except KeyError:
+            if wire_format == MSGPACK:
+                encoded = self.message.encode_msgpack()
+            else:
+                encoded = self.message.encode()
+            self.encoded[wire_format] = encoded
+            return encoded
+
+
+class WireServer(socketio.AsyncServer):
+    """
+    Socket.IO server that sends each client payloads in the wire format it negotiated when connecting
+    """
+
+    wire_formats: Dict[str, str]
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("json", PacketJSON)
+        super().__init__(*args, **kwargs)
+        self.wire_formats = dict()
+
+    async def _handle_eio_connect(self, sid, environ):
+        self.wire_formats[sid] = negotiate(environ.get(f"HTTP_{WIRE_FORMAT_HEADER.replace('-', '_')}"))
+        return await super()._handle_eio_connect(sid, environ)
+
+    async def _handle_eio_disconnect(self, sid):
+        await super()._handle_eio_disconnect(sid)
+        self.wire_formats.pop(sid, None)
+
+    async def _emit_internal(self, sid, event, data, namespace=None, id=None):
+        if isinstance(data, Payload):
+            data = data.encode(self.wire_formats.get(sid, JSON))
+        await super()._emit_internal(sid, event, data, namespace=namespace, id=id)
+
+
+class WireClient(socketio.AsyncClient):
+    """
+    Socket.IO client that sends payloads in its wire format and asks the server to do the same
+    """
+
+    def __init__(self, *args, wire_format: str = JSON, **kwargs):
+        if wire_format == MSGPACK and msgpack is None:
+            raise ImportError("msgpack must be installed to use the msgpack wire format")
+        kwargs.setdefault("json", PacketJSON)
+        super().__init__(*args, **kwargs)
+        self.wire_format = wire_format
+
+    async def connect(self, url, headers: Optional[dict] = None, *args, **kwargs):
+        await super().connect(url, {**(headers or {}), WIRE_FORMAT_HEADER: self.wire_format}, *args, **kwargs)
+
+    async def emit(self, event, data=None, namespace=None, callback=None):
+        if isinstance(data, Payload):
+            data = data.encode(self.wire_format)
+        return await super().emit(event, data, namespace=namespace, callback=callback)
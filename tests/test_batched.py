@@ -0,0 +1,115 @@
+"""
+Checks the batched NumPy games agree move for move with the game servers
+
+Random games are played in a batch and one game server per game in the batch, every game's board, turn, legal moves
+and final score are compared after each step.
+"""
+from typing import Any, Callable, List, NamedTuple, Type
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from aiplayground.benchmarks.batched import random_moves
+from aiplayground.exceptions import GameCompleted, IllegalMove
+from aiplayground.gameservers import BaseGameServer, KalahaServer, TicTacToeServer
+from aiplayground.gameservers.batched import BatchedGame, BatchedKalaha, BatchedTicTacToe
+from aiplayground.types import Move, PlayerId
+from aiplayground.utils.tictactoe import SQUARE_MOVES
+
+GAMES = 50
+SEED = 0
+
+
+def kalaha_state(server: KalahaServer) -> List[int]:
+    return server.slots
+
+
+def tictactoe_state(server: TicTacToeServer) -> List[int]:
+    return [server.masks[role] for role in BatchedTicTacToe.ROLES]
+
+
+def kalaha_legal(server: KalahaServer) -> List[bool]:
+    role = server.players[server.turn]
+    return [pips > 0 for pips in server.board[f"pits_{role}"]]
+
+
+def tictactoe_legal(server: TicTacToeServer) -> List[bool]:
+    return [not server.occupied >> sq & 1 for sq in range(9)]
+
+
+class GameCheck(NamedTuple):
+    server_type: Type[BaseGameServer]
+    batch_type: Type[BatchedGame]
+    batch_state: Callable[[Any], Any]
+    server_state: Callable[[Any], List[int]]
+    server_legal: Callable[[Any], List[bool]]
+    to_move: Callable[[int], Move]
+
+
+CHECKS = [
+    GameCheck(
+        KalahaServer,
+        BatchedKalaha,
+        lambda batch: batch.slots,
+        kalaha_state,
+        kalaha_legal,
+        lambda move: Move({"move": int(move)}),
+    ),
+    GameCheck(
+        TicTacToeServer,
+        BatchedTicTacToe,
+        lambda batch: batch.masks,
+        tictactoe_state,
+        tictactoe_legal,
+        lambda move: Move(dict(SQUARE_MOVES[move])),
+    ),
+]
+
+
+def start_server(server_type: Type[BaseGameServer]) -> BaseGameServer:
+    server = server_type()
+    # Join in reverse so roles and player IDs differ, the batch refers to roles by index
+    for player_id in ("second", "first"):
+        server.add_player(PlayerId(player_id))
+    server.start()
+    return server
+
+
+@pytest.mark.parametrize("check", CHECKS, ids=lambda check: check.server_type.gamename)
+def test_batch_matches_game_server(check: GameCheck):
+    rng = np.random.default_rng(SEED)
+    batch = check.batch_type(GAMES)
+    servers = [start_server(check.server_type) for _ in range(GAMES)]
+    finished = [False] * GAMES
+    while not batch.done.all():
+        moves = random_moves(batch, rng)
+        legal = batch.legal_moves()
+        for i, server in enumerate(servers):
+            if finished[i]:
+                continue
+            assert check.server_legal(server) == legal[i].tolist(), f"game {i} legal moves differ"
+            try:
+                server.move(server.turn, check.to_move(moves[i]))
+            except GameCompleted:
+                finished[i] = True
+        batch.step(moves)
+        for i, server in enumerate(servers):
+            assert bool(batch.done[i]) == finished[i], f"game {i} finished differently"
+            assert check.server_state(server) == check.batch_state(batch)[i].tolist(), f"game {i} boards differ"
+            if finished[i]:
+                assert server.score() == batch.score(i, server.roles), f"game {i} scores differ"
+            else:
+                assert server.players[server.turn] == batch.ROLES[batch.turn[i]], f"game {i} turns differ"
+
+
+@pytest.mark.parametrize("check", CHECKS, ids=lambda check: check.server_type.gamename)
+def test_finished_games_ignore_moves(check: GameCheck):
+    rng = np.random.default_rng(SEED)
+    batch = check.batch_type(GAMES)
+    while not batch.done.all():
+        batch.step(random_moves(batch, rng))
+    try:
+        batch.step(np.zeros(GAMES, dtype=np.intp))
+    except IllegalMove:
+        pytest.fail("Moves for finished games should be ignored")
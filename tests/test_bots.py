@@ -0,0 +1,45 @@
+import asyncio
+from uuid import uuid4
+
+from aiplayground.api.auth import User
+from aiplayground.api.bots import Bot, CreateBotSchema
+from aiplayground.api.bots.views import create_bot
+from aiplayground.utils.aioredorm import ared
+
+
+def create_user() -> User:
+    name = uuid4().hex
+    return asyncio.run(ared.create(User, username=name, email=f"{name}@example.com", password="", reset_token=name))
+
+
+def test_bots_get_their_own_api_keys():
+    user = create_user()
+
+    async def create_bots():
+        return [
+            await create_bot(CreateBotSchema(name=uuid4().hex, description="A bot"), user_id=user.id) for _ in range(2)
+        ]
+
+    first, second = asyncio.run(create_bots())
+    assert first["api_key"] != second["api_key"]
+    found = asyncio.run(ared.get(Bot, api_key=second["api_key"]))
+    assert found.id == second["id"]
+
+
+def test_reindex_replaces_shared_api_keys():
+    async def reindex():
+        client = await ared.client()
+        bots = [await ared.create(Bot, name=uuid4().hex, api_key=uuid4().hex) for _ in range(2)]
+        # As stored by bots created before api_key was unique, all with the same key and none in its index
+        shared = uuid4().hex
+        for bot in bots:
+            bot.api_key = shared
+            await client.set(f"Bot:member:{bot.id}", bot.to_json())
+        await client.delete("Bot:key:api_key")
+        await ared.reindex(Bot, regenerate={"api_key": lambda: uuid4().hex})
+        return [await ared.get(Bot, bot.id) for bot in bots], shared
+
+    bots, shared = asyncio.run(reindex())
+    assert len({bot.api_key for bot in bots} | {shared}) == 3
+    for bot in bots:
+        assert asyncio.run(ared.get(Bot, api_key=bot.api_key)).id == bot.id
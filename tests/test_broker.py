@@ -0,0 +1,74 @@
+import asyncio
+from typing import List, Tuple
+
+from aiplayground.broker import GameBroker
+from aiplayground.messages import MessageBase
+
+GAMESERVER = "gameserver-sid"
+PLAYER = "player-sid"
+
+
+class Worker(GameBroker):
+    """
+    A broker worker sharing rooms with other workers through redis, recording the messages it sends
+    """
+
+    sent: List[Tuple[str, MessageBase, str]]
+
+    def __init__(self):
+        super().__init__("/")
+        self.shared_rooms = True
+        self.sent = []
+
+    async def emit(self, event, data=None, room=None, callback=None, **kwargs):
+        self.sent.append((event, getattr(data, "message", data), room))
+
+    def enter_room(self, sid, room, namespace=None):
+        pass
+
+    def leave_room(self, sid, room, namespace=None):
+        pass
+
+    def last(self, event: str) -> MessageBase:
+        return [message for sent, message, _ in self.sent if sent == event][-1]
+
+
+def test_move_to_room_owned_by_another_worker():
+    """
+    The game server is connected to one worker, which owns the room, and the player to another
+    """
+
+    async def play():
+        server_worker, player_worker = Worker(), Worker()
+        await server_worker.on_createroom(GAMESERVER, {"name": "room", "game": "TicTacToe", "maxplayers": 1})
+        room_id = server_worker.last("roomcreated").roomid
+        assert await player_worker.on_join(PLAYER, {"roomid": room_id, "name": "player"}) is None
+        player_id = player_worker.last("register").playerid
+        await server_worker.on_joinsuccess(GAMESERVER, {"roomid": room_id, "playerid": player_id, "gamerole": "x"})
+        board = {"grid": [[None] * 3] * 3}
+        update = {"visibility": "broadcast", "roomid": room_id, "board": board, "turn": player_id, "epoch": 0}
+        assert await server_worker.on_gameupdate(GAMESERVER, update) is None
+        move = {"roomid": room_id, "playerid": player_id, "move": {"row": 0, "col": 0}}
+        assert await player_worker.on_move(PLAYER, move) is None
+        return player_worker.last("playermove")
+
+    forwarded = asyncio.run(play())
+    assert forwarded.move == {"row": 0, "col": 0}
+
+
+def test_rejected_join_tells_player_which_join_failed():
+    async def join():
+        worker = Worker()
+        await worker.on_createroom(GAMESERVER, {"name": "room", "game": "TicTacToe", "maxplayers": 2})
+        room_id = worker.last("roomcreated").roomid
+        await worker.on_join(PLAYER, {"roomid": room_id, "name": "player"})
+        player_id = worker.last("register").playerid
+        await worker.on_joinfail(GAMESERVER, {"roomid": room_id, "playerid": player_id, "reason": "GameFull()"})
+        await worker.on_join(PLAYER, {"roomid": "no-such-room", "name": "player"})
+        return room_id, [(message, to) for event, message, to in worker.sent if event == "fail"]
+
+    room_id, fails = asyncio.run(join())
+    assert [(fail["error"], fail["roomid"], fail["name"], to) for fail, to in fails] == [
+        ("registrationFailed", room_id, "player", PLAYER),
+        ("NoSuchRoom", "no-such-room", "player", PLAYER),
+    ]
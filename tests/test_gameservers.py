@@ -0,0 +1,29 @@
+import pytest
+
+from aiplayground.exceptions import IllegalMove
+from aiplayground.gameservers import KalahaServer, TicTacToeServer
+from aiplayground.gameservers.kalaha import player_a, player_b
+from aiplayground.types import Board, PlayerId
+
+
+def test_kalaha_rejects_empty_pit():
+    game = KalahaServer.from_board(
+        Board({"bank_a": 0, "bank_b": 0, "pits_a": [0, 4, 4, 4, 4, 4], "pits_b": [4] * 6}),
+        roles={player_a: PlayerId("a"), player_b: PlayerId("b")},
+        turn=PlayerId("a"),
+    )
+    with pytest.raises(IllegalMove) as e:
+        game.move(PlayerId("a"), {"move": 0})
+    # Rejected by looking the move up in the legal moves, rather than by the schema
+    assert "is not legal" in e.value.details
+
+
+def test_tictactoe_rejects_occupied_square():
+    game = TicTacToeServer()
+    for player_id in ("first", "second"):
+        game.add_player(PlayerId(player_id))
+    game.start()
+    game.move(game.turn, {"row": 1, "col": 1})
+    with pytest.raises(IllegalMove) as e:
+        game.move(game.turn, {"row": 1, "col": 1})
+    assert "is not legal" in e.value.details
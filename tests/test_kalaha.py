@@ -0,0 +1,26 @@
+"""
+Checks the array backed Kalaha engine plays exactly like the previous, dict backed one
+"""
+import pytest
+
+from aiplayground.benchmarks.kalaha import PreviousKalahaServer, new_game, random_game
+from aiplayground.exceptions import GameCompleted
+from aiplayground.gameservers.kalaha import KalahaServer
+from aiplayground.types import Move
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_engines_agree(seed: int):
+    previous, current = new_game(PreviousKalahaServer), new_game(KalahaServer)
+    for number, move in enumerate(random_game(seed)):
+        finished = []
+        for game in (previous, current):
+            try:
+                game.make_move(game.turn, game.players[game.turn], Move({"move": move}))
+            except GameCompleted:
+                finished.append(game)
+        assert len(finished) in (0, 2), f"only one engine finished after move {number}"
+        assert previous.board == current.board, f"boards differ after move {number}"
+        assert previous.turn == current.turn, f"turns differ after move {number}"
+    assert finished
+    assert previous.winner == current.winner
@@ -0,0 +1,66 @@
+import asyncio
+from typing import List, Tuple
+
+from aiplayground.messages import Finish, MessageBase
+from aiplayground.player import MultiplexedPlayerClient, PlayerClient
+from aiplayground.players.executor import MoveExecutor, INLINE
+
+
+class Client(MultiplexedPlayerClient):
+    """
+    A player client recording the messages it sends
+    """
+
+    sent: List[Tuple[str, MessageBase]]
+
+    def __init__(self, name: str, instances: int):
+        super().__init__(player_name=name, instances=instances, executor=MoveExecutor(mode=INLINE, budget=None))
+        self.sent = []
+
+    async def emit(self, event, data=None, namespace=None, callback=None):
+        self.sent.append((event, getattr(data, "message", data)))
+
+
+def lobby_room(name: str, players: int) -> dict:
+    return {"name": name, "game": "TicTacToe", "maxplayers": 2, "players": players, "status": "lobby"}
+
+
+def test_bot_rejected_from_full_room_joins_another():
+    """
+    Two clients see the last seat of a room free and both try to take it, the game server rejects the second
+    """
+
+    async def race():
+        first, second = Client("first", 1), Client("second", 1)
+        for client in (first, second):
+            await client.rooms_callback({"full": lobby_room("full", 1)})
+            assert ("join" in [event for event, _ in client.sent]) and not client.slots[0].idle
+        [slot] = second.slots
+        await second.on_fail(
+            {"error": "registrationFailed", "reason": "GameFull()", "roomid": "full", "name": slot.name}
+        )
+        assert slot.idle and not second.joining
+        # The bot stopped receiving lobby updates once it was joining, so it subscribes again
+        event, message = second.sent[-1]
+        assert event == "list" and message.subscribe
+        second.sent.clear()
+        await second.rooms_callback({"full": lobby_room("full", 2), "free": lobby_room("free", 0)})
+        return second.sent, slot
+
+    sent, slot = asyncio.run(race())
+    joins = [message for event, message in sent if event == "join"]
+    assert [join.roomid for join in joins] == ["free"] and slot.room_id == "free"
+
+
+def test_player_looks_for_another_game_after_opponent_forfeits():
+    class Recording(PlayerClient):
+        async def emit(self, event, data=None, namespace=None, callback=None):
+            sent.append((event, getattr(data, "message", data)))
+
+    sent: List[Tuple[str, MessageBase]] = []
+    client = Recording(player_name="player", executor=MoveExecutor(mode=INLINE, budget=None))
+    client.player_id, client.room_id = "us", "room"
+    finish = Finish(normal=False, reason="OutOfTime", fault="them", scores={"us": 1, "them": -1})
+    asyncio.run(client.finished(finish))
+    assert client.room_id is None
+    assert [(event, message.subscribe) for event, message in sent] == [("list", True)]
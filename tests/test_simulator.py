@@ -0,0 +1,24 @@
+import asyncio
+from secrets import token_urlsafe
+from uuid import uuid4
+
+from aiplayground.api.bots import Bot
+from aiplayground.api.tournaments.models import MatchState, Tournament
+from aiplayground.api.tournaments.simulator import run_tournament
+from aiplayground.api.tournaments.tournaments import add_player
+from aiplayground.utils.aioredorm import ared
+
+
+def test_run_tournament_plays_pending_matches():
+    async def play():
+        tournament = await ared.create(Tournament, name=uuid4().hex, game="TicTacToe", api_key=token_urlsafe(32))
+        for _ in range(3):
+            bot = await ared.create(Bot, name=uuid4().hex, description="A bot", api_key=token_urlsafe(32))
+            await add_player(bot, tournament)
+        counts = await run_tournament(tournament.id, dict(), workers=2)
+        matches = await ared.related(tournament, "matches")
+        return counts, [match.state for match in matches]
+
+    counts, states = asyncio.run(play())
+    assert counts == {"completed": 3, "errored": 0}
+    assert states == [MatchState.completed] * 3
@@ -0,0 +1,18 @@
+import sys
+
+import pytest
+
+from aiplayground.solutions import kalaha
+from aiplayground.solutions.table import UNSOLVED
+
+
+def test_kalaha_solve_restores_recursion_limit():
+    limit = sys.getrecursionlimit()
+    values = kalaha.solve(3)
+    assert sys.getrecursionlimit() == limit
+    assert len(values) == kalaha.positions(3) and UNSOLVED not in values
+
+
+def test_kalaha_seeds_are_capped():
+    with pytest.raises(ValueError):
+        kalaha.solve(kalaha.MAX_SEEDS + 1)
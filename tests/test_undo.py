@@ -0,0 +1,46 @@
+"""
+Checks push_move/pop_move and clone leave games exactly as making the move on a deep copy does
+"""
+import copy
+import random
+from typing import Type
+
+import pytest
+
+from aiplayground.benchmarks.undo import GAMES, start, state
+from aiplayground.exceptions import GameCompleted
+from aiplayground.gameservers import BaseGameServer
+
+GAMES_PLAYED = 20
+
+
+@pytest.mark.parametrize("game_type", list(GAMES), ids=lambda game_type: game_type.gamename)
+def test_undo_matches_deepcopy(game_type: Type[BaseGameServer]):
+    """
+    Plays random games, trying every legal move at each step before making one
+    """
+    rng = random.Random(0)
+    moves = GAMES[game_type]
+    for _ in range(GAMES_PLAYED):
+        game = start(game_type)
+        while game.playing:
+            before = state(game)
+            for move in moves(game):
+                expected = copy.deepcopy(game)
+                clone = game.clone()
+                try:
+                    expected.move(expected.turn, move)
+                except GameCompleted:
+                    expected.playing = False
+                try:
+                    game.push_move(game.turn, move)
+                except GameCompleted:
+                    pass
+                assert state(game) == state(expected), "push_move differs from move"
+                game.pop_move()
+                assert state(game) == before, "pop_move didn't restore the game"
+                assert state(clone) == before, "clone was changed by the original"
+            try:
+                game.move(game.turn, rng.choice(moves(game)))
+            except GameCompleted:
+                game.playing = False
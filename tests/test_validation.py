@@ -0,0 +1,15 @@
+"""
+Checks each game's fast move validator accepts and rejects the same moves as its schema
+"""
+import pytest
+
+from aiplayground.benchmarks.validation import SAMPLE_MOVES, accepts, compiled_validate, fast_validate, schema_validate
+
+CASES = [(game, move) for game, moves in SAMPLE_MOVES.items() for move in moves]
+
+
+@pytest.mark.parametrize("game, move", CASES, ids=[f"{game.gamename}-{move!r}" for game, move in CASES])
+def test_validators_agree(game, move):
+    expected = accepts(schema_validate, game, move)
+    assert accepts(compiled_validate, game, move) == expected
+    assert accepts(fast_validate, game, move) == expected
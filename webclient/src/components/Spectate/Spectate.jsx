@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import PropTypes from 'prop-types';
 import { Typography } from '@material-ui/core';
 import axios from 'axios';
@@ -26,12 +26,13 @@ const Spectate = ({ match: { params: { roomId } } }) => {
   const classes = useStyles();
   const [epoch, setEpoch] = useState(null);
   const [states, setStates] = useState([]);
+  // Epoch of the last state received in order, used to resume after reconnecting
+  const lastEpoch = useRef(null);
   const [room, setRoom] = useState({
     players: [],
   });
   useEffect(() => {
     axios.get(`/rooms/${roomId}`).then((resp) => {
-      setStates(resp.data.states);
       setRoom(resp.data);
     }).catch((err) => {
       if (err.response) {
@@ -42,13 +43,35 @@ const Spectate = ({ match: { params: { roomId } } }) => {
     });
   }, [roomId]);
   useEffect(() => {
-    const gameStateCallback = (data) => {
+    const mergeStates = (newStates) => {
+      setStates((curStates) => {
+        const seen = new Set(curStates.map((s) => s.epoch));
+        return sortByEpoch([...curStates, ...newStates.filter((s) => !seen.has(s.epoch))]);
+      });
+    };
+    const requestStates = (sinceEpoch) => {
+      socketio.emit('spectate', { roomid: roomId, since_epoch: sinceEpoch }, (_, data) => {
+        if (data.states) {
+          mergeStates(data.states);
+          if (data.states.length > 0) {
+            lastEpoch.current = data.states[data.states.length - 1].epoch;
+          }
+          if (data.more) {
+            requestStates(lastEpoch.current);
+          }
+        }
+      });
+    };
+    const spectatorStateCallback = (data) => {
       console.log(data);
-      setStates((curStates) => (
-        sortByEpoch([...curStates, data])
-      ));
+      mergeStates([data]);
+      if (lastEpoch.current !== null && data.epoch === lastEpoch.current + 1) {
+        lastEpoch.current = data.epoch;
+      }
     };
-    const gsSocket = socketio.on('gamestate', gameStateCallback);
+    const ssSocket = socketio.on('spectatorstate', spectatorStateCallback);
+    const reconnectCallback = () => requestStates(lastEpoch.current);
+    const rcSocket = socketio.on('reconnect', reconnectCallback);
     const joinedCallback = (data) => {
       console.log(data);
       setRoom((currRoom) => ({
@@ -59,20 +82,18 @@ const Spectate = ({ match: { params: { roomId } } }) => {
       }));
     };
     const jnSocket = socketio.on('joined', joinedCallback);
-    socketio.emit('spectate', { roomid: roomId }, (_, data) => {
-      if (data.states) {
-        const localStates = sortByEpoch(data.states);
-        setStates(localStates);
-      }
-    });
+    setStates([]);
+    lastEpoch.current = null;
+    requestStates(null);
 
     function cleanup() {
-      gsSocket.off('gamestate', gameStateCallback);
+      ssSocket.off('spectatorstate', spectatorStateCallback);
+      rcSocket.off('reconnect', reconnectCallback);
       jnSocket.off('joined', joinedCallback);
     }
 
     return cleanup;
-  }, [roomId, room.game]);
+  }, [roomId]);
   const state = epoch === null ? states[states.length - 1] : states[epoch];
   const board = state ? state.board : null;
   const Game = Games[room.game] || Games.Default;